@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En premier : mesure toute la requête (voir INSTRUMENTATION)
+    'bibliotheque.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -80,10 +83,39 @@ WSGI_APPLICATION = 'api_project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # BIBLIOTHEQUE_DB : autre fichier (jeux de données de benchmark, voir bench/)
+        'NAME': os.environ.get('BIBLIOTHEQUE_DB', BASE_DIR / 'db.sqlite3'),
+        # Connexions persistantes (vérifiées avant réutilisation)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# PRAGMA appliqués à chaque nouvelle connexion SQLite (bibliotheque/db.py)
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,  # Ko (20 Mo)
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Mode de journal appliqué aux connexions (WAL en production). Persistant dans
+# le fichier : laissé tel quel par défaut pour ne pas modifier db.sqlite3,
+# BIBLIOTHEQUE_JOURNAL_MODE=WAL au déploiement (les benchmarks le fixent)
+SQLITE_JOURNAL_MODE = os.environ.get('BIBLIOTHEQUE_JOURNAL_MODE')
+
+# Lectures sur une connexion en lecture seule (optionnel) :
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+#     'OPTIONS': {'uri': True},
+#     'CONN_MAX_AGE': 600,
+#     'TEST': {'MIRROR': 'default'},
+# }
+# DATABASE_ROUTERS = ['bibliotheque.db.ReadReplicaRouter']
+DATABASE_READ_ALIAS = 'replica'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,19 +158,42 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache : fragments de templates, throttling... Les versions des modèles (ETag,
+# clés des fragments) sont en base (versions.py). En production
+# multi-processus, utiliser un cache partagé (Redis, Memcached) : le cache
+# mémoire n'est pas vu par les autres workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Django REST Framework
 REST_FRAMEWORK = {
+    # TokenAuthentication avec cache token -> utilisateur (LRU local + cache partagé)
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'bibliotheque.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAdminUser',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Numéros de page par défaut, pagination keyset avec ?pagination=cursor
+    # JSON encodé par orjson (même sortie que JSONRenderer)
+    'DEFAULT_RENDERER_CLASSES': [
+        'bibliotheque.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Filtres déclarés par ViewSet (attribut `filtres`) et colonnes limitées
+    # aux champs de ?fields= / ?omit=, voir bibliotheque/filters.py
+    'DEFAULT_FILTER_BACKENDS': [
+        'bibliotheque.filters.FiltresBackend',
+        'bibliotheque.filters.ProjectionBackend',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'bibliotheque.pagination.SelectablePagination',
     'PAGE_SIZE': 5,
+    # Limites anon/user (et throttle_scope de la vue) en fenêtre glissante
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'bibliotheque.throttling.SlidingWindowRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
@@ -147,6 +202,41 @@ REST_FRAMEWORK = {
     }
 }
 
+# Stockage des compteurs de throttling (bibliotheque/throttling.py) : fichier
+# SQLite partagé par les processus de la machine. Avec un cache partagé
+# (Redis, Memcached) : {'BACKEND': 'bibliotheque.throttling.CacheThrottleStore'}
+THROTTLE_STORE = {
+    'BACKEND': 'bibliotheque.throttling.SQLiteThrottleStore',
+    'OPTIONS': {'path': BASE_DIR / 'throttle.sqlite3'},
+}
+
+# Tests : throttling sur le cache Django (voir bibliotheque/test_runner.py)
+TEST_RUNNER = 'bibliotheque.test_runner.TestRunner'
+
+# Instrumentation des requêtes (bibliotheque/instrumentation.py) : en-tête
+# Server-Timing, journal des requêtes lentes, histogrammes par route sur
+# /api/instrumentation/. ENABLED = False retire le middleware.
+INSTRUMENTATION = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_QUERY_COUNT': 50,
+    'DUPLICATE_THRESHOLD': 3,
+}
+
+# Ingestion différée des commentaires (page d'article) et feedbacks (API),
+# bibliotheque/ingestion.py : soumissions validées mises en file dans PATH
+# (SQLite dédié) puis insérées par lots de BATCH_SIZE, au plus tard toutes les
+# FLUSH_INTERVAL secondes, par un thread de chaque processus (WORKER_THREAD)
+# ou par `manage.py flush_ingestion --loop`.
+INGESTION = {
+    'ENABLED': False,
+    'PATH': BASE_DIR / 'ingestion.sqlite3',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'WORKER_THREAD': True,
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -0,0 +1,23 @@
+"""Benchmarks du projet (à lancer avec `python -m bench.<module>`)"""
+import os
+import sys
+from pathlib import Path
+
+
+def setup(database=None):
+    """
+    Initialise Django pour un script de benchmark ; `database` remplace le
+    fichier SQLite des settings (variable BIBLIOTHEQUE_DB) et passe en WAL,
+    comme en production. Sans `database`, base en mémoire : un benchmark
+    n'ouvre jamais db.sqlite3, suivi par git.
+    """
+    import django
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    if database:
+        os.environ['BIBLIOTHEQUE_DB'] = str(Path(database).resolve())
+        os.environ.setdefault('BIBLIOTHEQUE_JOURNAL_MODE', 'WAL')
+    else:
+        os.environ['BIBLIOTHEQUE_DB'] = ':memory:'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_project.settings')
+    django.setup()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+Charge mixte lecture/écriture sur SQLite : configuration par défaut contre
+profil de production (bibliotheque/db.py).
+
+    python -m bench.database [--duration 5] [--readers 8] [--writers 2]
+
+- défaut : journal DELETE, synchronous=FULL, une connexion par requête
+- réglé : WAL (mode de production, voir SQLITE_JOURNAL_MODE),
+  settings.SQLITE_PRAGMAS (synchronous=NORMAL...) et connexions persistantes
+  (CONN_MAX_AGE)
+
+Les lecteurs lisent une page de commentaires d'un article et leur nombre, les
+écrivains postent des commentaires. Pour chaque profil : opérations par
+seconde, latences p50/p95 et erreurs « database is locked ».
+"""
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from bench import setup
+
+ARTICLES = 100
+LECTURE = (
+    'SELECT id, nom, contenu, date FROM commentaire WHERE article_id = ? AND actif = 1 '
+    'ORDER BY date DESC LIMIT 20'
+)
+COMPTE = 'SELECT COUNT(*) FROM commentaire WHERE article_id = ? AND actif = 1'
+ECRITURE = "INSERT INTO commentaire (article_id, nom, contenu, date, actif) VALUES (?, ?, ?, datetime('now'), 1)"
+
+
+def profils():
+    from bibliotheque.db import get_pragmas
+
+    return {
+        'défaut': {'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'}, 'persistant': False},
+        'réglé': {'pragmas': {'journal_mode': 'WAL', **get_pragmas()}, 'persistant': True},
+    }
+
+
+def preparer(chemin, lignes):
+    connexion = sqlite3.connect(chemin)
+    connexion.executescript('''
+        CREATE TABLE commentaire (
+            id INTEGER PRIMARY KEY, article_id INTEGER, nom TEXT, contenu TEXT, date TEXT, actif INTEGER
+        );
+        CREATE INDEX commentaire_article ON commentaire (article_id, actif, date);
+    ''')
+    connexion.executemany(
+        "INSERT INTO commentaire (article_id, nom, contenu, date, actif) VALUES (?, ?, ?, datetime('now'), 1)",
+        ((i % ARTICLES, f'Lecteur {i}', 'x' * 200) for i in range(lignes)),
+    )
+    connexion.commit()
+    connexion.close()
+
+
+class Client:
+    """Connexion ouverte par opération, ou conservée comme avec CONN_MAX_AGE"""
+
+    def __init__(self, chemin, profil):
+        self.chemin, self.profil = chemin, profil
+        self.connexion = None
+
+    def connecter(self):
+        from bibliotheque.db import appliquer_pragmas
+
+        # timeout=5 : valeur par défaut du module sqlite3 (et donc de Django)
+        connexion = sqlite3.connect(self.chemin, timeout=5, isolation_level=None)
+        appliquer_pragmas(connexion.cursor(), self.profil['pragmas'])
+        return connexion
+
+    def executer(self, fonction):
+        if self.connexion is None:
+            self.connexion = self.connecter()
+        try:
+            return fonction(self.connexion)
+        finally:
+            if not self.profil['persistant']:
+                self.connexion.close()
+                self.connexion = None
+
+
+def lire(connexion, article):
+    connexion.execute(LECTURE, [article]).fetchall()
+    connexion.execute(COMPTE, [article]).fetchone()
+
+
+def ecrire(connexion, article):
+    connexion.execute('BEGIN IMMEDIATE')
+    connexion.execute(ECRITURE, [article, 'Bench', 'y' * 200])
+    connexion.execute('COMMIT')
+
+
+def travailleur(chemin, profil, operation, fin, resultats):
+    client = Client(chemin, profil)
+    latences, erreurs, i = [], 0, 0
+    while time.perf_counter() < fin:
+        i += 1
+        debut = time.perf_counter()
+        try:
+            client.executer(lambda connexion: operation(connexion, i % ARTICLES))
+        except sqlite3.OperationalError:
+            erreurs += 1
+            if client.connexion is not None and client.connexion.in_transaction:
+                client.connexion.execute('ROLLBACK')
+            continue
+        latences.append(time.perf_counter() - debut)
+    resultats.append((operation.__name__, latences, erreurs))
+
+
+def percentile(valeurs, p):
+    if not valeurs:
+        return float('nan')
+    return statistics.quantiles(valeurs, n=100, method='inclusive')[p - 1] if len(valeurs) > 1 else valeurs[0]
+
+
+def mesurer(nom, profil, args, dossier):
+    chemin = str(Path(dossier) / f'{nom}.sqlite3')
+    preparer(chemin, args.rows)
+    # Le mode de journal est persistant : l'appliquer une fois avant la charge
+    Client(chemin, profil).executer(lambda connexion: None)
+
+    resultats, fin = [], time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=travailleur, args=(chemin, profil, lire, fin, resultats))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=travailleur, args=(chemin, profil, ecrire, fin, resultats))
+        for _ in range(args.writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lignes = []
+    for operation in ('lire', 'ecrire'):
+        latences = [l for op, valeurs, _ in resultats if op == operation for l in valeurs]
+        erreurs = sum(e for op, _, e in resultats if op == operation)
+        lignes.append((
+            nom, operation, len(latences) / args.duration,
+            percentile(latences, 50) * 1000, percentile(latences, 95) * 1000, erreurs,
+        ))
+    return lignes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5.0, help='durée de la charge par profil (s)')
+    parser.add_argument('--readers', type=int, default=8, help='threads lecteurs')
+    parser.add_argument('--writers', type=int, default=2, help='threads écrivains')
+    parser.add_argument('--rows', type=int, default=50000, help='commentaires initiaux')
+    args = parser.parse_args()
+
+    setup()
+    lignes = []
+    with tempfile.TemporaryDirectory() as dossier:
+        for nom, profil in profils().items():
+            lignes.extend(mesurer(nom, profil, args, dossier))
+
+    print(f'{args.readers} lecteurs, {args.writers} écrivains, {args.duration:g} s, '
+          f'{args.rows} lignes (SQLite {sqlite3.sqlite_version})')
+    print(f"{'profil':<8} {'opération':<9} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'erreurs':>8}")
+    for nom, operation, debit, p50, p95, erreurs in lignes:
+        print(f'{nom:<8} {operation:<9} {debit:>9.0f} {p50:>8.2f} {p95:>8.2f} {erreurs:>8}')
+
+
+if __name__ == '__main__':
+    main()
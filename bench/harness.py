@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+"""
+Harnais de charge : parcourt toutes les routes GET de bibliotheque/urls.py et
+mesure chacune sous une concurrence configurable.
+
+    python -m bench.harness --database bench-100k.sqlite3 [--concurrency 4] [--requests 200]
+                            [--routes 'livre|article'] [--output resultats.json]
+    python -m bench.harness --url http://127.0.0.1:8000 --database ... [--pid <pid du serveur>]
+
+Par défaut les requêtes passent par le client de test Django, dans ce
+processus (une connexion SQLite par thread) ; avec --url elles visent un
+serveur local, que l'on lance sur la même base (BIBLIOTHEQUE_DB) et sans
+throttling. La base sert à trouver des identifiants existants pour les routes
+de détail et le token de l'utilisateur `bench` (voir bench/seed.py).
+
+Résultat JSON par route : débit (req/s), latences p50/p95/p99 (ms), nombre de
+requêtes SQL par appel (client de test, ou en-tête Server-Timing si le serveur
+le fournit) et RSS maximal (Ko) pendant la mesure, du processus qui sert les
+requêtes (ce processus, ou --pid). Les métadonnées (commit, volumes, réglages)
+permettent de comparer deux exécutions.
+"""
+import argparse
+import datetime
+import json
+import platform
+import re
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bench import setup
+
+# Routes ignorées : écriture uniquement, ou réponses non bornées par la taille d'une page
+EXCLUES = re.compile(r'-(bulk|export)$')
+
+# Fragment du nom de route -> modèle fournissant l'identifiant des routes de détail
+MODELES_ROUTES = [
+    ('auteur', 'Auteur'), ('livre', 'Livre'), ('article', 'Article'),
+    ('note', 'Note'), ('comment', 'Commentaire'), ('feedback', 'Feedback'),
+]
+
+
+def rss_kb(pid='self'):
+    """RSS courant (Ko) lu dans /proc ; à défaut, maximum atteint par ce processus"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for ligne in status:
+                if ligne.startswith('VmRSS:'):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class EchantillonneurRSS(threading.Thread):
+    """Relève le RSS toutes les 10 ms pendant la mesure d'une route"""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid, self.pic, self.arret = pid, rss_kb(pid), threading.Event()
+
+    def run(self):
+        while not self.arret.wait(0.01):
+            self.pic = max(self.pic, rss_kb(self.pid))
+
+    def stop(self):
+        self.arret.set()
+        self.join()
+        return max(self.pic, rss_kb(self.pid))
+
+
+def lister_routes():
+    """
+    (nom, gabarit) de toutes les routes nommées de bibliotheque/urls.py. Un
+    nom peut servir deux fois (`article-list` : routeur DRF et vue MVT) : les
+    routes sont identifiées par leur gabarit.
+    """
+    from django.urls import URLPattern, URLResolver
+
+    from bibliotheque import urls
+
+    def parcourir(patterns, prefixe=''):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from parcourir(pattern.url_patterns, prefixe + str(pattern.pattern))
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                yield pattern.name, prefixe + str(pattern.pattern)
+
+    return list(parcourir(urls.urlpatterns))
+
+
+def construire_urls(routes, bench_user):
+    """
+    (chemin de la route, URL concrète) de chaque route, ex. ('/api/livres/<pk>/',
+    '/api/livres/1/') ; les routes de détail reçoivent un pk existant
+    """
+    from django.apps import apps
+
+    from bibliotheque.instrumentation import nom_route
+
+    identifiants = {}
+    for fragment, nom_modele in MODELES_ROUTES:
+        model = apps.get_model('bibliotheque', nom_modele)
+        queryset = model.objects.order_by('pk')
+        if nom_modele == 'Note':
+            queryset = queryset.filter(owner=bench_user)
+        identifiants[fragment] = queryset.values_list('pk', flat=True).first()
+
+    resultat = {}
+    for nom, gabarit in routes:
+        if EXCLUES.search(nom):
+            continue
+        # `<int:pk>` (path()) comme `(?P<pk>...)` (routeur DRF) -> `<pk>`
+        chemin = '/' + re.sub(r'<\w+:(\w+)>', r'<\1>', nom_route(gabarit))
+        url = chemin
+        if '<pk>' in chemin:
+            fragment = next((f for f, _ in MODELES_ROUTES if f in nom), None)
+            if fragment is None or identifiants.get(fragment) is None:
+                continue
+            url = chemin.replace('<pk>', str(identifiants[fragment]))
+        if re.search(r'[<\\]', url):
+            # Routes à format (`\.(?P<format>...)`) du routeur DRF
+            continue
+        resultat.setdefault(chemin, url)
+    return list(resultat.items())
+
+
+class ClientDjango:
+    """Requêtes via le client de test, requêtes SQL comptées par appel"""
+
+    def __init__(self, token):
+        self.token = token
+        self.local = threading.local()
+
+    def get(self, url):
+        from django.db import connection
+        from django.test import Client
+        from django.test.utils import CaptureQueriesContext
+
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = client.get(url)
+            if reponse.streaming:
+                b''.join(reponse.streaming_content)
+        return reponse.status_code, len(requetes)
+
+
+class ClientHTTP:
+    """Requêtes HTTP vers un serveur ; requêtes SQL lues dans Server-Timing si présent"""
+
+    def __init__(self, token, base_url):
+        self.token, self.base_url = token, base_url.rstrip('/')
+
+    def get(self, url):
+        requete = urllib.request.Request(self.base_url + url, headers={'Authorization': f'Token {self.token}'})
+        try:
+            with urllib.request.urlopen(requete) as reponse:
+                reponse.read()
+                statut, timing = reponse.status, reponse.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as exc:
+            statut, timing = exc.code, exc.headers.get('Server-Timing', '')
+        trouve = re.search(r'db;[^,]*desc="(\d+) ', timing)
+        return statut, int(trouve.group(1)) if trouve else None
+
+
+def percentile(valeurs, p):
+    if len(valeurs) < 2:
+        return valeurs[0] if valeurs else None
+    return statistics.quantiles(valeurs, n=100, method='inclusive')[p - 1]
+
+
+def mesurer(client, url, nombre, concurrence, pid):
+    # Appel de chauffe (caches, connexions) non compté
+    statut, _ = client.get(url)
+
+    latences, requetes_sql, erreurs = [], [], 0
+    verrou = threading.Lock()
+
+    def appel(_):
+        nonlocal erreurs
+        debut = time.perf_counter()
+        code, nombre_sql = client.get(url)
+        duree = time.perf_counter() - debut
+        with verrou:
+            latences.append(duree)
+            if nombre_sql is not None:
+                requetes_sql.append(nombre_sql)
+            if code >= 400:
+                erreurs += 1
+
+    echantillonneur = EchantillonneurRSS(pid)
+    echantillonneur.start()
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(concurrence) as executeur:
+        list(executeur.map(appel, range(nombre)))
+    total = time.perf_counter() - debut
+    pic_rss = echantillonneur.stop()
+
+    en_ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        'url': url,
+        'status': statut,
+        'requests': nombre,
+        'errors': erreurs,
+        'throughput_rps': round(nombre / total, 1),
+        'p50_ms': en_ms(percentile(latences, 50)),
+        'p95_ms': en_ms(percentile(latences, 95)),
+        'p99_ms': en_ms(percentile(latences, 99)),
+        'queries': max(requetes_sql) if requetes_sql else None,
+        'peak_rss_kb': pic_rss,
+    }
+
+
+def metadonnees(args):
+    from django.conf import settings
+    from django.db import connection
+
+    from bibliotheque.models import Auteur, Livre, Article, Commentaire, Note, Feedback
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent.parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'mode': 'http' if args.url else 'client',
+        'url': args.url,
+        'database': str(settings.DATABASES['default']['NAME']),
+        'rows': {m._meta.model_name: m.objects.count() for m in (Auteur, Livre, Article, Commentaire, Note, Feedback)},
+        'concurrency': args.concurrency,
+        'requests_per_route': args.requests,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'vendor': connection.vendor,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='fichier SQLite (voir bench/seed.py)')
+    parser.add_argument('--url', help='serveur à solliciter (défaut : client de test dans ce processus)')
+    parser.add_argument('--pid', help='pid du serveur, pour relever son RSS (avec --url)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help='requêtes mesurées par route')
+    parser.add_argument('--routes', help='expression régulière filtrant les chemins de route (ex. /api/livres/<pk>/)')
+    parser.add_argument('--output', help='fichier JSON (défaut : sortie standard)')
+    args = parser.parse_args()
+
+    setup(args.database)
+    from django.contrib.auth.models import User
+    from django.test.utils import override_settings, setup_test_environment
+    from rest_framework.authtoken.models import Token
+
+    try:
+        bench_user = User.objects.get(username='bench')
+    except User.DoesNotExist:
+        parser.error("utilisateur `bench` introuvable : générer la base avec `python -m bench.seed`")
+    token = Token.objects.get(user=bench_user).key
+
+    routes = construire_urls(lister_routes(), bench_user)
+    if args.routes:
+        routes = [(chemin, url) for chemin, url in routes if re.search(args.routes, chemin)]
+
+    if args.url:
+        client, pid, contexte = ClientHTTP(token, args.url), args.pid or 'self', None
+    else:
+        # Pas de limites de débit pendant la mesure
+        setup_test_environment()
+        client, pid = ClientDjango(token), 'self'
+        from django.conf import settings
+        contexte = override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+        contexte.enable()
+
+    resultats = {'meta': metadonnees(args), 'routes': {}}
+    for chemin, url in routes:
+        resultats['routes'][chemin] = mesurer(client, url, args.requests, args.concurrency, pid)
+        r = resultats['routes'][chemin]
+        print(f"{chemin:<34} {r['throughput_rps']:>8} req/s  p95 {r['p95_ms']:>8} ms  "
+              f"{r['queries'] if r['queries'] is not None else '-':>3} sql  {r['status']}",
+              file=sys.stderr)
+    if contexte is not None:
+        contexte.disable()
+
+    sortie = json.dumps(resultats, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(sortie + '\n')
+    else:
+        print(sortie)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Rafale de soumissions : INSERT synchrone contre ingestion différée
+(bibliotheque/ingestion.py).
+
+    python -m bench.ingestion --database bench-10k.sqlite3 [--posters 200] [--posts 5]
+
+`--posters` threads soumettent chacun `--posts` feedbacks (API) ou
+commentaires (page d'article) en même temps, pendant qu'un lecteur appelle
+/api/articles/ en boucle. Chaque mode travaille sur une copie de la base.
+Résultat : soumissions acceptées par seconde, échecs, latence médiane et
+maximale du lecteur, et durée du vidage de la file en mode différé.
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from bench import setup
+
+
+def rafale(posters, posts, article_id, token):
+    from django.db import connection
+    from django.test import Client
+
+    depart = threading.Barrier(posters + 1)
+    fin = threading.Event()
+    statuts, latences = [], []
+
+    def poster(i):
+        client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+        depart.wait()
+        for j in range(posts):
+            try:
+                if (i + j) % 2:
+                    response = client.post('/api/feedbacks/', {'titre': f'Avis {i}-{j}', 'contenu': '...'})
+                else:
+                    response = client.post(f'/articles/{article_id}/',
+                                           {'nom': f'Lecteur {i}', 'email': 'a@example.com', 'contenu': '...'})
+                statuts.append(response.status_code)
+            except Exception as exc:
+                # database is locked... : la soumission est perdue
+                statuts.append(type(exc).__name__)
+        connection.close()
+
+    def lire():
+        client = Client()
+        depart.wait()
+        while not fin.is_set():
+            debut = time.perf_counter()
+            client.get('/api/articles/')
+            latences.append(time.perf_counter() - debut)
+        connection.close()
+
+    threads = [threading.Thread(target=poster, args=(i,)) for i in range(posters)]
+    lecteur = threading.Thread(target=lire)
+    for thread in threads + [lecteur]:
+        thread.start()
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duree = time.perf_counter() - debut
+    fin.set()
+    lecteur.join()
+    return statuts, duree, latences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='fichier SQLite (copié pour chaque mode)')
+    parser.add_argument('--posters', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=5, help='soumissions par poster')
+    args = parser.parse_args()
+
+    dossier = Path(tempfile.mkdtemp())
+    copie = dossier / 'bench.sqlite3'
+    shutil.copy(args.database, copie)
+    setup(copie)
+    from django.conf import settings
+    from django.db import connection, connections
+    from django.test.utils import override_settings, setup_test_environment
+    from rest_framework.authtoken.models import Token
+
+    from bibliotheque import ingestion
+    from bibliotheque.models import Article
+
+    setup_test_environment()
+    token = Token.objects.get(user__username='bench').key
+    article_id = Article.objects.values_list('pk', flat=True).first()
+    connection.close()
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+
+    print(f"{'mode':<10} {'soumissions/s':>14} {'échecs':>7} {'lecture méd.':>13} {'lecture max':>12} {'vidage':>8}")
+    for mode in ('synchrone', 'différé'):
+        connections.close_all()
+        for suffixe in ('-wal', '-shm'):
+            Path(f'{copie}{suffixe}').unlink(missing_ok=True)
+        shutil.copy(args.database, copie)
+        config = {'ENABLED': mode == 'différé', 'PATH': dossier / f'file-{mode}.sqlite3', 'WORKER_THREAD': False}
+        with override_settings(REST_FRAMEWORK=rest_framework, INGESTION=config, INSTRUMENTATION={'ENABLED': False}):
+            statuts, duree, latences = rafale(args.posters, args.posts, article_id, token)
+            debut = time.perf_counter()
+            if config['ENABLED']:
+                ingestion.vider()
+            vidage = time.perf_counter() - debut
+        acceptees = sum(1 for statut in statuts if statut in (201, 202, 302))
+        print(f'{mode:<10} {acceptees / duree:>14.0f} {len(statuts) - acceptees:>7} '
+              f'{statistics.median(latences) * 1000:>10.1f} ms {max(latences) * 1000:>9.1f} ms {vidage:>6.2f} s')
+    shutil.rmtree(dossier)
+
+
+if __name__ == '__main__':
+    main()
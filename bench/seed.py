@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Génère un jeu de données déterministe et réaliste pour les benchmarks.
+
+    python -m bench.seed --size 100k --database bench-100k.sqlite3 [--seed 42]
+
+Tailles : 10k, 100k ou 1m livres. Le reste en découle :
+- auteurs : un pour 20 livres, répartition très inégale (loi de Pareto :
+  quelques auteurs très prolifiques, une longue traîne d'auteurs à un livre)
+- articles : un pour 10 livres, dans 20 catégories ; commentaires (la moitié
+  du nombre de livres) concentrés sur quelques articles
+- utilisateurs : un pour 100 livres, chacun avec des notes et des feedbacks
+
+Tout passe par bulk_create par lots ; les compteurs dénormalisés et l'index
+de recherche sont recalculés une fois à la fin. Le même `--seed` produit
+les mêmes données (aux dates automatiques près). Un utilisateur `bench`
+(staff, mot de passe `bench`) et son token sont créés pour le harnais
+(bench/harness.py).
+"""
+import argparse
+import datetime
+import random
+import time
+from pathlib import Path
+
+from bench import setup
+
+TAILLES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+LOT = 5000
+CATEGORIES = [
+    'Roman', 'Poésie', 'Histoire', 'Sciences', 'Philosophie', 'Voyage', 'Cuisine', 'Art',
+    'Musique', 'Cinéma', 'Théâtre', 'Jeunesse', 'Policier', 'Fantastique', 'Biographie',
+    'Politique', 'Économie', 'Informatique', 'Sport', 'Nature',
+]
+MOTS = (
+    'le la les un une des du de et à au en dans sur sous pour par avec sans nuit jour '
+    'mer ciel terre feu vent amour guerre paix temps mémoire ville campagne voyage retour '
+    'secret ombre lumière silence histoire roman poème chemin maison jardin rivière '
+    'montagne hiver été printemps automne enfant père mère frère sœur ami ennemi roi '
+    'reine peuple liberté justice rêve promesse lettre livre page encre parole regard '
+    'cœur âme esprit destin hasard fortune misère gloire'
+).split()
+PRENOMS = 'Victor Émile Marie George Gustave Albert Colette Honoré Jules Simone Marcel Louise Paul Anne'.split()
+NOMS = 'Hugo Zola Sand Flaubert Camus Balzac Verne Beauvoir Proust Michel Valéry Ernaux Duras Gary'.split()
+
+
+class Generateur:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def phrase(self, minimum, maximum):
+        return ' '.join(self.rng.choices(MOTS, k=self.rng.randint(minimum, maximum)))
+
+    def titre(self):
+        return self.phrase(2, 6).capitalize()
+
+    def date(self, debut, fin):
+        return debut + datetime.timedelta(days=self.rng.randrange((fin - debut).days))
+
+    def repartir(self, parents, total, alpha):
+        """`total` enfants répartis sur `parents` avec des poids de Pareto (longue traîne)"""
+        poids = [self.rng.paretovariate(alpha) for _ in parents]
+        return self.rng.choices(parents, weights=poids, k=total)
+
+
+def par_lots(model, objets):
+    """bulk_create par lots, sans la mise à jour des compteurs (recalculés à la fin)"""
+    from django.db import models
+
+    lot, total = [], 0
+    for obj in objets:
+        lot.append(obj)
+        if len(lot) == LOT:
+            models.QuerySet(model).bulk_create(lot)
+            total += len(lot)
+            lot = []
+    if lot:
+        models.QuerySet(model).bulk_create(lot)
+        total += len(lot)
+    return total
+
+
+def generer(taille, seed, stdout=print):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from rest_framework.authtoken.models import Token
+
+    from bibliotheque import counters, extraits, search
+    from bibliotheque.models import Auteur, Livre, Categorie, Article, Commentaire, Note, Feedback
+
+    g = Generateur(seed)
+    nombre_livres = TAILLES[taille]
+    effectifs = {}
+
+    def etape(nom, model, objets):
+        debut = time.monotonic()
+        with transaction.atomic():
+            effectifs[nom] = par_lots(model, objets)
+        stdout(f'{nom:<13} {effectifs[nom]:>9}  {time.monotonic() - debut:6.1f} s')
+
+    # Utilisateurs : le hachage (volontairement lent) n'est calculé qu'une fois
+    mot_de_passe = make_password('bench')
+    nombre_users = max(10, nombre_livres // 100)
+    etape('utilisateurs', User, (
+        User(username=f'lecteur{i}', email=f'lecteur{i}@example.com', password=mot_de_passe)
+        for i in range(nombre_users)
+    ))
+    bench = User.objects.create(username='bench', password=mot_de_passe, is_staff=True, is_superuser=True)
+    Token.objects.create(user=bench)
+    users = list(User.objects.values_list('pk', flat=True))
+
+    debut, fin = datetime.date(1750, 1, 1), datetime.date(1990, 1, 1)
+    etape('auteurs', Auteur, (
+        Auteur(nom=f'{g.rng.choice(PRENOMS)} {g.rng.choice(NOMS)} {i}', date_naissance=g.date(debut, fin))
+        for i in range(max(1, nombre_livres // 20))
+    ))
+    auteurs = list(Auteur.objects.values_list('pk', flat=True))
+    etape('livres', Livre, (
+        Livre(titre=g.titre(), date_sortie=g.date(datetime.date(1800, 1, 1), datetime.date(2024, 1, 1)), auteur_id=a)
+        for a in g.repartir(auteurs, nombre_livres, 1.2)
+    ))
+
+    etape('categories', Categorie, (Categorie(nom=nom) for nom in CATEGORIES))
+    categories = list(Categorie.objects.values_list('pk', flat=True))
+
+    def article(categorie_id):
+        # par_lots contourne Article.objects.bulk_create : extrait calculé ici
+        article = Article(titre=g.titre(), contenu=g.phrase(30, 300), categorie_id=categorie_id)
+        extraits.calculer(article)
+        return article
+    etape('articles', Article, (article(c) for c in g.repartir(categories, nombre_livres // 10, 2.0)))
+    articles = list(Article.objects.values_list('pk', flat=True))
+    etape('commentaires', Commentaire, (
+        Commentaire(article_id=a, nom=g.rng.choice(PRENOMS), email='lecteur@example.com',
+                    contenu=g.phrase(5, 40), actif=g.rng.random() > 0.1)
+        for a in g.repartir(articles, nombre_livres // 2, 1.1)
+    ))
+
+    etape('notes', Note, (
+        Note(titre=g.titre(), contenu=g.phrase(10, 80), owner_id=u) for u in g.repartir(users, len(users) * 5, 1.5)
+    ))
+    etape('feedbacks', Feedback, (
+        Feedback(titre=g.titre(), contenu=g.phrase(10, 60), owner_id=u) for u in g.repartir(users, len(users) * 2, 1.5)
+    ))
+    # L'utilisateur du harnais a aussi ses notes (endpoint /api/notes/)
+    etape('notes bench', Note, (Note(titre=g.titre(), contenu=g.phrase(10, 80), owner=bench) for _ in range(50)))
+
+    debut = time.monotonic()
+    counters.recompter()
+    if search.fts_disponible():
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.reconstruire_index(cursor)
+    stdout(f'{"compteurs+fts":<13} {"":>9}  {time.monotonic() - debut:6.1f} s')
+    return effectifs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=list(TAILLES), default='10k')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', required=True, help='fichier SQLite à créer')
+    parser.add_argument('--force', action='store_true', help='écrase le fichier existant')
+    args = parser.parse_args()
+
+    chemin = Path(args.database)
+    if chemin.exists():
+        if not args.force:
+            parser.error(f'{chemin} existe déjà (--force pour le remplacer)')
+        for suffixe in ('', '-wal', '-shm'):
+            Path(f'{chemin}{suffixe}').unlink(missing_ok=True)
+
+    setup(chemin)
+    from django.core.management import call_command
+
+    debut = time.monotonic()
+    call_command('migrate', verbosity=0)
+    generer(args.size, args.seed)
+    print(f'{chemin} : {args.size} généré en {time.monotonic() - debut:.1f} s (seed {args.seed})')
+
+
+if __name__ == '__main__':
+    main()
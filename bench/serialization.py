@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Sérialisation des listes, trois modes :
+
+    drf      ModelSerializer + JSONRenderer de DRF (module json), la référence
+    orjson   ModelSerializer + FastJSONRenderer (bibliotheque/renderers.py)
+    compilé  plan compilé (.values(), bibliotheque/fastpath.py) + FastJSONRenderer
+
+    python -m bench.serialization --database bench-100k.sqlite3 [--rows 1000] [--iterations 30]
+
+Chaque endpoint (livres, articles, feedbacks) est appelé de bout en bout via
+le client de test avec des pages de `--rows` lignes, une fois par mode ; les
+réponses sont d'abord comparées octet par octet à celle de la référence.
+Résultat : requêtes par seconde de chaque mode et gain sur la référence.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from bench import setup
+
+ENDPOINTS = [
+    ('livres', 'LivreViewSet', '/api/livres/'),
+    ('articles', 'ArticleListViewSet', '/api/articles/'),
+    ('feedbacks', 'FeedbackViewSet', '/api/feedbacks/'),
+]
+
+
+def mesurer(client, url, iterations):
+    client.get(url)
+    durees = []
+    for _ in range(iterations):
+        debut = time.perf_counter()
+        reponse = client.get(url)
+        durees.append(time.perf_counter() - debut)
+        assert reponse.status_code == 200, reponse.status_code
+    return 1 / statistics.median(durees)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='fichier SQLite (voir bench/seed.py)')
+    parser.add_argument('--rows', type=int, default=1000, help='lignes par page')
+    parser.add_argument('--iterations', type=int, default=30)
+    args = parser.parse_args()
+
+    setup(args.database)
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import override_settings, setup_test_environment
+    from rest_framework.authtoken.models import Token
+    from rest_framework.pagination import PageNumberPagination
+    from rest_framework.renderers import JSONRenderer
+
+    from bibliotheque import views
+    from bibliotheque.renderers import FastJSONRenderer
+
+    # (nom, renderer, fast_list) ; le premier mode sert de référence
+    modes = [
+        ('drf', JSONRenderer, False),
+        ('orjson', FastJSONRenderer, False),
+        ('compilé', FastJSONRenderer, True),
+    ]
+
+    setup_test_environment()
+    user = User.objects.get(username='bench')
+    client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.get(user=user).key}')
+    PageNumberPagination.page_size = args.rows
+
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+    with override_settings(REST_FRAMEWORK=rest_framework, INSTRUMENTATION={'ENABLED': False}):
+        print(f"{'endpoint':<10}" + ''.join(f'{nom:>20}' for nom, _, _ in modes) + f'   ({args.rows} lignes/page)')
+        for nom, viewset, url in ENDPOINTS:
+            vue = getattr(views, viewset)
+            renderers, fast_list = vue.renderer_classes, vue.fast_list
+            reference = debit_reference = None
+            colonnes = []
+            try:
+                for mode, renderer, plan_compile in modes:
+                    vue.renderer_classes, vue.fast_list = [renderer], plan_compile
+                    contenu = client.get(url).content
+                    if reference is None:
+                        reference = contenu
+                    elif contenu != reference:
+                        sys.exit(f'{nom} : réponse du mode {mode} différente de la référence')
+                    debit = mesurer(client, url, args.iterations)
+                    debit_reference = debit_reference or debit
+                    colonnes.append(f'{debit:>8.1f} r/s ({debit / debit_reference:>4.1f}x)')
+            finally:
+                vue.renderer_classes, vue.fast_list = renderers, fast_list
+            print(f'{nom:<10}' + ''.join(f'{c:>20}' for c in colonnes))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Compare le coût des throttles DRF (SimpleRateThrottle) et des throttles à
+fenêtre glissante de bibliotheque.throttling.
+
+    python -m bench.throttle [--history 1000] [--calls 2000]
+
+Pour chaque classe : temps moyen d'un allow_request() quand la clé contient
+déjà `--history` requêtes sur la période, et taille de l'état stocké par clé.
+"""
+import argparse
+import pickle
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from bench import setup
+
+RATE = '1000000/day'
+
+
+def requete(user_pk=1):
+    user = SimpleNamespace(is_authenticated=True, pk=user_pk)
+    return SimpleNamespace(user=user, META={'REMOTE_ADDR': '127.0.0.1'})
+
+
+def mesurer(throttle, calls):
+    request, view = requete(), SimpleNamespace(action='list', throttle_scope=None)
+    debut = time.perf_counter()
+    for _ in range(calls):
+        throttle.allow_request(request, view)
+    return (time.perf_counter() - debut) / calls * 1e6
+
+
+def bench_drf(history, calls):
+    from django.core.cache import cache
+    from rest_framework.throttling import UserRateThrottle
+
+    cache.clear()
+    throttle = UserRateThrottle()
+    maintenant = time.time()
+    cache.set(throttle.get_cache_key(requete(), None), [maintenant - i for i in range(history)], 86400)
+    micro = mesurer(throttle, calls)
+    taille = len(pickle.dumps(cache.get(throttle.get_cache_key(requete(), None))))
+    return micro, taille
+
+
+def bench_sliding(store_config, history, calls):
+    from django.core.cache import cache
+    from django.test.utils import override_settings
+
+    from bibliotheque import throttling
+
+    cache.clear()
+    throttling._stores.clear()
+    with override_settings(THROTTLE_STORE=store_config):
+        store = throttling.get_store()
+        maintenant = time.time()
+        fenetre = int(maintenant // 86400)
+        limites = [('throttle_user_1', 10**6, 86400)]
+        # Même historique que pour DRF, résumé en deux compteurs
+        etats = {'throttle_user_1': (fenetre, history // 2, history - history // 2)}
+        if isinstance(store, throttling.CacheThrottleStore):
+            # Un compteur par fenêtre
+            compteurs = {
+                f'throttle_user_1:{fenetre - 1}': history // 2,
+                f'throttle_user_1:{fenetre}': history - history // 2,
+            }
+            store.cache.set_many(compteurs, 86400 * 2)
+            taille = sum(len(pickle.dumps(valeur)) for valeur in compteurs.values())
+        else:
+            store.hit(limites, maintenant)
+            taille = len(pickle.dumps(etats['throttle_user_1']))
+        micro = mesurer(throttling.SlidingWindowRateThrottle(), calls)
+        return micro, taille
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=1000, help='requêtes déjà enregistrées sur la période')
+    parser.add_argument('--calls', type=int, default=2000, help='appels mesurés par classe')
+    args = parser.parse_args()
+
+    setup()
+    from django.test.utils import override_settings
+
+    rest_framework = {'DEFAULT_THROTTLE_RATES': {'user': RATE, 'anon': RATE}}
+    resultats = []
+    with override_settings(REST_FRAMEWORK=rest_framework), tempfile.TemporaryDirectory() as dossier:
+        resultats.append(('DRF UserRateThrottle (cache)',) + bench_drf(args.history, args.calls))
+        resultats.append(('SlidingWindowRateThrottle (cache)',) + bench_sliding(
+            {'BACKEND': 'bibliotheque.throttling.CacheThrottleStore'}, args.history, args.calls))
+        resultats.append(('SlidingWindowRateThrottle (SQLite)',) + bench_sliding(
+            {'BACKEND': 'bibliotheque.throttling.SQLiteThrottleStore',
+             'OPTIONS': {'path': Path(dossier) / 'throttle.sqlite3'}}, args.history, args.calls))
+
+    print(f'historique : {args.history} requêtes, {args.calls} appels mesurés (SQLite {sqlite3.sqlite_version})')
+    print(f"{'classe':<38} {'µs/appel':>10} {'octets/clé':>11}")
+    for nom, micro, taille in resultats:
+        print(f'{nom:<38} {micro:>10.1f} {taille:>11}')
+
+
+if __name__ == '__main__':
+    main()
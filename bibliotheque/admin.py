@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Auteur, Livre, Categorie, Article, Commentaire
+from .counters import sous_requete
 
 
 @admin.register(Auteur)
@@ -9,9 +10,13 @@ class AuteurAdmin(admin.ModelAdmin):
     search_fields = ['nom']
     ordering = ['nom']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_nombre_livres=sous_requete('auteur.livres'))
+
     def nombre_livres(self, obj):
-        return obj.livres.count()
+        return obj._nombre_livres or 0
     nombre_livres.short_description = 'Nombre de livres'
+    nombre_livres.admin_order_field = '_nombre_livres'
 
 
 @admin.register(Livre)
@@ -29,9 +34,13 @@ class CategorieAdmin(admin.ModelAdmin):
     search_fields = ['nom']
     ordering = ['nom']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_nombre_articles=sous_requete('categorie.articles'))
+
     def nombre_articles(self, obj):
-        return obj.articles.count()
+        return obj._nombre_articles or 0
     nombre_articles.short_description = 'Nombre d\'articles'
+    nombre_articles.admin_order_field = '_nombre_articles'
 
 
 @admin.register(Article)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class BibliothequeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bibliotheque'
+
+    def ready(self):
+        # Connexion des signaux (index de recherche, ...)
+        from . import signals  # noqa: F401
+
+        from django.db.backends.signals import connection_created
+        from .db import configurer_sqlite
+        connection_created.connect(configurer_sqlite, dispatch_uid='bibliotheque.configurer_sqlite')
@@ -0,0 +1,177 @@
+"""
+Vues async des endpoints de lecture les plus sollicités.
+
+Servies par l'application ASGI (api_project/asgi.py), elles ne mobilisent pas
+de thread pendant qu'elles attendent la base ou un client lent : un worker
+peut tenir de nombreuses connexions simultanées. Les requêtes passent par
+l'ORM async (aget, acount, aiterator) ; la sérialisation réutilise les
+serializers DRF sur des objets entièrement chargés, donc sans accès SQL.
+
+Mêmes réponses et mêmes filtres (filters.py) que les ViewSets équivalents,
+sous le préfixe /api/async/ (et /async/ pour la page d'accueil). Limites :
+lecture seule, pagination par numéros de page uniquement, pas de requêtes
+conditionnelles (ETag).
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.shortcuts import render
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import counters, instrumentation
+from .filters import filtrer
+from .authentication import CachedTokenAuthentication
+from .renderers import FastJSONRenderer
+from .models import Auteur, Livre, Article
+from .search import rechercher_livres, rechercher_articles
+from .serializers import LivreSerializer, ArticleSerializer, ArticleResumeSerializer
+from .throttling import SlidingWindowRateThrottle
+from .views import LivreViewSet, ArticleListViewSet
+
+
+def reponse_json(data, status=200, headers=None):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, headers=headers,
+                        content_type='application/json')
+
+
+def api_async(admin=False, throttle_scope=None, model=None):
+    """
+    Authentification par token, permission et throttling des ViewSets, pour une
+    vue async en lecture seule. `admin` : réservée au staff (IsAdminUser) ;
+    `model` : modèle servi (introspection, voir index_advisor).
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return reponse_json({'detail': f'Méthode « {request.method} » non autorisée.'}, status=405,
+                                    headers={'Allow': 'GET, HEAD'})
+            authentification = CachedTokenAuthentication()
+            try:
+                resultat = await authentification.aauthenticate(request)
+                # Remplace l'utilisateur de session paresseux (accès SQL synchrone)
+                request.user = resultat[0] if resultat else AnonymousUser()
+
+                if admin and not request.user.is_staff:
+                    if request.user.is_authenticated:
+                        raise exceptions.PermissionDenied()
+                    raise exceptions.NotAuthenticated()
+
+                throttle = SlidingWindowRateThrottle()
+                if not await sync_to_async(throttle.allow_request)(request, wrapper):
+                    raise exceptions.Throttled(throttle.wait())
+
+                return await vue(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                headers = {}
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    headers['WWW-Authenticate'] = authentification.authenticate_header(request)
+                if getattr(exc, 'wait', None):
+                    headers['Retry-After'] = str(exc.wait)
+                return reponse_json({'detail': exc.detail}, status=exc.status_code, headers=headers)
+
+        wrapper.throttle_scope = throttle_scope
+        wrapper.model = model
+        return wrapper
+    return decorateur
+
+
+def serialiser(serializer):
+    """serializer.data, chronométré (phase serialize, voir instrumentation.py)"""
+    with instrumentation.phase('serialize'):
+        return serializer.data
+
+
+async def paginer(request, queryset, serializer_class):
+    """Équivalent async de PageNumberPagination : acount() puis une page en aiterator()"""
+    page_size = api_settings.PAGE_SIZE
+    count = await queryset.acount()
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        raise exceptions.NotFound('Page invalide.')
+    pages = max(1, -(-count // page_size))
+    if not 1 <= page <= pages:
+        raise exceptions.NotFound('Page invalide.')
+
+    debut = (page - 1) * page_size
+    objets = [obj async for obj in queryset[debut:debut + page_size].aiterator()]
+
+    url = request.build_absolute_uri()
+    suivante = replace_query_param(url, 'page', page + 1) if page < pages else None
+    if page <= 1:
+        precedente = None
+    elif page == 2:
+        precedente = remove_query_param(url, 'page')
+    else:
+        precedente = replace_query_param(url, 'page', page - 1)
+    return {
+        'count': count,
+        'next': suivante,
+        'previous': precedente,
+        'results': serialiser(serializer_class(objets, many=True, context={'request': request})),
+    }
+
+
+async def objet_ou_404(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        raise exceptions.NotFound('Pas trouvé.')
+
+
+@api_async(model=Livre)
+async def livres_list(request):
+    queryset = Livre.objects.all()
+    search = request.GET.get('search')
+    if search is not None:
+        queryset = rechercher_livres(queryset, search)
+    queryset = filtrer(queryset, request.GET, LivreViewSet.filtres)
+    return reponse_json(await paginer(request, queryset, LivreSerializer))
+
+
+@api_async(model=Livre)
+async def livres_detail(request, pk):
+    livre = await objet_ou_404(Livre.objects.all(), pk)
+    return reponse_json(serialiser(LivreSerializer(livre, context={'request': request})))
+
+
+@api_async(model=Article)
+async def articles_list(request):
+    queryset = Article.objects.select_related('categorie').defer('contenu')
+    search = request.GET.get('search')
+    if search is not None:
+        queryset = rechercher_articles(queryset, search)
+    queryset = filtrer(queryset, request.GET, ArticleListViewSet.filtres)
+    return reponse_json(await paginer(request, queryset, ArticleResumeSerializer))
+
+
+@api_async(model=Article)
+async def articles_detail(request, pk):
+    article = await objet_ou_404(Article.objects.select_related('categorie'), pk)
+    return reponse_json(serialiser(ArticleSerializer(article, context={'request': request})))
+
+
+@api_async(admin=True, model=Auteur)
+async def auteurs_titres(request, pk):
+    auteur = await objet_ou_404(Auteur.objects.only('pk'), pk)
+    titres = [titre async for titre in auteur.livres.values_list('titre', flat=True)]
+    return reponse_json({'titres': titres})
+
+
+async def home(request):
+    """Page d'accueil (async) : les compteurs sont lus sans bloquer de thread"""
+    totaux = await counters.alire_globaux()
+    context = {
+        'total_auteurs': totaux['auteur'],
+        'total_livres': totaux['livre'],
+        'total_categories': totaux['categorie'],
+        'total_articles': totaux['article'],
+        'total_commentaires': totaux['commentaire'],
+    }
+    # Le gabarit lit les messages, donc la session : rendu hors de la boucle
+    return await sync_to_async(render)(request, 'bibliotheque/home.html', context)
@@ -0,0 +1,126 @@
+"""
+Authentification par token sans requête SQL sur le chemin chaud.
+
+TokenAuthentication (DRF) fait un SELECT token JOIN user à chaque requête.
+CachedTokenAuthentication résout token -> utilisateur à travers deux niveaux :
+
+1. un LRU en mémoire du processus (TTL court : c'est lui qui borne la durée
+   pendant laquelle un autre processus peut encore voir un token révoqué)
+2. le cache Django partagé (TTL plus long, invalidé explicitement)
+
+Les entrées sont invalidées à la suppression (ou rotation) d'un token et à
+toute modification de l'utilisateur, notamment sa désactivation (voir
+signals.py).
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+CACHE_PREFIX = 'bibliotheque:token:'
+SHARED_TIMEOUT = 300
+LOCAL_TIMEOUT = 30
+LOCAL_MAXSIZE = 1024
+
+
+class LRUCache:
+    """LRU borné en taille et en durée, partagé par les threads d'un processus"""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.timeout)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local_cache = LRUCache(LOCAL_MAXSIZE, LOCAL_TIMEOUT)
+
+
+def _cache_key(key):
+    # Le token n'apparaît pas en clair dans les clés du cache partagé
+    return CACHE_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_tokens(keys):
+    keys = list(keys)
+    for key in keys:
+        local_cache.delete(_cache_key(key))
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        user = local_cache.get(cache_key)
+        if user is None:
+            user = cache.get(cache_key)
+            if user is None:
+                user, token = super().authenticate_credentials(key)
+                cache.set(cache_key, user, SHARED_TIMEOUT)
+            local_cache.set(cache_key, user)
+        return self.verifier(user), key
+
+    async def aauthenticate(self, request):
+        """Équivalent de authenticate() pour les vues async (async_views.py)"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        cache_key = _cache_key(key)
+        user = local_cache.get(cache_key)
+        if user is None:
+            user = await cache.aget(cache_key)
+            if user is None:
+                try:
+                    token = await self.get_model().objects.select_related('user').aget(key=key)
+                except self.get_model().DoesNotExist:
+                    raise exceptions.AuthenticationFailed('Invalid token.')
+                user = token.user
+                await cache.aset(cache_key, user, SHARED_TIMEOUT)
+            local_cache.set(cache_key, user)
+        return self.verifier(user), key
+
+    def verifier(self, user):
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        # Copie : les attributs posés sur request.user ne doivent pas survivre à la requête
+        return copy.copy(user)
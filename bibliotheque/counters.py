@@ -0,0 +1,295 @@
+"""
+Compteurs dénormalisés stockés dans la table Compteur.
+
+- Totaux globaux (objet_id = 0) : 'auteur', 'livre', 'categorie', 'article',
+  'commentaire'
+- Totaux par parent : 'auteur.livres' (objet_id = auteur), 'categorie.articles'
+  (objet_id = catégorie), 'article.commentaires' (commentaires actifs,
+  objet_id = article)
+
+Ils sont mis à jour dans la transaction de l'écriture : par les signaux
+post_save/post_delete (signals.py), envoyés dans la transaction ouverte par
+ModeleCompte.save() et par delete(), et par CompteurQuerySet.bulk_create.
+Un échec de mise à jour annule l'écriture.
+La suppression d'un parent décompte ses descendants supprimés en cascade en
+bloc (supprimer_en_cascade) plutôt que ligne à ligne.
+QuerySet.update() ne passe par aucun des deux : après une modification en
+masse des clés étrangères, lancer `manage.py recount`.
+"""
+import functools
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, QuerySet, Subquery
+
+from .models import Auteur, Livre, Categorie, Article, Commentaire, Compteur
+
+GLOBAL = 0
+
+MODELES = [Auteur, Livre, Categorie, Article, Commentaire]
+
+# modèle enfant -> (champ clé étrangère, nom du compteur par parent)
+PAR_PARENT = {
+    Livre: ('auteur', 'auteur.livres'),
+    Article: ('categorie', 'categorie.articles'),
+    Commentaire: ('article', 'article.commentaires'),
+}
+
+# modèle enfant -> conditions pour compter un enfant dans son parent
+CONDITIONS = {
+    Commentaire: {'actif': True},
+}
+
+# modèle enfant -> attributs lus par parent_compte()
+CHAMPS_PARENT = {
+    model: (f'{champ}_id', *CONDITIONS.get(model, {})) for model, (champ, nom) in PAR_PARENT.items()
+}
+
+# Modèles dont la suppression entraîne celle d'enfants comptés
+PARENTS = list(dict.fromkeys(model._meta.get_field(champ).related_model for model, (champ, nom) in PAR_PARENT.items()))
+
+
+def nom_global(model):
+    return model._meta.model_name
+
+
+def parent_compte(obj):
+    """Parent dont le compteur inclut `obj`, ou None (ex. commentaire inactif)"""
+    model = type(obj)
+    if any(getattr(obj, champ) != valeur for champ, valeur in CONDITIONS.get(model, {}).items()):
+        return None
+    return getattr(obj, f'{PAR_PARENT[model][0]}_id')
+
+
+def memoriser_parent(obj, champs_charges):
+    """
+    Mémorise le parent compté d'un enfant chargé de la base (Model.from_db) si
+    les champs nécessaires ont été lus : sa modification n'aura pas à le relire
+    """
+    champs = CHAMPS_PARENT.get(type(obj))
+    if champs is not None and all(champ in champs_charges for champ in champs):
+        obj._parent_initial = parent_compte(obj)
+
+
+def deltas(objs, sens):
+    """Variations de compteurs provoquées par l'ajout (+1) ou le retrait (-1) d'objets"""
+    variations = Counter()
+    for obj in objs:
+        model = type(obj)
+        variations[(nom_global(model), GLOBAL)] += sens
+        parent = parent_compte(obj) if model in PAR_PARENT else None
+        if parent is not None:
+            variations[(PAR_PARENT[model][1], parent)] += sens
+    return variations
+
+
+# Au-delà de ce nombre de parents d'un même compteur (import, écriture en
+# masse, suppression en cascade), appliquer() les traite par lots
+SEUIL_LOT = 4
+
+# Identifiants par requête `objet_id IN (...)`, sous la limite de variables de SQLite
+TAILLE_LOT = 500
+
+
+def appliquer(variations):
+    """
+    Applique des variations {(nom, objet_id): delta}. Une mise à jour (et
+    une création si le compteur n'existe pas) par compteur ; au-delà de
+    SEUIL_LOT parents d'un même nom, une lecture des compteurs existants, une
+    mise à jour par valeur de delta et un bulk_create des manquants.
+    """
+    par_nom = defaultdict(dict)
+    for (nom, objet_id), delta in variations.items():
+        if delta:
+            par_nom[nom][objet_id] = delta
+    with transaction.atomic():
+        for nom, deltas_par_objet in par_nom.items():
+            if len(deltas_par_objet) > SEUIL_LOT:
+                _appliquer_lot(nom, deltas_par_objet)
+                continue
+            for objet_id, delta in deltas_par_objet.items():
+                modifies = Compteur.objects.filter(nom=nom, objet_id=objet_id).update(valeur=F('valeur') + delta)
+                if not modifies:
+                    Compteur.objects.create(nom=nom, objet_id=objet_id, valeur=delta)
+
+
+def _lots(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), TAILLE_LOT):
+        yield ids[i:i + TAILLE_LOT]
+
+
+def _appliquer_lot(nom, deltas_par_objet):
+    existants = set()
+    for lot in _lots(deltas_par_objet):
+        existants.update(Compteur.objects.filter(nom=nom, objet_id__in=lot).values_list('objet_id', flat=True))
+    par_delta = defaultdict(list)
+    for objet_id in existants:
+        par_delta[deltas_par_objet[objet_id]].append(objet_id)
+    for delta, ids in par_delta.items():
+        for lot in _lots(ids):
+            Compteur.objects.filter(nom=nom, objet_id__in=lot).update(valeur=F('valeur') + delta)
+    Compteur.objects.bulk_create([
+        Compteur(nom=nom, objet_id=objet_id, valeur=delta)
+        for objet_id, delta in deltas_par_objet.items() if objet_id not in existants
+    ])
+
+
+def ajuster(objs, sens):
+    objs = [obj for obj in objs if type(obj) in MODELES]
+    if objs:
+        appliquer(deltas(objs, sens))
+
+
+def deplacer(model, ancien_parent, nouveau_parent):
+    """
+    Un enfant a changé de parent compté (ex. article déplacé dans une autre
+    catégorie, commentaire désactivé : parent None)
+    """
+    nom = PAR_PARENT[model][1]
+    variations = Counter({(nom, ancien_parent): -1, (nom, nouveau_parent): +1})
+    appliquer(Counter({cle: delta for cle, delta in variations.items() if cle[1] is not None}))
+
+
+def deplacer_en_masse(model, parents_initiaux, objs):
+    """Déplacements d'un lot d'enfants ; `parents_initiaux` associe pk -> ancien parent_compte()"""
+    nom = PAR_PARENT[model][1]
+    variations = Counter()
+    for obj in objs:
+        if obj.pk not in parents_initiaux:
+            continue
+        ancien, nouveau = parents_initiaux[obj.pk], parent_compte(obj)
+        if ancien != nouveau:
+            if ancien is not None:
+                variations[(nom, ancien)] -= 1
+            if nouveau is not None:
+                variations[(nom, nouveau)] += 1
+    appliquer(variations)
+
+
+def noms_par_parent(model):
+    """Noms des compteurs par parent dont les objets de `model` sont le parent"""
+    return [nom for enfant, (champ, nom) in PAR_PARENT.items() if enfant._meta.get_field(champ).related_model is model]
+
+
+def supprimer_parent(model, objet_id):
+    """Supprime les compteurs par parent d'un objet supprimé"""
+    noms = noms_par_parent(model)
+    if noms:
+        Compteur.objects.filter(nom__in=noms, objet_id=objet_id).delete()
+
+
+# Suppressions en cascade
+
+def modele_origine(origin):
+    """Modèle sur lequel delete() a été appelé (argument `origin` de pre_delete/post_delete)"""
+    if isinstance(origin, QuerySet):
+        return origin.model
+    return type(origin) if origin is not None else None
+
+
+@functools.cache
+def descendants(model):
+    """Modèles comptés supprimés en cascade avec les objets de `model`"""
+    resultat = set()
+    for enfant, (champ, nom) in PAR_PARENT.items():
+        if enfant._meta.get_field(champ).related_model is model:
+            resultat |= {enfant, *descendants(enfant)}
+    return frozenset(resultat)
+
+
+def supprimer_en_cascade(model, pks):
+    """
+    Avant la suppression des objets `pks` de `model` (liste ou sous-requête) :
+    retire leurs descendants des totaux globaux, un COUNT par modèle au lieu
+    d'une mise à jour par ligne, et supprime les compteurs par parent de ces
+    descendants. Les objets `pks` eux-mêmes sont décomptés par post_delete.
+    """
+    variations = Counter()
+    _descendre(model, pks, variations)
+    appliquer(variations)
+
+
+def _descendre(model, pks, variations):
+    for enfant, (champ, nom) in PAR_PARENT.items():
+        if enfant._meta.get_field(champ).related_model is not model:
+            continue
+        lignes = enfant._base_manager.filter(**{f'{champ}__in': pks})
+        total = lignes.count()
+        if not total:
+            continue
+        variations[(nom_global(enfant), GLOBAL)] -= total
+        noms = noms_par_parent(enfant)
+        if noms:
+            Compteur.objects.filter(nom__in=noms, objet_id__in=lignes.values('pk')).delete()
+        _descendre(enfant, lignes.values('pk'), variations)
+
+
+def sous_requete(nom):
+    """Sous-requête lisant le compteur par parent `nom` de chaque ligne d'un queryset"""
+    return Subquery(Compteur.objects.filter(nom=nom, objet_id=OuterRef('pk')).values('valeur')[:1])
+
+
+def lire_globaux():
+    """Tous les totaux globaux en une seule requête indexée"""
+    valeurs = dict(
+        Compteur.objects.filter(nom__in=[nom_global(m) for m in MODELES], objet_id=GLOBAL)
+        .values_list('nom', 'valeur')
+    )
+    return {nom_global(m): valeurs.get(nom_global(m), 0) for m in MODELES}
+
+
+async def alire_globaux():
+    """Version async de lire_globaux"""
+    valeurs = {
+        nom: valeur async for nom, valeur in
+        Compteur.objects.filter(nom__in=[nom_global(m) for m in MODELES], objet_id=GLOBAL).values_list('nom', 'valeur')
+    }
+    return {nom_global(m): valeurs.get(nom_global(m), 0) for m in MODELES}
+
+
+# Recalcul
+
+def valeurs_reelles(model=None):
+    """Valeurs exactes calculées à partir des tables source"""
+    modeles = [model] if model is not None else MODELES
+    valeurs = {}
+    for m in modeles:
+        valeurs[(nom_global(m), GLOBAL)] = m.objects.count()
+        if m in PAR_PARENT:
+            champ, nom = PAR_PARENT[m]
+            lignes = m.objects.order_by().filter(**CONDITIONS.get(m, {})).values(champ).annotate(total=Count('pk')).values_list(champ, 'total')
+            for parent_id, total in lignes:
+                valeurs[(nom, parent_id)] = total
+    return valeurs
+
+
+def recompter(model=None):
+    """
+    Répare la dérive des compteurs ; renvoie le nombre de compteurs corrigés.
+    """
+    reelles = valeurs_reelles(model)
+    noms = {nom for nom, _ in reelles}
+    for m in ([model] if model is not None else MODELES):
+        if m in PAR_PARENT:
+            noms.add(PAR_PARENT[m][1])
+
+    with transaction.atomic():
+        stockees = {
+            (c.nom, c.objet_id): c
+            for c in Compteur.objects.select_for_update().filter(nom__in=noms)
+        }
+        a_creer, a_modifier = [], []
+        for cle, valeur in reelles.items():
+            compteur = stockees.pop(cle, None)
+            if compteur is None:
+                a_creer.append(Compteur(nom=cle[0], objet_id=cle[1], valeur=valeur))
+            elif compteur.valeur != valeur:
+                compteur.valeur = valeur
+                a_modifier.append(compteur)
+        # Compteurs restants : parents sans enfant ou supprimés
+        obsoletes = list(stockees.values())
+        Compteur.objects.bulk_create(a_creer)
+        Compteur.objects.bulk_update(a_modifier, ['valeur'])
+        Compteur.objects.filter(pk__in=[c.pk for c in obsoletes]).delete()
+    return len(a_creer) + len(a_modifier) + sum(1 for c in obsoletes if c.valeur)
@@ -0,0 +1,68 @@
+"""
+Réglages de la base SQLite.
+
+- configurer_sqlite : receveur de connection_created qui applique
+  settings.SQLITE_PRAGMAS à chaque nouvelle connexion (synchronous=NORMAL,
+  mmap, cache, busy_timeout). Avec CONN_MAX_AGE, une connexion sert plusieurs
+  requêtes et les PRAGMA ne sont exécutés qu'à sa création. Le mode de
+  journal, persistant dans le fichier, n'est changé que si
+  settings.SQLITE_JOURNAL_MODE le demande (déploiement, bases de benchmark).
+- ReadReplicaRouter : routeur optionnel qui envoie les lectures vers un alias
+  en lecture seule (settings.DATABASE_READ_ALIAS) et les écritures vers
+  `default`. En WAL, les lecteurs ne bloquent pas l'écrivain et inversement.
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def get_pragmas():
+    """PRAGMA dans l'ordre de settings.SQLITE_PRAGMAS ; aucun si le réglage est absent"""
+    return getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def appliquer_pragmas(cursor, pragmas):
+    for nom, valeur in pragmas.items():
+        cursor.execute(f'PRAGMA {nom} = {valeur}')
+
+
+def configurer_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = {}
+    journal = getattr(settings, 'SQLITE_JOURNAL_MODE', None)
+    lecture_seule = (connection.settings_dict.get('OPTIONS', {}).get('uri')
+                     and 'mode=ro' in str(connection.settings_dict['NAME']))
+    if journal and not lecture_seule:
+        # En premier : doit précéder toute transaction
+        pragmas['journal_mode'] = journal
+    pragmas.update(get_pragmas())
+    with connection.cursor() as cursor:
+        appliquer_pragmas(cursor, pragmas)
+
+
+class ReadReplicaRouter:
+    """
+    Lectures sur DATABASE_READ_ALIAS (si déclaré dans DATABASES), écritures sur
+    `default`. Dans une transaction ouverte sur `default`, les lectures y
+    restent pour voir les écritures non encore validées.
+    """
+
+    def read_alias(self):
+        alias = getattr(settings, 'DATABASE_READ_ALIAS', 'replica')
+        return alias if alias in settings.DATABASES else None
+
+    def db_for_read(self, model, **hints):
+        alias = self.read_alias()
+        if alias is None or connections['default'].in_atomic_block:
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Même base physique
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
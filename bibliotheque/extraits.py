@@ -0,0 +1,53 @@
+"""
+Extrait, nombre de mots et temps de lecture des articles.
+
+Calculés à l'enregistrement (Article.save, bulk_create, bulk_update) et
+stockés : les pages de liste affichent `extrait` sans lire `contenu`
+(.defer('contenu')) ni le découper à chaque rendu. `remplir()` recalcule les
+articles existants par lots (commande backfill_excerpts ; la migration 0009
+en garde sa propre copie).
+"""
+import math
+
+from django.utils.text import Truncator
+
+MOTS_EXTRAIT = 30
+MOTS_PAR_MINUTE = 200
+CHAMPS = ('extrait', 'nombre_mots', 'temps_lecture')
+
+
+def resumer(contenu):
+    """(extrait, nombre de mots, temps de lecture en minutes) d'un contenu"""
+    contenu = contenu or ''
+    nombre_mots = len(contenu.split())
+    # Même découpage que le filtre truncatewords de l'ancien gabarit
+    extrait = Truncator(contenu).words(MOTS_EXTRAIT, truncate=' …')
+    return extrait, nombre_mots, math.ceil(nombre_mots / MOTS_PAR_MINUTE)
+
+
+def calculer(article):
+    """Renseigne les champs dérivés de `article` à partir de son contenu"""
+    article.extrait, article.nombre_mots, article.temps_lecture = resumer(article.contenu)
+
+
+def remplir(queryset, taille_lot=1000):
+    """
+    Recalcule les champs dérivés des articles de `queryset`, par lots de
+    `taille_lot` parcourus par clé primaire ; renvoie le nombre d'articles modifiés.
+    """
+    modifies, dernier = 0, None
+    queryset = queryset.order_by('pk').only('pk', 'contenu', *CHAMPS)
+    while True:
+        lot = queryset if dernier is None else queryset.filter(pk__gt=dernier)
+        lot = list(lot[:taille_lot])
+        if not lot:
+            return modifies
+        a_jour = []
+        for article in lot:
+            avant = tuple(getattr(article, champ) for champ in CHAMPS)
+            calculer(article)
+            if tuple(getattr(article, champ) for champ in CHAMPS) != avant:
+                a_jour.append(article)
+        queryset.bulk_update(a_jour, CHAMPS)
+        modifies += len(a_jour)
+        dernier = lot[-1].pk
@@ -0,0 +1,192 @@
+"""
+Sérialisation compilée des listes : tuples .values_list() au lieu d'instances.
+
+Un ModelSerializer construit une instance de modèle par ligne puis appelle,
+pour chaque champ, get_attribute() et to_representation(). Pour une liste
+en lecture seule, compiler() fait ce travail une fois par serializer : chaque
+champ devient une colonne (`categorie__nom`, `owner__username`) et une
+conversion (dates ISO 8601, identité pour le reste), puis le plan est
+traduit en une fonction Python générée qui construit le dictionnaire de
+sortie d'un tuple, sans appel par champ :
+
+    def convertir(l):
+        return {'id': l[0], 'titre': l[1], 'date_sortie': None if l[2] is None else l[2].isoformat(), ...}
+
+La sortie est identique à celle du serializer (mêmes clés, même ordre).
+Champs pris en charge : champs de modèle simples (y compris via `source`
+pointé), clés étrangères (PrimaryKeyRelatedField), StringRelatedField vers
+l'utilisateur, serializers imbriqués non multiples composés de ces champs.
+Pour tout autre champ (SerializerMethodField, relations multiples...),
+compiler() renvoie None et la vue garde le serializer.
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Types dont la valeur lue en base est déjà la représentation du serializer
+IDENTITE = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+_cache = {}
+
+
+class Plan:
+    def __init__(self, champs, colonnes):
+        # champs : [(nom, colonne, conversion, sous-plan)] ; conversion : None, 'date' ou 'horodatage'
+        self.champs = champs
+        self.colonnes = colonnes
+        self.fonctions = {}
+
+    def dates(self):
+        """Colonnes date et date-heure, sous-plans compris"""
+        dates = set()
+        for nom, colonne, conversion, sous_plan in self.champs:
+            if sous_plan is not None:
+                dates |= sous_plan.dates()
+            elif conversion is not None:
+                dates.add(colonne)
+        return dates
+
+    def expression(self, positions, texte):
+        """Expression Python du dictionnaire de sortie, `l` étant la ligne"""
+        elements = []
+        for nom, colonne, conversion, sous_plan in self.champs:
+            valeur = f'l[{positions[colonne]}]'
+            if sous_plan is not None:
+                expression = f'None if {valeur} is None else {sous_plan.expression(positions, texte)}'
+            elif conversion is None or (texte and conversion == 'date'):
+                expression = valeur
+            elif texte:
+                # Texte stocké par Django : 'AAAA-MM-JJ HH:MM:SS[.ffffff]' (UTC)
+                expression = f"None if {valeur} is None else {valeur}.replace(' ', 'T') + 'Z'"
+            elif conversion == 'date':
+                expression = f'None if {valeur} is None else {valeur}.isoformat()'
+            else:
+                expression = f'None if {valeur} is None else horodatage({valeur})'
+            elements.append(f'{nom!r}: {expression}')
+        return '{' + ', '.join(elements) + '}'
+
+    def fonction(self, positions, texte):
+        """Fonction ligne -> dictionnaire, compilée une fois par disposition des colonnes"""
+        cle = (tuple(sorted(positions.items())), texte)
+        code = self.fonctions.get(cle)
+        if code is None:
+            source = f'def convertir(l):\n    return {self.expression(positions, texte)}\n'
+            code = self.fonctions[cle] = compile(source, f'<plan {id(self):x}>', 'exec')
+        return code
+
+    def lignes(self, queryset, en_plus=()):
+        """
+        Queryset .values_list() des colonnes du plan, suivies des colonnes
+        `en_plus` (tri de la pagination keyset), et fonction de conversion
+        d'une ligne. Sous SQLite en UTC, dates et dates-heures sont lues en
+        texte (CAST) : ni conversion en date à la lecture ni isoformat() ensuite.
+        """
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        connection = connections[queryset.db]
+        texte = (tz is not None and tz.utcoffset(None) == datetime.timedelta(0)
+                 and connection.vendor == 'sqlite' and connection.timezone_name == 'UTC')
+        dates = self.dates() if texte else set()
+
+        simples = list(dict.fromkeys([c for c in self.colonnes if c not in dates] + list(en_plus)))
+        textes = {f'_texte_{i}': colonne for i, colonne in enumerate(c for c in self.colonnes if c in dates)}
+        positions = {colonne: i for i, colonne in enumerate(simples)}
+        positions.update({colonne: len(simples) + i for i, colonne in enumerate(textes.values())})
+        if textes:
+            queryset = queryset.annotate(**{
+                alias: Cast(colonne, TextField()) for alias, colonne in textes.items()
+            })
+
+        espace = {'horodatage': _horodatage(tz)}
+        exec(self.fonction(positions, texte), espace)
+        return queryset.values_list(*simples, *textes), espace['convertir']
+
+
+def _horodatage(tz):
+    """DateTimeField.to_representation de DRF pour le fuseau `tz`"""
+    if tz is not None and tz.utcoffset(None) == datetime.timedelta(0):
+        # Fuseau UTC : les valeurs lues (UTC) sont déjà dans le bon fuseau
+        tz = datetime.timezone.utc
+
+    def convertir(valeur):
+        if valeur.tzinfo is tz:
+            pass
+        elif tz is not None:
+            valeur = valeur.astimezone(tz) if timezone.is_aware(valeur) else timezone.make_aware(valeur, tz)
+        elif timezone.is_aware(valeur):
+            valeur = timezone.make_naive(valeur, datetime.timezone.utc)
+        valeur = valeur.isoformat()
+        return valeur[:-6] + 'Z' if valeur.endswith('+00:00') else valeur
+    return convertir
+
+
+def compiler(serializer, prefixe=''):
+    """Plan des champs de `serializer` (instance), ou None si un champ n'est pas pris en charge"""
+    champs, colonnes = [], []
+    for nom, champ in serializer.fields.items():
+        if champ.write_only:
+            continue
+        if champ.source == '*' or isinstance(champ, (serializers.ListSerializer, serializers.ManyRelatedField)):
+            return None
+        colonne = prefixe + champ.source.replace('.', '__')
+        conversion = sous_plan = None
+
+        if isinstance(champ, serializers.ModelSerializer):
+            sous_plan = compiler(champ, prefixe=colonne + '__')
+            if sous_plan is None:
+                return None
+            colonne = f'{colonne}__{champ.Meta.model._meta.pk.name}'
+            colonnes.append(colonne)
+            colonnes.extend(sous_plan.colonnes)
+        elif isinstance(champ, serializers.StringRelatedField):
+            # str(user) == user.get_username()
+            if _modele_lie(champ) is not get_user_model():
+                return None
+            colonne = f'{colonne}__{get_user_model().USERNAME_FIELD}'
+        elif isinstance(champ, serializers.PrimaryKeyRelatedField):
+            if champ.pk_field is not None:
+                return None
+        elif isinstance(champ, serializers.DateTimeField):
+            if getattr(champ, 'format', api_settings.DATETIME_FORMAT) != ISO_8601 or hasattr(champ, 'timezone'):
+                return None
+            conversion = 'horodatage'
+        elif isinstance(champ, serializers.DateField):
+            if getattr(champ, 'format', api_settings.DATE_FORMAT) != ISO_8601:
+                return None
+            conversion = 'date'
+        elif not isinstance(champ, IDENTITE):
+            return None
+        if sous_plan is None:
+            colonnes.append(colonne)
+        champs.append((nom, colonne, conversion, sous_plan))
+    return Plan(champs, list(dict.fromkeys(colonnes)))
+
+
+def _modele_lie(champ):
+    model = champ.parent.Meta.model
+    for nom in champ.source.split('.'):
+        model = model._meta.get_field(nom).related_model
+        if model is None:
+            return None
+    return model
+
+
+def plan_pour(view):
+    """
+    Plan du serializer de la vue, mis en cache par classe de serializer et
+    jeu de champs (?fields= / ?omit=) : le serializer n'est construit qu'une fois
+    """
+    serializer_class = view.get_serializer_class()
+    selection = None
+    if hasattr(serializer_class, 'champs_selectionnes'):
+        selection = serializer_class.champs_selectionnes(view.request)
+    cle = (serializer_class, frozenset(selection) if selection is not None else None)
+    if cle not in _cache:
+        _cache[cle] = compiler(view.get_serializer())
+    return _cache[cle]
@@ -0,0 +1,185 @@
+"""
+Filtres déclaratifs des endpoints de l'API.
+
+Un ViewSet déclare ses filtres dans `filtres` (paramètre -> Filtre) ;
+FiltresBackend, filter backend par défaut de DRF, les applique aux actions
+list et retrieve :
+
+    filtres = {'auteur': FiltreCle(), 'date_sortie': FiltreDate()}
+
+    ?auteur=3              ?auteur=3,7
+    ?date_sortie=1862-01-01
+    ?date_sortie__gte=1850-01-01&date_sortie__lte=1900-12-31
+    ?date_sortie__year=1862    ?date_sortie__month=1862-04
+
+Les valeurs sont validées (400 détaillant chaque paramètre invalide). Les
+prédicats d'année, de mois ou de jour deviennent des intervalles semi-ouverts
+`debut <= champ < fin` sur la colonne nue : jamais de fonction appliquée à la
+colonne (strftime, django_date_extract...), l'index du champ reste utilisable.
+Les paramètres inconnus (search, page, expand...) sont ignorés.
+
+ProjectionBackend restreint les colonnes lues aux champs demandés par
+?fields= / ?omit= (voir serializers.SparseFieldsetMixin).
+"""
+import abc
+import datetime
+
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class Filtre(abc.ABC):
+    """Filtre d'un paramètre ; `champ` vaut par défaut le nom du paramètre"""
+    lookups = ('',)
+
+    def __init__(self, champ=None):
+        self.champ = champ
+
+    @abc.abstractmethod
+    def filtrer(self, queryset, champ, lookup, valeur):
+        """Queryset filtré ; ValueError (message destiné au client) si la valeur est invalide"""
+
+
+class FiltreCle(Filtre):
+    """Identifiant (clé étrangère, id) ; plusieurs séparés par des virgules"""
+
+    def filtrer(self, queryset, champ, lookup, valeur):
+        try:
+            pks = [int(pk) for pk in valeur.split(',')]
+        except ValueError:
+            raise ValueError('Identifiant entier attendu (plusieurs séparés par des virgules).')
+        if len(pks) == 1:
+            return queryset.filter(**{champ: pks[0]})
+        return queryset.filter(**{f'{champ}__in': pks})
+
+
+class FiltreBooleen(Filtre):
+    VALEURS = {'true': True, '1': True, 'false': False, '0': False}
+
+    def filtrer(self, queryset, champ, lookup, valeur):
+        if valeur.lower() not in self.VALEURS:
+            raise ValueError("Valeurs possibles : 'true', 'false'.")
+        return queryset.filter(**{champ: self.VALEURS[valeur.lower()]})
+
+
+class FiltreDate(Filtre):
+    """
+    Champ DateField ou DateTimeField. Sans suffixe, `year` et `month` : la
+    période entière ; `gte`/`lte` : bornes incluses, `gt`/`lt` : exclues.
+    Une date donnée pour un DateTimeField vaut la journée entière dans le
+    fuseau courant ; un DateTimeField accepte aussi un instant ISO 8601.
+    """
+    lookups = ('', 'gte', 'lte', 'gt', 'lt', 'year', 'month')
+
+    def filtrer(self, queryset, champ, lookup, valeur):
+        horodate = isinstance(queryset.model._meta.get_field(champ), models.DateTimeField)
+        if lookup == 'year':
+            debut, fin = self.annee(valeur)
+        elif lookup == 'month':
+            debut, fin = self.mois(valeur)
+        else:
+            debut, fin = self.jour(valeur, horodate)
+
+        if lookup in ('', 'year', 'month'):
+            # Un instant (debut == fin) est une égalité, une date la journée entière
+            conditions = {f'{champ}__gte': debut, f'{champ}__lt': fin} if debut != fin else {champ: debut}
+        else:
+            conditions = {
+                'gte': {f'{champ}__gte': debut},
+                'gt': {f'{champ}__gte': fin} if debut != fin else {f'{champ}__gt': fin},
+                'lte': {f'{champ}__lt': fin} if debut != fin else {f'{champ}__lte': fin},
+                'lt': {f'{champ}__lt': debut},
+            }[lookup]
+        if horodate:
+            conditions = {cle: self.instant(borne) for cle, borne in conditions.items()}
+        return queryset.filter(**conditions)
+
+    @staticmethod
+    def annee(valeur):
+        try:
+            annee = int(valeur)
+            return datetime.date(annee, 1, 1), datetime.date(annee + 1, 1, 1)
+        except (ValueError, OverflowError):
+            raise ValueError('Année attendue (AAAA).')
+
+    @staticmethod
+    def mois(valeur):
+        try:
+            annee, mois = (int(partie) for partie in valeur.split('-'))
+            debut = datetime.date(annee, mois, 1)
+            return debut, (debut + datetime.timedelta(days=31)).replace(day=1)
+        except (ValueError, OverflowError):
+            raise ValueError('Mois attendu (AAAA-MM).')
+
+    @staticmethod
+    def jour(valeur, horodate):
+        """Intervalle [debut, fin) d'une date ; un instant (DateTimeField) donne debut == fin"""
+        try:
+            date = parse_date(valeur)
+            if date is not None:
+                return date, date + datetime.timedelta(days=1)
+            instant = parse_datetime(valeur) if horodate else None
+        except (ValueError, OverflowError):
+            instant = None
+        if instant is None:
+            raise ValueError('Date attendue (AAAA-MM-JJ).' if not horodate else
+                             'Date (AAAA-MM-JJ) ou date et heure ISO 8601 attendue.')
+        return instant, instant
+
+    @staticmethod
+    def instant(borne):
+        if isinstance(borne, datetime.datetime):
+            return borne if timezone.is_aware(borne) else timezone.make_aware(borne)
+        return timezone.make_aware(datetime.datetime.combine(borne, datetime.time.min))
+
+
+class FiltreApresAnnee(FiltreDate):
+    """?year=<année> historique d'AuteurViewSet : strictement après l'année donnée"""
+    lookups = ('',)
+
+    def filtrer(self, queryset, champ, lookup, valeur):
+        return queryset.filter(**{f'{champ}__gte': self.annee(valeur)[1]})
+
+
+def filtrer(queryset, params, filtres):
+    """Applique `filtres` (paramètre -> Filtre) aux paramètres de requête `params`"""
+    erreurs = {}
+    for param, valeur in params.items():
+        nom, _, lookup = param.partition('__')
+        filtre = filtres.get(nom)
+        if filtre is None or lookup not in filtre.lookups:
+            continue
+        try:
+            queryset = filtre.filtrer(queryset, filtre.champ or nom, lookup, valeur)
+        except ValueError as exc:
+            erreurs[param] = [str(exc)]
+    if erreurs:
+        raise ValidationError(erreurs)
+    return queryset
+
+
+class FiltresBackend(BaseFilterBackend):
+    """Filter backend DRF : filtres déclarés dans l'attribut `filtres` de la vue"""
+
+    def filter_queryset(self, request, queryset, view):
+        filtres = getattr(view, 'filtres', None)
+        if not filtres:
+            return queryset
+        return filtrer(queryset, request.query_params, filtres)
+
+
+class ProjectionBackend(BaseFilterBackend):
+    """
+    Lectures avec ?fields= / ?omit= : les colonnes dont aucun champ renvoyé
+    n'a besoin (contenu...) sont différées et ne sont pas lues en base.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        serializer_class = view.get_serializer_class()
+        if not hasattr(serializer_class, 'colonnes_differees'):
+            return queryset
+        differees = serializer_class.colonnes_differees(request, queryset.model)
+        return queryset.defer(*differees) if differees else queryset
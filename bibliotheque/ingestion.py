@@ -0,0 +1,220 @@
+"""
+Ingestion différée (write-behind) des commentaires et feedbacks.
+
+Sans elle, chaque soumission est un INSERT synchrone : sous SQLite, une
+rafale d'écritures se sérialise sur le verrou de la base et bloque les
+lectures. Avec INGESTION['ENABLED'], la vue valide la soumission puis
+l'ajoute à une file durable, une base SQLite dédiée (WAL) distincte de la
+base principale, et répond aussitôt (202 pour l'API). La file est vidée
+par lots de BATCH_SIZE avec un bulk_create par modèle :
+
+- par un thread du processus web (WORKER_THREAD), réveillé quand BATCH_SIZE
+  soumissions attendent ou au plus tard toutes les FLUSH_INTERVAL secondes ;
+- ou par un processus dédié : `manage.py flush_ingestion --loop`.
+
+Chaque lot est retiré de la file dans une transaction BEGIN IMMEDIATE :
+plusieurs processus peuvent vider la même file sans traiter deux fois une
+ligne. Le lot n'est supprimé de la file qu'après l'insertion dans la base
+principale (au moins une fois : un arrêt brutal entre les deux commits peut
+dupliquer le lot). Une ligne refusée par la base (article supprimé entre
+temps...) est journalisée sur `bibliotheque.ingestion` puis abandonnée.
+
+Les dates auto_now_add sont celles de l'insertion, au plus FLUSH_INTERVAL
+après la soumission.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+
+logger = logging.getLogger('bibliotheque.ingestion')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'PATH': None,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'WORKER_THREAD': True,
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'INGESTION', {})}
+    if config['PATH'] is None:
+        config['PATH'] = settings.BASE_DIR / 'ingestion.sqlite3'
+    return config
+
+
+def active():
+    return get_config()['ENABLED']
+
+
+class File:
+    """File durable de soumissions (modèle, champs en JSON) dans un fichier SQLite"""
+
+    def __init__(self, path, timeout=5.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self.local = threading.local()
+        self.initialisee = False
+        self.verrou = threading.Lock()
+
+    def connection(self):
+        connexion = getattr(self.local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connexion.execute('PRAGMA synchronous=NORMAL')
+            with self.verrou:
+                # Mode WAL (persistant dans le fichier) et table : une fois par
+                # processus, pas à chaque thread (verrou exclusif sur la file)
+                if not self.initialisee:
+                    connexion.execute('PRAGMA journal_mode=WAL')
+                    connexion.execute(
+                        'CREATE TABLE IF NOT EXISTS soumission (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                        'modele TEXT NOT NULL, champs TEXT NOT NULL, recu REAL NOT NULL)'
+                    )
+                    self.initialisee = True
+            self.local.connexion = connexion
+        return connexion
+
+    def ajouter(self, modele, champs):
+        self.connection().execute(
+            'INSERT INTO soumission (modele, champs, recu) VALUES (?, ?, ?)',
+            [modele, json.dumps(champs, ensure_ascii=False), time.time()],
+        )
+
+    def taille(self):
+        return self.connection().execute('SELECT count(*) FROM soumission').fetchone()[0]
+
+    def traiter(self, taille_lot, inserer):
+        """
+        Retire les `taille_lot` plus anciennes soumissions et les passe à
+        inserer([(modèle, champs)]) ; rien n'est retiré si inserer échoue.
+        Renvoie le nombre de soumissions retirées.
+        """
+        connexion = self.connection()
+        connexion.execute('BEGIN IMMEDIATE')
+        try:
+            lignes = connexion.execute(
+                'SELECT id, modele, champs FROM soumission ORDER BY id LIMIT ?', [taille_lot]
+            ).fetchall()
+            if lignes:
+                inserer([(modele, json.loads(champs)) for _, modele, champs in lignes])
+                connexion.execute('DELETE FROM soumission WHERE id <= ?', [lignes[-1][0]])
+            connexion.execute('COMMIT')
+        except BaseException:
+            connexion.execute('ROLLBACK')
+            raise
+        return len(lignes)
+
+
+_files = {}
+_verrou = threading.Lock()
+
+
+def get_file():
+    path = str(get_config()['PATH'])
+    with _verrou:
+        if path not in _files:
+            _files[path] = File(path)
+        return _files[path]
+
+
+def inserer(soumissions):
+    """bulk_create par modèle dans la base principale ; lignes refusées journalisées et abandonnées"""
+    from .signals import ecriture_en_masse
+
+    par_modele = {}
+    for modele, champs in soumissions:
+        par_modele.setdefault(modele, []).append(champs)
+    for modele, lignes in par_modele.items():
+        model = apps.get_model(modele)
+        objs = [model(**champs) for champs in lignes]
+        base = router.db_for_write(model)
+        try:
+            with transaction.atomic(using=base):
+                model.objects.using(base).bulk_create(objs)
+        except DatabaseError:
+            # Une ligne invalide ne doit pas bloquer la file : insertion une à une
+            objs = [obj for obj in (_inserer_seul(model, base, champs) for champs in lignes) if obj is not None]
+        ecriture_en_masse(model, [obj.pk for obj in objs])
+
+
+def _inserer_seul(model, base, champs):
+    try:
+        with transaction.atomic(using=base):
+            return model.objects.using(base).bulk_create([model(**champs)])[0]
+    except DatabaseError:
+        logger.exception('Soumission %s abandonnée : %s', model._meta.label_lower, champs)
+        return None
+
+
+def vider(taille_lot=None, file=None):
+    """Vide toute la file (par défaut celle configurée) ; renvoie le nombre de soumissions traitées"""
+    taille_lot = taille_lot or get_config()['BATCH_SIZE']
+    file = file or get_file()
+    total = 0
+    while True:
+        traitees = file.traiter(taille_lot, inserer)
+        total += traitees
+        if traitees < taille_lot:
+            return total
+
+
+class Vidage(threading.Thread):
+    """
+    Thread de vidage du processus : lot plein (reveiller) ou FLUSH_INTERVAL
+    écoulé. S'arrête après un dernier vidage si la configuration change.
+    """
+
+    def __init__(self, file):
+        super().__init__(name='ingestion', daemon=True)
+        self.file = file
+        self.evenement = threading.Event()
+        self.en_attente = 0
+
+    def reveiller(self):
+        self.en_attente += 1
+        if self.en_attente >= get_config()['BATCH_SIZE']:
+            self.evenement.set()
+
+    def actif(self):
+        return active() and get_file() is self.file
+
+    def run(self):
+        actif = True
+        while actif:
+            self.evenement.wait(get_config()['FLUSH_INTERVAL'])
+            self.evenement.clear()
+            self.en_attente = 0
+            actif = self.actif()
+            try:
+                vider(file=self.file)
+            except Exception:
+                logger.exception('Vidage de la file d\'ingestion en échec')
+            finally:
+                connections.close_all()
+
+
+_vidage = None
+
+
+def soumettre(model, champs):
+    """
+    Ajoute une soumission validée (`champs` : attributs du modèle sérialisables
+    en JSON, clés étrangères en `<champ>_id`) à la file
+    """
+    global _vidage
+    file = get_file()
+    file.ajouter(model._meta.label_lower, champs)
+    if get_config()['WORKER_THREAD']:
+        with _verrou:
+            if _vidage is None or not _vidage.is_alive() or _vidage.file is not file:
+                _vidage = Vidage(file)
+                _vidage.start()
+        _vidage.reveiller()
@@ -0,0 +1,305 @@
+"""
+Instrumentation des requêtes : SQL, temps par phase, N+1, histogrammes.
+
+InstrumentationMiddleware ouvre une Mesure par requête, rendue visible à
+tout le code de la requête par une ContextVar (propagée par asgiref aux vues
+async et à l'ORM async). Un execute_wrapper installé sur chaque connexion
+compte et chronomètre les requêtes SQL de la Mesure courante et relève leur
+empreinte (SQL normalisé) : une même empreinte répétée au moins
+DUPLICATE_THRESHOLD fois signale un N+1 probable.
+
+Phases :
+- db : temps SQL, quelle que soit la phase
+- throttle : throttling DRF (voir throttling.py), hors SQL
+- serialize : sérialisation DRF ou plan compilé (voir mixins.py), hors SQL
+- render : rendu des TemplateResponse / Response DRF (gabarit, JSON), hors SQL
+- app : le reste (middlewares, vue)
+
+Chaque réponse reçoit un en-tête Server-Timing ; les requêtes lentes (durée
+ou nombre de requêtes SQL au-delà des seuils) sont journalisées sur le logger
+`bibliotheque.instrumentation` avec toutes les mesures. Les durées sont
+agrégées en histogrammes par route, propres à chaque processus, exposés par
+/api/instrumentation/ (staff).
+
+Désactivée (INSTRUMENTATION['ENABLED'] = False), le middleware se retire de
+la chaîne et aucun wrapper n'est installé.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('bibliotheque.instrumentation')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_QUERY_COUNT': 50,
+    'DUPLICATE_THRESHOLD': 3,
+}
+
+# Bornes supérieures (ms) des classes des histogrammes ; la dernière est ouverte
+BORNES = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_courante = ContextVar('bibliotheque_mesure', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+def nom_route(route):
+    """Gabarit lisible : `api/livres/(?P<pk>[^/.]+)/$` -> `api/livres/<pk>/`"""
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', route)
+    return route.replace('^', '').replace('$', '')
+
+
+def empreinte(sql):
+    """SQL normalisé : listes IN et littéraux numériques remplacés"""
+    sql = re.sub(r'IN \((?:%s, )*%s\)', 'IN (...)', sql)
+    return re.sub(r'\b\d+\b', '?', sql)
+
+
+class Mesure:
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.requetes = 0
+        self.duree_sql = 0.0
+        self.empreintes = Counter()
+        self.phases = defaultdict(float)
+        self.debut_rendu = None
+        self.sql_avant_rendu = 0.0
+        self.fin = None
+
+    def requete(self, sql, duree):
+        self.requetes += 1
+        self.duree_sql += duree
+        self.empreintes[empreinte(sql)] += 1
+
+    def doublons(self, seuil):
+        return {sql: n for sql, n in self.empreintes.items() if n >= seuil}
+
+    def terminer(self):
+        self.fin = time.perf_counter()
+
+    def durees(self):
+        """Durées par phase en ms (SQL exclu des autres phases)"""
+        total = self.fin - self.debut
+        rendu = 0.0
+        if self.debut_rendu is not None:
+            rendu = (self.fin - self.debut_rendu) - (self.duree_sql - self.sql_avant_rendu)
+        throttle = self.phases.get('throttle', 0.0)
+        serialize = self.phases.get('serialize', 0.0)
+        app = total - self.duree_sql - rendu - throttle - serialize
+        return {
+            'total': total * 1000,
+            'db': self.duree_sql * 1000,
+            'throttle': throttle * 1000,
+            'serialize': serialize * 1000,
+            'app': max(app, 0.0) * 1000,
+            'render': max(rendu, 0.0) * 1000,
+        }
+
+
+@contextmanager
+def collecter():
+    """Mesure les requêtes SQL exécutées dans le bloc (hors requête HTTP : tests, scripts)"""
+    installer()
+    mesure = Mesure()
+    jeton = _courante.set(mesure)
+    try:
+        yield mesure
+    finally:
+        _courante.reset(jeton)
+        mesure.terminer()
+
+
+@contextmanager
+def phase(nom):
+    """Chronomètre une phase de la requête courante, SQL déduit ; sans effet hors requête"""
+    mesure = _courante.get()
+    if mesure is None:
+        yield
+        return
+    debut, sql = time.perf_counter(), mesure.duree_sql
+    try:
+        yield
+    finally:
+        mesure.phases[nom] += (time.perf_counter() - debut) - (mesure.duree_sql - sql)
+
+
+# Wrapper SQL
+
+def enregistrer(execute, sql, params, many, context):
+    mesure = _courante.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        mesure.requete(sql, time.perf_counter() - debut)
+
+
+def _installer_sur(connection, **kwargs):
+    if enregistrer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(enregistrer)
+
+
+def installer():
+    """Wrapper sur les connexions déjà ouvertes et sur toutes les suivantes"""
+    connection_created.connect(_installer_sur, dispatch_uid='bibliotheque.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _installer_sur(connection)
+
+
+# Histogrammes par route
+
+class Histogrammes:
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.routes = {}
+
+    def ajouter(self, route, durees, requetes, lente):
+        with self.verrou:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = {
+                    'count': 0, 'slow': 0, 'buckets': [0] * (len(BORNES) + 1),
+                    'total_ms': 0.0, 'max_ms': 0.0, 'db_ms': 0.0, 'serialize_ms': 0.0,
+                    'queries': 0, 'max_queries': 0,
+                }
+            total = durees['total']
+            stats['count'] += 1
+            stats['slow'] += lente
+            stats['buckets'][next((i for i, b in enumerate(BORNES) if total <= b), len(BORNES))] += 1
+            stats['total_ms'] += total
+            stats['max_ms'] = max(stats['max_ms'], total)
+            stats['db_ms'] += durees['db']
+            stats['serialize_ms'] += durees['serialize']
+            stats['queries'] += requetes
+            stats['max_queries'] = max(stats['max_queries'], requetes)
+
+    def instantane(self):
+        with self.verrou:
+            routes = {route: dict(stats, buckets=list(stats['buckets'])) for route, stats in self.routes.items()}
+        for stats in routes.values():
+            n = stats['count']
+            stats['buckets'] = dict(zip([f'<={b}' for b in BORNES] + [f'>{BORNES[-1]}'], stats['buckets']))
+            stats['mean_ms'] = round(stats.pop('total_ms') / n, 3)
+            stats['mean_db_ms'] = round(stats.pop('db_ms') / n, 3)
+            stats['mean_serialize_ms'] = round(stats.pop('serialize_ms') / n, 3)
+            stats['mean_queries'] = round(stats.pop('queries') / n, 2)
+            stats['p50_ms'] = _quantile(stats['buckets'], n, 0.50)
+            stats['p95_ms'] = _quantile(stats['buckets'], n, 0.95)
+            stats['max_ms'] = round(stats['max_ms'], 3)
+        return routes
+
+    def vider(self):
+        with self.verrou:
+            self.routes.clear()
+
+
+def _quantile(buckets, n, q):
+    """Borne supérieure de la classe contenant le quantile (None si au-delà de la dernière)"""
+    cumul = 0
+    for borne, effectif in zip(BORNES + (None,), buckets.values()):
+        cumul += effectif
+        if cumul >= q * n:
+            return borne
+    return None
+
+
+histogrammes = Histogrammes()
+
+
+# Middleware
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        installer()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mesure = Mesure()
+        jeton = _courante.set(mesure)
+        try:
+            response = self.get_response(request)
+        finally:
+            _courante.reset(jeton)
+        return self.conclure(request, response, mesure)
+
+    async def __acall__(self, request):
+        mesure = Mesure()
+        jeton = _courante.set(mesure)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _courante.reset(jeton)
+        return self.conclure(request, response, mesure)
+
+    def process_template_response(self, request, response):
+        # Appelé juste avant le rendu (gabarit, renderer DRF)
+        mesure = _courante.get()
+        if mesure is not None:
+            mesure.debut_rendu = time.perf_counter()
+            mesure.sql_avant_rendu = mesure.duree_sql
+        return response
+
+    def conclure(self, request, response, mesure):
+        mesure.terminer()
+        config = get_config()
+        durees = mesure.durees()
+        doublons = mesure.doublons(config['DUPLICATE_THRESHOLD'])
+
+        if config['SERVER_TIMING']:
+            entrees = [
+                f'db;dur={durees["db"]:.2f};desc="{mesure.requetes} req"',
+                f'throttle;dur={durees["throttle"]:.2f}',
+                f'serialize;dur={durees["serialize"]:.2f}',
+                f'app;dur={durees["app"]:.2f}',
+                f'render;dur={durees["render"]:.2f}',
+                f'total;dur={durees["total"]:.2f}',
+            ]
+            if doublons:
+                entrees.append(f'dup;desc="{len(doublons)} N+1"')
+            response['Server-Timing'] = ', '.join(entrees)
+
+        match = getattr(request, 'resolver_match', None)
+        route = f'{request.method} /{nom_route(match.route)}' if match else f'{request.method} (non résolue)'
+        lente = durees['total'] >= config['SLOW_REQUEST_MS'] or mesure.requetes >= config['SLOW_QUERY_COUNT']
+        histogrammes.ajouter(route, durees, mesure.requetes, lente)
+
+        if lente:
+            donnees = {
+                'route': route,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'queries': mesure.requetes,
+                'ms': {nom: round(valeur, 2) for nom, valeur in durees.items()},
+                'duplicates': doublons,
+            }
+            logger.warning('Requête lente %s', json.dumps(donnees, ensure_ascii=False),
+                           extra={'instrumentation': donnees})
+        return response
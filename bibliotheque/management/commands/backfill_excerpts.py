@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bibliotheque import extraits
+from bibliotheque.models import Article
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule l'extrait, le nombre de mots et le temps de lecture des articles "
+        "(contenu modifié par update(), SQL ou import hors de l'ORM)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Articles lus et écrits par lot')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size doit être positif.')
+        modifies = extraits.remplir(Article.objects.all(), taille_lot=options['batch_size'])
+        if modifies:
+            self.stdout.write(self.style.WARNING(f"{modifies} article(s) mis à jour."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Extraits à jour."))
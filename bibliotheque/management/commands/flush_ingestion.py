@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from bibliotheque import ingestion
+
+
+class Command(BaseCommand):
+    help = (
+        "Insère dans la base les commentaires et feedbacks en attente dans la file d'ingestion "
+        "(INGESTION) ; avec --loop, vide la file en continu (processus dédié, WORKER_THREAD = False)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Vide la file toutes les FLUSH_INTERVAL secondes')
+        parser.add_argument('--batch-size', type=int, help='Soumissions par lot (défaut : BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            total = ingestion.vider(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"{total} soumission(s) insérée(s)."))
+            return
+        while True:
+            total = ingestion.vider(options['batch_size'])
+            if total:
+                self.stdout.write(f"{total} soumission(s) insérée(s).")
+            connections.close_all()
+            time.sleep(ingestion.get_config()['FLUSH_INTERVAL'])
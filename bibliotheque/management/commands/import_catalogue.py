@@ -0,0 +1,250 @@
+import csv
+import datetime
+import json
+import os
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bibliotheque.models import Auteur, Livre, Categorie, Article
+from bibliotheque.signals import ecriture_en_masse
+
+
+class Rejet(Exception):
+    pass
+
+
+def _date(valeur):
+    try:
+        return datetime.date.fromisoformat(str(valeur).strip())
+    except ValueError:
+        raise Rejet(f'date invalide : {valeur!r}')
+
+
+def _texte(ligne, champ, max_length=None):
+    valeur = (ligne.get(champ) or '').strip()
+    if not valeur:
+        raise Rejet(f'{champ} manquant')
+    if max_length and len(valeur) > max_length:
+        raise Rejet(f'{champ} trop long')
+    return valeur
+
+
+def _identifiant(valeur, connus, champ):
+    try:
+        pk = int(valeur)
+    except (TypeError, ValueError):
+        raise Rejet(f'{champ} invalide : {valeur!r}')
+    if pk not in connus:
+        raise Rejet(f'{champ} inconnu : {pk}')
+    return pk
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe en flux un fichier CSV ou JSONL d'auteurs, livres, catégories ou "
+        "articles, par lots bulk_create, avec reprise sur point de contrôle "
+        "(position en octets : la reprise ne relit pas le début du fichier)"
+    )
+
+    TYPES = {
+        'auteurs': Auteur,
+        'livres': Livre,
+        'categories': Categorie,
+        'articles': Article,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=list(self.TYPES))
+        parser.add_argument('fichier')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="Format du fichier (déduit de l'extension par défaut)")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Nombre de lignes insérées par transaction (défaut : 1000)')
+        parser.add_argument('--checkpoint',
+                            help='Fichier de point de contrôle (défaut : <fichier>.checkpoint)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore le point de contrôle existant et reprend du début')
+
+    def handle(self, *args, **options):
+        chemin = Path(options['fichier'])
+        if not chemin.exists():
+            raise CommandError(f'Fichier introuvable : {chemin}')
+        format_ = options['format'] or chemin.suffix.lstrip('.').lower()
+        if format_ not in ('csv', 'jsonl'):
+            raise CommandError('Format inconnu : utiliser --format csv ou --format jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size doit être positif')
+
+        self.model = self.TYPES[options['type']]
+        self.construire = getattr(self, f"construire_{options['type']}")
+        self.charger_correspondances()
+
+        checkpoint = Path(options['checkpoint'] or f'{chemin}.checkpoint')
+        reprise = {} if options['restart'] else self.lire_checkpoint(checkpoint, chemin)
+        traitees = reprise.get('lignes', 0)
+        if traitees:
+            self.stdout.write(f'Reprise après la ligne {traitees}')
+
+        inseres = rejets = 0
+        debut = dernier_affichage = time.monotonic()
+        with chemin.open('rb') as fichier:
+            lignes = self.lire_lignes(fichier, format_, reprise.get('position', 0), reprise.get('lignes_physiques', 0))
+            if traitees and 'position' not in reprise:
+                # Point de contrôle sans position : relecture jusqu'à la reprise
+                lignes = islice(lignes, traitees, None)
+            while True:
+                lot = list(islice(lignes, options['batch_size']))
+                if not lot:
+                    break
+                lot, positions = zip(*lot)
+                objs = []
+                for numero, ligne in enumerate(lot, start=traitees + 1):
+                    try:
+                        objs.append(self.construire(ligne))
+                    except Rejet as exc:
+                        rejets += 1
+                        self.stderr.write(f'Ligne {numero} rejetée : {exc}')
+                with transaction.atomic():
+                    objs = self.model.objects.bulk_create(objs)
+                    ecriture_en_masse(self.model, [obj.pk for obj in objs])
+                self.apres_lot(objs)
+                traitees += len(lot)
+                inseres += len(objs)
+                self.ecrire_checkpoint(checkpoint, chemin, traitees, *positions[-1])
+
+                maintenant = time.monotonic()
+                if options['verbosity'] >= 2 or maintenant - dernier_affichage >= 2:
+                    dernier_affichage = maintenant
+                    self.stdout.write(
+                        f'{traitees} lignes, {inseres} insérées ({inseres / (maintenant - debut):,.0f} lignes/s)'
+                    )
+
+        checkpoint.unlink(missing_ok=True)
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f'{inseres} {options["type"]} importé(e)s, {rejets} rejet(s) en {duree:.1f} s '
+            f'({inseres / duree if duree else inseres:,.0f} lignes/s)'
+        ))
+
+    # Lecture
+
+    def lire_lignes(self, fichier, format_, position=0, lignes_physiques=0):
+        """
+        Enregistrements du fichier ouvert en binaire, chacun avec la position
+        (octet, lignes physiques lues) qui le suit. Reprise à `position` par
+        seek() : les lignes déjà importées ne sont pas relues.
+        """
+        physiques = 0
+
+        def decoder():
+            nonlocal physiques
+            for ligne in fichier:
+                physiques += 1
+                yield ligne.decode('utf-8')
+
+        lignes = decoder()
+        if format_ == 'csv':
+            lecteur = csv.DictReader(lignes)
+            lecteur.fieldnames  # en-tête, toujours en début de fichier
+            lignes = lecteur
+        if position:
+            fichier.seek(position)
+            physiques = lignes_physiques
+        for ligne in lignes:
+            if format_ == 'jsonl':
+                if not ligne.strip():
+                    continue
+                try:
+                    ligne = json.loads(ligne)
+                except json.JSONDecodeError:
+                    ligne = {'_erreur': f'JSON invalide (ligne physique {physiques})'}
+            yield ligne, (fichier.tell(), physiques)
+
+    def lire_checkpoint(self, checkpoint, chemin):
+        if not checkpoint.exists():
+            return {}
+        data = json.loads(checkpoint.read_text())
+        if data.get('fichier') != str(chemin.resolve()):
+            raise CommandError(f'{checkpoint} concerne un autre fichier ; utiliser --restart')
+        return data
+
+    def ecrire_checkpoint(self, checkpoint, chemin, lignes, position, lignes_physiques):
+        temporaire = checkpoint.with_suffix(checkpoint.suffix + '.tmp')
+        temporaire.write_text(json.dumps({
+            'fichier': str(chemin.resolve()),
+            'lignes': lignes,
+            'position': position,
+            'lignes_physiques': lignes_physiques,
+        }))
+        os.replace(temporaire, checkpoint)
+
+    # Correspondances nom -> id, chargées une fois en mémoire
+
+    def charger_correspondances(self):
+        self.auteurs, self.auteurs_ids = {}, set()
+        self.categories, self.categories_ids = {}, set()
+        if self.model is Livre:
+            for pk, nom in Auteur.objects.order_by('pk').values_list('pk', 'nom').iterator():
+                self.auteurs.setdefault(nom, pk)
+                self.auteurs_ids.add(pk)
+        if self.model in (Categorie, Article):
+            for pk, nom in Categorie.objects.order_by('pk').values_list('pk', 'nom').iterator():
+                self.categories.setdefault(nom, pk)
+                self.categories_ids.add(pk)
+
+    def apres_lot(self, objs):
+        if self.model is Categorie:
+            for categorie in objs:
+                self.categories[categorie.nom] = categorie.pk
+                self.categories_ids.add(categorie.pk)
+
+    def categorie_id(self, nom):
+        """Les catégories inconnues sont créées à la volée"""
+        if nom not in self.categories:
+            self.categories[nom] = Categorie.objects.create(nom=nom).pk
+            self.categories_ids.add(self.categories[nom])
+        return self.categories[nom]
+
+    # Construction des objets
+
+    def construire_auteurs(self, ligne):
+        self.verifier(ligne)
+        return Auteur(nom=_texte(ligne, 'nom', 100), date_naissance=_date(ligne.get('date_naissance')))
+
+    def construire_livres(self, ligne):
+        self.verifier(ligne)
+        if ligne.get('auteur_id'):
+            auteur_id = _identifiant(ligne['auteur_id'], self.auteurs_ids, 'auteur_id')
+        else:
+            nom = _texte(ligne, 'auteur')
+            if nom not in self.auteurs:
+                raise Rejet(f'auteur inconnu : {nom!r}')
+            auteur_id = self.auteurs[nom]
+        return Livre(titre=_texte(ligne, 'titre', 200), date_sortie=_date(ligne.get('date_sortie')), auteur_id=auteur_id)
+
+    def construire_categories(self, ligne):
+        self.verifier(ligne)
+        nom = _texte(ligne, 'nom', 50)
+        if nom in self.categories:
+            raise Rejet(f'catégorie déjà présente : {nom!r}')
+        # Réservée pour dédoublonner dans le lot ; l'id réel est connu après insertion
+        self.categories[nom] = None
+        return Categorie(nom=nom)
+
+    def construire_articles(self, ligne):
+        self.verifier(ligne)
+        if ligne.get('categorie_id'):
+            categorie_id = _identifiant(ligne['categorie_id'], self.categories_ids, 'categorie_id')
+        else:
+            categorie_id = self.categorie_id(_texte(ligne, 'categorie', 50))
+        return Article(titre=_texte(ligne, 'titre', 200), contenu=_texte(ligne, 'contenu'), categorie_id=categorie_id)
+
+    def verifier(self, ligne):
+        if not isinstance(ligne, dict) or not ligne:
+            raise Rejet('ligne vide')
+        if '_erreur' in ligne:
+            raise Rejet(ligne['_erreur'])
@@ -0,0 +1,184 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from bibliotheque import urls
+from bibliotheque.instrumentation import nom_route
+
+# Variantes de requêtes fréquentes en plus des URLs nues
+VARIANTES = [
+    '/api/livres/?search=paris',
+    '/api/articles/?search=django',
+    '/api/auteurs/?expand=livres',
+    '/api/auteurs/?year=1900',
+    '/api/livres/?date_sortie__year=1900',
+    '/api/articles/?date__gte=2020-01-01',
+    '/api/livres/?pagination=cursor',
+    '/api/articles/?pagination=cursor',
+    '/articles/?page=2',
+]
+
+# Routes ignorées : écriture uniquement, ou lecture volontairement complète
+EXCLUES = re.compile(r'-(bulk|export)$')
+
+BALAYAGE = re.compile(r'^SCAN (?P<table>\S+)(?P<suite>.*)$')
+TRI = re.compile(r'USE TEMP B-TREE FOR (?P<quoi>ORDER BY|GROUP BY|DISTINCT)')
+
+
+def analyser_plan(lignes):
+    """
+    Problèmes d'un plan EXPLAIN QUERY PLAN (lignes `detail`) : parcours complet
+    d'une table sans index, tri ou regroupement dans un B-tree temporaire.
+    """
+    problemes = []
+    for detail in lignes:
+        balayage = BALAYAGE.match(detail)
+        if balayage and 'INDEX' not in balayage.group('suite'):
+            problemes.append(f"parcours complet de {balayage.group('table')}")
+        tri = TRI.search(detail)
+        if tri:
+            problemes.append(f"tri temporaire ({tri.group('quoi')})")
+    return problemes
+
+
+def lister_urls(user):
+    """
+    URL de chaque route GET de bibliotheque/urls.py ; les routes de détail
+    reçoivent un pk existant (appartenant à `user` pour les modèles à propriétaire).
+    Les routes sont parcourues par gabarit, pas par nom : `article-list` désigne
+    à la fois une route du routeur DRF et une vue MVT.
+    """
+
+    def parcourir(patterns, prefixe=''):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from parcourir(pattern.url_patterns, prefixe + str(pattern.pattern))
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                yield prefixe + str(pattern.pattern), pattern
+
+    vues = []
+    for gabarit, pattern in parcourir(urls.urlpatterns):
+        if EXCLUES.search(pattern.name):
+            continue
+        # `<int:pk>` (path()) comme `(?P<pk>...)` (routeur DRF) -> `<pk>`
+        url = '/' + re.sub(r'<\w+:(\w+)>', r'<\1>', nom_route(gabarit))
+        if '<pk>' in url:
+            model = _modele(pattern.callback)
+            pk = None
+            if model is not None:
+                queryset = model.objects.order_by('pk')
+                if any(field.name == 'owner' for field in model._meta.get_fields()):
+                    queryset = queryset.filter(owner=user)
+                pk = queryset.values_list('pk', flat=True).first()
+            if pk is None:
+                continue
+            url = url.replace('<pk>', str(pk))
+        if re.search(r'[<\\]', url):
+            # Variantes à suffixe de format du routeur DRF
+            continue
+        vues.append((pattern.name, url))
+    return vues + [(url, url) for url in VARIANTES]
+
+
+def _modele(callback):
+    """Modèle servi par une vue (ViewSet DRF, vue générique Django, vue async)"""
+    cls = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+    queryset = getattr(cls, 'queryset', None)
+    if queryset is not None:
+        return queryset.model
+    return getattr(cls, 'model', None) or getattr(callback, 'model', None)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute chaque vue (API et MVT) et passe ses requêtes SQL à EXPLAIN QUERY PLAN "
+        "pour signaler parcours complets de table et tris temporaires"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail', action='store_true',
+                            help='Termine en erreur si un problème est détecté (intégration continue)')
+        parser.add_argument('--ignore', action='append', default=[], metavar='TABLE',
+                            help='Table dont les parcours complets sont acceptés (répétable)')
+        parser.add_argument('--plans', action='store_true', help='Affiche tous les plans, pas seulement les problèmes')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('index_advisor analyse les plans SQLite (EXPLAIN QUERY PLAN).')
+
+        # Premier membre du staff (et son token pour les vues async), sinon un
+        # utilisateur non enregistré : aucune écriture en base
+        staff = User.objects.filter(is_staff=True, is_active=True).order_by('pk').first()
+        if staff is None:
+            staff = User(pk=0, username='index_advisor', is_staff=True, is_superuser=True)
+        api, web = APIClient(), Client()
+        api.force_authenticate(staff)
+        token = Token.objects.filter(user_id=staff.pk).first()
+        if token is not None:
+            api.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        total = 0
+        with override_settings(ALLOWED_HOSTS=['testserver'], REST_FRAMEWORK=self.rest_framework_sans_limites()):
+            for nom, url in lister_urls(staff):
+                client = api if url.startswith('/api/') else web
+                statut, requetes = self.capturer(client, url)
+                if statut != 200:
+                    self.stdout.write(self.style.WARNING(f'{nom} ({url}) : réponse {statut}'))
+                total += self.rapporter(nom, url, requetes, options)
+
+        if total:
+            message = f'{total} problème(s) détecté(s).'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Aucun parcours complet ni tri temporaire.'))
+
+    def rest_framework_sans_limites(self):
+        from django.conf import settings
+        return {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+
+    def capturer(self, client, url):
+        requetes = []
+
+        def enregistrer(execute, sql, params, many, context):
+            requetes.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(enregistrer):
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        selects = [(sql, params) for sql, params in requetes if sql.lstrip().upper().startswith('SELECT')]
+        return response.status_code, selects
+
+    def rapporter(self, nom, url, requetes, options):
+        ignorees = set(options['ignore'])
+        problemes_route = 0
+        lignes = []
+        for sql, params in dict.fromkeys((sql, tuple(params or ())) for sql, params in requetes):
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [ligne[-1] for ligne in cursor.fetchall()]
+            problemes = [
+                p for p in analyser_plan(plan)
+                if not any(p == f'parcours complet de {table}' for table in ignorees)
+            ]
+            problemes_route += len(problemes)
+            if problemes or options['plans']:
+                lignes.append(f'    {sql[:160]}')
+                lignes.extend(f'      | {detail}' for detail in plan)
+                lignes.extend(self.style.WARNING(f'      ! {p}') for p in problemes)
+
+        statut = self.style.WARNING(f'{problemes_route} problème(s)') if problemes_route else self.style.SUCCESS('ok')
+        self.stdout.write(f'{nom} ({url}) : {len(requetes)} requête(s), {statut}')
+        for ligne in lignes:
+            self.stdout.write(ligne)
+        return problemes_route
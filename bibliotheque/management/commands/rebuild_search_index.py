@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from bibliotheque import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte (FTS5) des livres et des articles"
+
+    def handle(self, *args, **options):
+        if not search.fts_disponible():
+            raise CommandError("La recherche plein texte nécessite SQLite (FTS5).")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.reconstruire_index(cursor)
+            cursor.execute(f"SELECT count(*) FROM {search.LIVRE_FTS}")
+            livres = cursor.fetchone()[0]
+            cursor.execute(f"SELECT count(*) FROM {search.ARTICLE_FTS}")
+            articles = cursor.fetchone()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Index reconstruit : {livres} livre(s), {articles} article(s)."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from bibliotheque import counters
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs dénormalisés (statistiques, livres par auteur, articles par catégorie)"
+
+    def handle(self, *args, **options):
+        corriges = counters.recompter()
+        if corriges:
+            self.stdout.write(self.style.WARNING(f"{corriges} compteur(s) corrigé(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Compteurs à jour."))
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Index FTS5 tels que créés par cette migration (bibliotheque/search.py peut
+# évoluer ensuite, l'historique des migrations ne doit pas en dépendre)
+CREER_INDEX_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS bibliotheque_livre_fts USING fts5(titre, auteur, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS bibliotheque_article_fts USING fts5(titre, contenu, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO bibliotheque_livre_fts (rowid, titre, auteur) "
+    "SELECT l.id, l.titre, a.nom FROM bibliotheque_livre l "
+    "JOIN bibliotheque_auteur a ON a.id = l.auteur_id",
+    "INSERT INTO bibliotheque_article_fts (rowid, titre, contenu) "
+    "SELECT id, titre, contenu FROM bibliotheque_article",
+    "INSERT INTO bibliotheque_livre_fts (bibliotheque_livre_fts) VALUES ('optimize')",
+    "INSERT INTO bibliotheque_article_fts (bibliotheque_article_fts) VALUES ('optimize')",
+]
+
+SUPPRIMER_INDEX_SQL = [
+    "DROP TABLE IF EXISTS bibliotheque_livre_fts",
+    "DROP TABLE IF EXISTS bibliotheque_article_fts",
+]
+
+
+def executer(*requetes):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for sql in requetes:
+                cursor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bibliotheque', '0004_feedback_note'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            executer(*SUPPRIMER_INDEX_SQL, *CREER_INDEX_SQL),
+            executer(*SUPPRIMER_INDEX_SQL),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def initialiser_compteurs(apps, schema_editor):
+    Compteur = apps.get_model('bibliotheque', 'Compteur')
+    compteurs = []
+    for nom in ['auteur', 'livre', 'categorie', 'article', 'commentaire']:
+        total = apps.get_model('bibliotheque', nom).objects.count()
+        compteurs.append(Compteur(nom=nom, objet_id=0, valeur=total))
+    for modele, champ, nom in [('livre', 'auteur', 'auteur.livres'), ('article', 'categorie', 'categorie.articles')]:
+        lignes = (
+            apps.get_model('bibliotheque', modele).objects.order_by()
+            .values(champ).annotate(total=Count('pk')).values_list(champ, 'total')
+        )
+        compteurs += [Compteur(nom=nom, objet_id=parent, valeur=total) for parent, total in lignes]
+    Compteur.objects.bulk_create(compteurs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bibliotheque', '0005_recherche_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compteur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50)),
+                ('objet_id', models.BigIntegerField(default=0)),
+                ('valeur', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='compteur',
+            constraint=models.UniqueConstraint(fields=('nom', 'objet_id'), name='compteur_unique'),
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bibliotheque', '0006_compteur'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-date'], name='article_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['categorie', '-date'], name='article_categorie_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auteur',
+            index=models.Index(fields=['nom'], name='auteur_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auteur',
+            index=models.Index(fields=['date_naissance'], name='auteur_naissance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categorie',
+            index=models.Index(fields=['nom'], name='categorie_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentaire',
+            index=models.Index(fields=['date'], name='commentaire_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentaire',
+            index=models.Index(condition=models.Q(('actif', True)), fields=['article', 'date'], name='commentaire_actifs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['-date_creation'], name='feedback_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livre',
+            index=models.Index(fields=['titre'], name='livre_titre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livre',
+            index=models.Index(fields=['auteur', 'titre'], name='livre_auteur_titre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['owner', '-date_modification'], name='note_owner_modif_idx'),
+        ),
+    ]
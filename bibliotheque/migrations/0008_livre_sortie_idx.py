@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bibliotheque', '0007_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='livre',
+            index=models.Index(fields=['date_sortie'], name='livre_sortie_idx'),
+        ),
+    ]
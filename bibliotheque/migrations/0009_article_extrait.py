@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:34
+
+import math
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+# Calcul de bibliotheque/extraits.py au moment de cette migration, recopié :
+# l'historique des migrations ne dépend pas du module, qui peut évoluer
+MOTS_EXTRAIT = 30
+MOTS_PAR_MINUTE = 200
+TAILLE_LOT = 1000
+
+
+def resumer(contenu):
+    contenu = contenu or ''
+    nombre_mots = len(contenu.split())
+    extrait = Truncator(contenu).words(MOTS_EXTRAIT, truncate=' …')
+    return extrait, nombre_mots, math.ceil(nombre_mots / MOTS_PAR_MINUTE)
+
+
+def remplir_extraits(apps, schema_editor):
+    Article = apps.get_model('bibliotheque', 'Article')
+    articles = Article.objects.using(schema_editor.connection.alias).order_by('pk').only('pk', 'contenu')
+    dernier = 0
+    while lot := list(articles.filter(pk__gt=dernier)[:TAILLE_LOT]):
+        for article in lot:
+            article.extrait, article.nombre_mots, article.temps_lecture = resumer(article.contenu)
+        articles.bulk_update(lot, ['extrait', 'nombre_mots', 'temps_lecture'])
+        dernier = lot[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bibliotheque', '0008_livre_sortie_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='extrait',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='nombre_mots',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='temps_lecture',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='En minutes'),
+        ),
+        migrations.RunPython(remplir_extraits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def initialiser_compteurs(apps, schema_editor):
+    Compteur = apps.get_model('bibliotheque', 'Compteur')
+    Commentaire = apps.get_model('bibliotheque', 'Commentaire')
+    lignes = (
+        Commentaire.objects.filter(actif=True).order_by()
+        .values('article').annotate(total=Count('pk')).values_list('article', 'total')
+    )
+    Compteur.objects.filter(nom='article.commentaires').delete()
+    Compteur.objects.bulk_create([
+        Compteur(nom='article.commentaires', objet_id=article, valeur=total) for article, total in lignes
+    ])
+
+
+def supprimer_compteurs(apps, schema_editor):
+    apps.get_model('bibliotheque', 'Compteur').objects.filter(nom='article.commentaires').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bibliotheque', '0009_article_extrait'),
+    ]
+
+    operations = [
+        migrations.RunPython(initialiser_compteurs, supprimer_compteurs),
+    ]
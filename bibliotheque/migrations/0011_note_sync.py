@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bibliotheque', '0010_compteur_commentaires'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteSupprimee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.BigIntegerField()),
+                ('date_suppression', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['date_suppression'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['owner', 'date_modification'], name='note_owner_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='notesupprimee',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notesupprimee',
+            index=models.Index(fields=['owner', 'date_suppression'], name='note_suppr_owner_date_idx'),
+        ),
+    ]
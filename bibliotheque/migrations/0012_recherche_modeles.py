@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bibliotheque', '0011_note_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleRecherche',
+            fields=[
+                ('article', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='recherche', serialize=False, to='bibliotheque.article')),
+                ('requete', models.TextField(db_column='bibliotheque_article_fts')),
+            ],
+            options={
+                'db_table': 'bibliotheque_article_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='LivreRecherche',
+            fields=[
+                ('livre', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='recherche', serialize=False, to='bibliotheque.livre')),
+                ('requete', models.TextField(db_column='bibliotheque_livre_fts')),
+            ],
+            options={
+                'db_table': 'bibliotheque_livre_fts',
+                'managed': False,
+            },
+        ),
+    ]
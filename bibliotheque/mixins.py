@@ -0,0 +1,358 @@
+import csv
+import datetime
+import hashlib
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from . import counters, fastpath, instrumentation, search, versions
+from .pagination import KeysetPagination
+from .signals import ecriture_en_masse
+
+
+class SerializationMixin:
+    """
+    Actions list et retrieve de DRF dont la sérialisation est chronométrée à
+    part (phase serialize, voir instrumentation.py) au lieu d'être comptée
+    dans le temps de la vue.
+    """
+
+    def serialize(self, *args, **kwargs):
+        with instrumentation.phase('serialize'):
+            return self.get_serializer(*args, **kwargs).data
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize(page, many=True))
+        return Response(self.serialize(queryset, many=True))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize(self.get_object()))
+
+
+class ConditionalGetMixin(SerializationMixin):
+    """
+    Requêtes conditionnelles (ETag / Last-Modified) pour les actions list et
+    retrieve d'un ViewSet.
+
+    L'ETag est calculé à partir des versions des modèles dont dépend la réponse
+    (voir versions.py), de l'URL complète, de l'utilisateur et du format : il
+    ne coûte qu'une requête indexée, sans sérialisation, et un client à jour
+    reçoit une 304 vide. Les versions sont incrémentées après le commit et
+    partagées par tous les processus.
+    """
+    # Modèles dont dépend la représentation ; par défaut le modèle du queryset
+    conditional_models = None
+
+    def get_conditional_models(self):
+        return self.conditional_models or [self.queryset.model]
+
+    def get_etag(self, request, version):
+        valeur = '|'.join([
+            version,
+            request.get_full_path(),
+            str(request.user.pk or ''),
+            request.accepted_media_type or '',
+        ])
+        return '"%s"' % hashlib.sha1(valeur.encode()).hexdigest()
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        # Les versions sont lues avant la réponse et incrémentées après le
+        # commit des écritures : une écriture concurrente produira au pire un
+        # ETag périmé, jamais une 304 erronée
+        version, last_modified = versions.etat(*self.get_conditional_models())
+        etag = self.get_etag(request, version)
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ['Authorization', 'Accept'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class BulkActionsMixin:
+    """
+    Action `bulk` (POST/PATCH/DELETE sur <liste>/bulk/) pour créer, modifier ou
+    supprimer une liste d'objets en une seule requête HTTP et une seule
+    transaction (bulk_create / bulk_update).
+
+    Les clés étrangères de tout le lot sont chargées en une requête. Le
+    paramètre ?mode= choisit le comportement en cas d'erreur :
+    - atomic (défaut) : rien n'est écrit si un élément est invalide (400)
+    - partial : les éléments valides sont écrits, les erreurs rapportées (207)
+    """
+    bulk_max_items = 10000
+    bulk_batch_size = 500
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if getattr(self, 'bulk_related', None) is not None:
+            context['bulk_related'] = self.bulk_related
+        return context
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        mode = request.query_params.get('mode', 'atomic')
+        if mode not in ('atomic', 'partial'):
+            raise ValidationError({'mode': "Valeurs possibles : 'atomic', 'partial'."})
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Une liste est attendue.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [f'{self.bulk_max_items} éléments au maximum.']})
+
+        handler = {
+            'POST': self.bulk_create,
+            'PATCH': self.bulk_update,
+            'DELETE': self.bulk_destroy,
+        }[request.method]
+        return handler(items, mode)
+
+    def preload_related(self, items):
+        """Charge en une requête par clé étrangère les objets référencés par le lot"""
+        related = {}
+        for name, field in self.get_serializer().fields.items():
+            if not isinstance(field, PrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = set()
+            for item in items:
+                if isinstance(item, dict) and item.get(name) is not None:
+                    try:
+                        pks.add(int(item[name]))
+                    except (TypeError, ValueError):
+                        pass
+            related[name] = field.get_queryset().in_bulk(pks)
+        return related
+
+    def get_bulk_instances(self, items, errors):
+        """Objets visés par le lot, chargés en une requête ; les ids invalides ou inconnus sont des erreurs"""
+        pks = {}
+        for index, item in enumerate(items):
+            pk = item.get('id') if isinstance(item, dict) else item
+            try:
+                pks[index] = int(pk)
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'errors': {'id': ['Identifiant invalide.']}})
+        instances = self.get_queryset().in_bulk(set(pks.values()))
+        for index, pk in pks.items():
+            if pk not in instances:
+                errors.append({'index': index, 'errors': {'id': ['Objet introuvable.']}})
+                continue
+            try:
+                self.check_object_permissions(self.request, instances[pk])
+            except PermissionDenied as exc:
+                errors.append({'index': index, 'errors': {'id': [str(exc.detail)]}})
+        return pks, instances
+
+    def bulk_response(self, mode, ids, errors, success_status):
+        errors = sorted(errors, key=lambda error: error['index'])
+        if errors and mode == 'atomic':
+            return Response({'ids': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'ids': ids, 'errors': errors},
+            status=status.HTTP_207_MULTI_STATUS if errors else success_status,
+        )
+
+    def bulk_create(self, items, mode):
+        self.bulk_related = self.preload_related(items)
+        serializer = self.get_serializer()
+        model = self.get_queryset().model
+        objs, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                objs.append(model(**serializer.run_validation(item)))
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+        if errors and mode == 'atomic':
+            return self.bulk_response(mode, [], errors, status.HTTP_201_CREATED)
+
+        with transaction.atomic():
+            objs = model.objects.bulk_create(objs, batch_size=self.bulk_batch_size)
+            ecriture_en_masse(model, [obj.pk for obj in objs])
+        return self.bulk_response(mode, [obj.pk for obj in objs], errors, status.HTTP_201_CREATED)
+
+    def bulk_update(self, items, mode):
+        errors = []
+        pks, instances = self.get_bulk_instances(items, errors)
+        if errors and mode == 'atomic':
+            return self.bulk_response(mode, [], errors, status.HTTP_200_OK)
+
+        self.bulk_related = self.preload_related(items)
+        model = self.get_queryset().model
+        en_erreur = {error['index'] for error in errors}
+        parents_initiaux = {}
+        objs, fields = {}, set()
+        for index, item in enumerate(items):
+            if index in en_erreur:
+                continue
+            instance = instances[pks[index]]
+            serializer = self.get_serializer(instance, data=item, partial=True)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            if model in counters.PAR_PARENT:
+                parents_initiaux.setdefault(instance.pk, counters.parent_compte(instance))
+            for attr, value in serializer.validated_data.items():
+                setattr(instance, attr, value)
+                fields.add(attr)
+            objs[instance.pk] = instance
+        if errors and mode == 'atomic':
+            return self.bulk_response(mode, [], errors, status.HTTP_200_OK)
+
+        with transaction.atomic():
+            if fields:
+                model.objects.bulk_update(objs.values(), sorted(fields), batch_size=self.bulk_batch_size)
+            if parents_initiaux:
+                counters.deplacer_en_masse(model, parents_initiaux, objs.values())
+            ecriture_en_masse(model, list(objs))
+        return self.bulk_response(mode, list(objs), errors, status.HTTP_200_OK)
+
+    def bulk_destroy(self, items, mode):
+        errors = []
+        pks, instances = self.get_bulk_instances(items, errors)
+        if errors and mode == 'atomic':
+            return self.bulk_response(mode, [], errors, status.HTTP_200_OK)
+
+        en_erreur = {error['index'] for error in errors}
+        ids = sorted({pk for index, pk in pks.items() if index not in en_erreur})
+        with transaction.atomic():
+            # delete() déclenche post_delete : index, compteurs et versions suivent
+            self.get_queryset().model.objects.filter(pk__in=ids).delete()
+        return self.bulk_response(mode, ids, errors, status.HTTP_200_OK)
+
+
+class Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+
+class ExportMixin:
+    """
+    Action `export` : flux NDJSON (défaut) ou CSV de toute la table, via
+    ?output=ndjson|csv. Seules les colonnes `export_fields` sont lues, par lots
+    de `export_chunk_size` lignes (.iterator()) : la mémoire reste constante
+    quelle que soit la taille de la table.
+
+    ?since=<valeur> exporte seulement les lignes dont `export_since_field` est
+    strictement supérieur (date ou id du dernier export), pour un export
+    incrémental. Les lignes sont triées sur ce champ.
+    """
+    export_fields = None
+    export_since_field = 'id'
+    export_chunk_size = 2000
+
+    def get_export_queryset(self):
+        # Pas de get_queryset() : ses select_related/prefetch ne servent à rien ici
+        return self.queryset.model.objects.all()
+
+    def get_export_since(self, value):
+        field = self.queryset.model._meta.get_field(self.export_since_field)
+        try:
+            since = field.to_python(value)
+        except DjangoValidationError:
+            since = None
+        if since is None:
+            raise ValidationError({'since': 'Valeur invalide.'})
+        if isinstance(since, datetime.datetime) and timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('ndjson', 'csv'):
+            raise ValidationError({'output': "Valeurs possibles : 'ndjson', 'csv'."})
+
+        queryset = self.get_export_queryset()
+        since = request.query_params.get('since')
+        if since:
+            queryset = queryset.filter(**{f'{self.export_since_field}__gt': self.get_export_since(since)})
+        rows = (
+            queryset.order_by(self.export_since_field, 'pk')
+            .values_list(*self.export_fields)
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        columns = [field.replace('__', '_') for field in self.export_fields]
+
+        if output == 'csv':
+            content, content_type = self.stream_csv(columns, rows), 'text/csv; charset=utf-8'
+        else:
+            content, content_type = self.stream_ndjson(columns, rows), 'application/x-ndjson'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}.{output}"'
+        return response
+
+    def stream_ndjson(self, columns, rows):
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+    def stream_csv(self, columns, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class FastListMixin(SerializationMixin):
+    """
+    Action list sérialisée par un plan compilé (voir fastpath.py) : tuples
+    .values_list() joints en une requête au lieu d'instances de modèle et du
+    ModelSerializer, pour une sortie identique. Le serializer reste utilisé
+    si un champ n'est pas compilable, si `fast_list` est faux et pour les
+    recherches plein texte (champ `surlignage` calculé par la requête).
+    """
+    fast_list = True
+
+    def get_fast_plan(self, queryset):
+        if not self.fast_list or search.est_classee(queryset):
+            return None
+        return fastpath.plan_pour(self)
+
+    def get_keyset_columns(self, queryset):
+        """Colonnes de tri dont la pagination keyset tire ses curseurs (aucune sinon)"""
+        paginator = self.paginator
+        if hasattr(paginator, 'get_delegate'):
+            paginator = paginator.get_delegate(self.request)
+        if not isinstance(paginator, KeysetPagination):
+            return []
+        return [champ.lstrip('-') for champ in paginator.get_ordering(queryset, self)]
+
+    def list_response(self, queryset):
+        plan = self.get_fast_plan(queryset)
+        if plan is None:
+            return super().list_response(queryset)
+
+        lignes, convertir = plan.lignes(queryset, self.get_keyset_columns(queryset))
+        page = self.paginate_queryset(lignes)
+        with instrumentation.phase('serialize'):
+            donnees = [convertir(ligne) for ligne in (lignes if page is None else page)]
+        if page is not None:
+            return self.get_paginated_response(donnees)
+        return Response(donnees)
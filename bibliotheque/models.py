@@ -1,9 +1,78 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from . import extraits
 
-class Auteur(models.Model):
+
+class CompteurQuerySet(models.QuerySet):
+    """
+    bulk_create ne déclenche pas post_save : on met à jour les compteurs
+    dénormalisés (voir counters.py) dans la même transaction que l'insertion.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from . import counters
+
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # Impossible de savoir quelles lignes ont été insérées
+                counters.recompter(self.model)
+            else:
+                counters.ajuster(objs, +1)
+        return objs
+
+
+class ArticleQuerySet(CompteurQuerySet):
+    """bulk_create et bulk_update ne passent pas par save() : extrait et compteurs de mots calculés ici"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for article in objs:
+            extraits.calculer(article)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'contenu' in fields:
+            objs = list(objs)
+            for article in objs:
+                extraits.calculer(article)
+            fields = list(dict.fromkeys([*fields, *extraits.CHAMPS]))
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class ModeleCompte(models.Model):
+    """Modèle dont les compteurs dénormalisés sont tenus par counters.py"""
+
+    objects = CompteurQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from . import counters
+
+        instance = super().from_db(db, field_names, values)
+        # Parent compté initial : un déplacement est détecté sans relire la ligne
+        counters.memoriser_parent(instance, field_names)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # En autocommit, l'écriture serait validée avant post_save : compteurs et
+        # index de recherche (signals.py) sont mis à jour dans sa transaction
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def refresh_from_db(self, *args, **kwargs):
+        # Le parent mémorisé au chargement est peut-être périmé : relu au prochain save()
+        self.__dict__.pop('_parent_initial', None)
+        super().refresh_from_db(*args, **kwargs)
+
+
+class Auteur(ModeleCompte):
     nom = models.CharField(max_length=100)
     date_naissance = models.DateField()
 
@@ -12,9 +81,13 @@ class Auteur(models.Model):
 
     class Meta:
         ordering = ['nom']
+        indexes = [
+            models.Index(fields=['nom'], name='auteur_nom_idx'),
+            models.Index(fields=['date_naissance'], name='auteur_naissance_idx'),
+        ]
 
 
-class Livre(models.Model):
+class Livre(ModeleCompte):
     titre = models.CharField(max_length=200)
     date_sortie = models.DateField()
     auteur = models.ForeignKey(Auteur, on_delete=models.CASCADE, related_name='livres')
@@ -24,9 +97,15 @@ class Livre(models.Model):
 
     class Meta:
         ordering = ['titre']
+        indexes = [
+            models.Index(fields=['titre'], name='livre_titre_idx'),
+            models.Index(fields=['date_sortie'], name='livre_sortie_idx'),
+            # Livres d'un auteur dans l'ordre (prefetch, action titres)
+            models.Index(fields=['auteur', 'titre'], name='livre_auteur_titre_idx'),
+        ]
 
 
-class Categorie(models.Model):
+class Categorie(ModeleCompte):
     nom = models.CharField(max_length=50)
 
     def __str__(self):
@@ -34,25 +113,46 @@ class Categorie(models.Model):
 
     class Meta:
         ordering = ['nom']
+        indexes = [
+            models.Index(fields=['nom'], name='categorie_nom_idx'),
+        ]
 
 
-class Article(models.Model):
+class Article(ModeleCompte):
     titre = models.CharField(max_length=200)
     contenu = models.TextField()
     date = models.DateTimeField(auto_now_add=True)
     categorie = models.ForeignKey(Categorie, on_delete=models.CASCADE, related_name='articles')
+    # Dérivés de `contenu` (voir extraits.py), affichés par les listes
+    extrait = models.TextField(blank=True, default='', editable=False)
+    nombre_mots = models.PositiveIntegerField(default=0, editable=False)
+    temps_lecture = models.PositiveIntegerField(default=0, editable=False, help_text='En minutes')
+
+    objects = ArticleQuerySet.as_manager()
 
     def __str__(self):
         return self.titre
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if 'contenu' not in self.get_deferred_fields() and (update_fields is None or 'contenu' in update_fields):
+            extraits.calculer(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *extraits.CHAMPS}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('article-detail', kwargs={'pk': self.pk})
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['-date'], name='article_date_idx'),
+            models.Index(fields=['categorie', '-date'], name='article_categorie_date_idx'),
+        ]
 
 
-class Commentaire(models.Model):
+class Commentaire(ModeleCompte):
     article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='commentaires')
     nom = models.CharField(max_length=100)
     email = models.EmailField()
@@ -65,6 +165,13 @@ class Commentaire(models.Model):
 
     class Meta:
         ordering = ['date']
+        indexes = [
+            models.Index(fields=['date'], name='commentaire_date_idx'),
+            # Commentaires actifs d'un article par date (page de détail). Index
+            # partiel : filter(actif=True) produit `WHERE actif` sous SQLite,
+            # qu'un index (article, actif, date) ne sait pas exploiter pour le tri
+            models.Index(fields=['article', 'date'], condition=models.Q(actif=True), name='commentaire_actifs_idx'),
+        ]
 
 
 class Note(models.Model):
@@ -79,6 +186,29 @@ class Note(models.Model):
 
     class Meta:
         ordering = ['-date_modification']
+        indexes = [
+            models.Index(fields=['owner', '-date_modification'], name='note_owner_modif_idx'),
+            # Synchronisation (sync.py) : modifications dans l'ordre (date, id) croissant
+            models.Index(fields=['owner', 'date_modification'], name='note_owner_sync_idx'),
+        ]
+
+
+class NoteSupprimee(models.Model):
+    """Journal des suppressions de notes, renvoyées par la synchronisation (sync.py)"""
+    note_id = models.BigIntegerField()
+    # Sans contrainte : les notes d'un utilisateur en cours de suppression sont
+    # journalisées avant lui (voir signals.purger_suppressions)
+    owner = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    date_suppression = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Note {self.note_id} supprimée'
+
+    class Meta:
+        ordering = ['date_suppression']
+        indexes = [
+            models.Index(fields=['owner', 'date_suppression'], name='note_suppr_owner_date_idx'),
+        ]
 
 
 class Feedback(models.Model):
@@ -92,3 +222,55 @@ class Feedback(models.Model):
 
     class Meta:
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['-date_creation'], name='feedback_date_idx'),
+        ]
+
+
+class Compteur(models.Model):
+    """
+    Compteurs dénormalisés (nombre d'auteurs, de livres par auteur, d'articles
+    par catégorie...), maintenus par counters.py. `objet_id` vaut 0 pour les
+    totaux globaux.
+    """
+    nom = models.CharField(max_length=50)
+    objet_id = models.BigIntegerField(default=0)
+    valeur = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.nom}[{self.objet_id}] = {self.valeur}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['nom', 'objet_id'], name='compteur_unique'),
+        ]
+
+
+class LivreRecherche(models.Model):
+    """
+    Table FTS5 des livres (voir search.py), créée par la migration 0005 et
+    jointe aux livres par rowid. `requete` est la colonne cachée qui porte le
+    nom de la table : cible de MATCH et premier argument de bm25()/highlight().
+    """
+    livre = models.OneToOneField(
+        Livre, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='recherche',
+    )
+    requete = models.TextField(db_column='bibliotheque_livre_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'bibliotheque_livre_fts'
+
+
+class ArticleRecherche(models.Model):
+    """Table FTS5 des articles (voir LivreRecherche)"""
+    article = models.OneToOneField(
+        Article, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='recherche',
+    )
+    requete = models.TextField(db_column='bibliotheque_article_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'bibliotheque_article_fts'
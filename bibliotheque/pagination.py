@@ -0,0 +1,243 @@
+"""
+Pagination des endpoints de l'API.
+
+- KeysetPagination : pagination par curseur (keyset) sur le Meta.ordering du
+  modèle complété par `id` pour départager les égalités. Chaque page est une
+  simple requête `WHERE (clé) > (curseur) ORDER BY ... LIMIT n` : ni OFFSET ni
+  COUNT(*), le coût ne dépend pas de la profondeur de la page. Le total n'est
+  calculé que sur demande (?count=true).
+- SelectablePagination : pagination par défaut ; numéros de page comme
+  auparavant, keyset avec ?pagination=cursor.
+- page_keyset : la même pagination pour les vues MVT (« charger la suite »).
+"""
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from . import search
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Curseur invalide.'
+    ranked_message = 'Résultats classés par pertinence (?search=) : pagination par numéro de page uniquement.'
+
+    # Ordre imposé ; par défaut `view.keyset_ordering` puis Meta.ordering du modèle
+    ordering = None
+
+    def get_ordering(self, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None) or self.ordering or queryset.model._meta.ordering
+        ordering = list(ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('id')
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if search.est_classee(queryset):
+            # Le classement de la recherche (annotation `rang`) n'a pas de clé
+            # de curseur : order_by() l'effacerait sans rien dire
+            raise ParseError(self.ranked_message)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset, view)
+        self.columns = list(queryset.query.values_select)
+
+        reverse, position = self.decode_cursor(request)
+        ordering = [_inverser(field) for field in self.ordering] if reverse else self.ordering
+
+        page = queryset.order_by(*ordering)
+        if position is not None:
+            page = page.filter(_apres(ordering, position))
+        results = list(page[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        self.next_position = self.get_position(results[-1]) if has_next and results else None
+        self.previous_position = self.get_position(results[0]) if has_previous and results else None
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+        return results
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(False, self.next_position))
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(True, self.previous_position))
+
+    def get_position(self, obj):
+        position = []
+        for field in self.ordering:
+            path = field.lstrip('-')
+            if isinstance(obj, tuple):
+                # Ligne .values_list() (voir mixins.FastListMixin)
+                value = obj[self.columns.index(self.model._meta.pk.name if path == 'pk' else path)]
+            else:
+                value = obj
+                for attr in path.split('__'):
+                    value = getattr(value, attr)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def encode_cursor(self, reverse, position):
+        return encoder_curseur(reverse, position)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            return decoder_curseur(self.model, self.ordering, encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class SelectablePagination(BasePagination):
+    """
+    Numéros de page par défaut (compatibilité), pagination keyset sur demande
+    avec ?pagination=cursor ou dès qu'un ?cursor= est fourni.
+    """
+    query_param = 'pagination'
+    page_number_class = PageNumberPagination
+    keyset_class = KeysetPagination
+
+    def get_delegate(self, request):
+        if request.query_params.get(self.query_param) == 'cursor' or self.keyset_class.cursor_query_param in request.query_params:
+            return self.keyset_class()
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.delegate = self.get_delegate(request)
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    @property
+    def display_page_controls(self):
+        return getattr(getattr(self, 'delegate', None), 'display_page_controls', False)
+
+    def to_html(self):
+        return self.delegate.to_html()
+
+
+def encoder_curseur(reverse, position):
+    data = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decoder_curseur(model, ordering, encoded):
+    """(reverse, position) d'un curseur ; ValueError s'il est invalide"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        raw_position = data['p']
+        if len(raw_position) != len(ordering):
+            raise ValueError
+        position = [
+            _champ(model, field).to_python(value)
+            for field, value in zip(ordering, raw_position)
+        ]
+        return bool(data['r']), position
+    except (TypeError, KeyError, ValueError, binascii.Error, FieldDoesNotExist, ValidationError):
+        raise ValueError('Curseur invalide.')
+
+
+def page_keyset(queryset, ordering, curseur, taille):
+    """
+    Page de `taille` objets après `curseur` (None : première page) dans l'ordre
+    `ordering`, et curseur de la page suivante (None s'il n'y en a pas).
+    Une requête, sans OFFSET ni COUNT ; ValueError si le curseur est invalide.
+    """
+    if curseur:
+        position = decoder_curseur(queryset.model, ordering, curseur)[1]
+        queryset = queryset.filter(_apres(ordering, position))
+    objets = list(queryset.order_by(*ordering)[:taille + 1])
+    if len(objets) <= taille:
+        return objets, None
+    objets = objets[:taille]
+    position = []
+    for field in ordering:
+        valeur = getattr(objets[-1], field.lstrip('-'))
+        position.append(valeur.isoformat() if isinstance(valeur, (datetime.date, datetime.datetime)) else valeur)
+    return objets, encoder_curseur(False, position)
+
+
+def _inverser(field):
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _apres(ordering, position):
+    """
+    Condition keyset « strictement après `position` » pour un ordre à plusieurs
+    champs, éventuellement de sens différents :
+    (a > x) OR (a = x AND b > y) OR ...
+    """
+    clauses = []
+    for i, field in enumerate(ordering):
+        egalites = [Q(**{f.lstrip('-'): v}) for f, v in zip(ordering[:i], position[:i])]
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        comparaison = Q(**{f'{field.lstrip("-")}__{lookup}': position[i]})
+        clauses.append(reduce(and_, egalites + [comparaison]))
+    return reduce(or_, clauses)
+
+
+def _champ(model, path):
+    """Champ de modèle désigné par un chemin d'ordre (`-date`, `auteur__nom`...)"""
+    names = path.lstrip('-').split('__')
+    if names == ['pk']:
+        return model._meta.pk
+    for name in names[:-1]:
+        model = model._meta.get_field(name).related_model
+    return model._meta.get_field(names[-1])
+
@@ -1,5 +1,32 @@
+from django.core.cache import cache
 from rest_framework import permissions
 
+# Durée de vie des groupes mis en cache (invalidés par m2m_changed, voir signals.py)
+GROUPS_CACHE_TIMEOUT = 300
+GROUPS_CACHE_PREFIX = 'bibliotheque:groups:'
+
+
+def get_user_groups(user):
+    """
+    Noms des groupes de l'utilisateur, chargés au plus une fois par requête
+    (mémorisés sur l'objet user) et partagés entre requêtes via le cache.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+    groups = getattr(user, '_bibliotheque_groups', None)
+    if groups is None:
+        key = GROUPS_CACHE_PREFIX + str(user.pk)
+        groups = cache.get(key)
+        if groups is None:
+            groups = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, groups, GROUPS_CACHE_TIMEOUT)
+        user._bibliotheque_groups = groups
+    return groups
+
+
+def invalidate_user_groups(user_pks):
+    cache.delete_many([GROUPS_CACHE_PREFIX + str(pk) for pk in user_pks])
+
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -26,7 +53,7 @@ def IsInGroup(group_name):
             if not request.user or not request.user.is_authenticated:
                 return False
             
-            return request.user.groups.filter(name=group_name).exists()
+            return group_name in get_user_groups(request.user)
     
     return GroupPermission
 
@@ -54,8 +81,7 @@ class IsFeedbackOwnerOrModeratorOrReadOnly(permissions.BasePermission):
         
         # Suppression autorisée aux modérateurs
         if request.method == 'DELETE':
-            return (request.user and request.user.is_authenticated and 
-                   request.user.groups.filter(name='moderator').exists())
+            return 'moderator' in get_user_groups(request.user)
         
         # Modification autorisée au propriétaire
         return obj.owner == request.user
\ No newline at end of file
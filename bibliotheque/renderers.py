@@ -0,0 +1,35 @@
+"""
+Rendu JSON des réponses de l'API.
+
+FastJSONRenderer produit les mêmes octets que le JSONRenderer de DRF (JSON
+compact, UTF-8, U+2028/U+2029 échappés) mais encode avec orjson, plusieurs
+fois plus rapide que le module json. Dates et heures restées telles quelles
+dans les données, Decimal et chaînes paresseuses passent par l'encodeur de
+DRF pour garder son format. Sans orjson, ou pour une sortie indentée, le
+rendu DRF est utilisé.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance de requirements.txt
+    orjson = None
+
+OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (data is None or orjson is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except TypeError:
+            # Entier hors 64 bits, type inconnu d'orjson et de l'encodeur DRF
+            return super().render(data, accepted_media_type, renderer_context)
+        # Comme DRF : séparateurs de ligne Unicode échappés (JavaScript)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
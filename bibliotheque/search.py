@@ -0,0 +1,212 @@
+"""
+Recherche plein texte basée sur des tables virtuelles SQLite FTS5.
+
+Chaque modèle indexé possède sa propre table FTS dont le rowid est la clé
+primaire de l'objet, ce qui permet une simple jointure pour classer les
+résultats par pertinence (bm25) et les surligner.
+
+- bibliotheque_livre_fts   : Livre.titre + Auteur.nom
+- bibliotheque_article_fts : Article.titre + Article.contenu
+
+Les tables sont tenues à jour par les signaux (voir signals.py) et, pour les
+écritures en masse de l'API et de import_catalogue, par
+signals.ecriture_en_masse. Seules les modifications hors de ces chemins
+(QuerySet.update(), SQL direct) demandent un `manage.py rebuild_search_index`.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, FloatField, Func, Lookup, Q, TextField, Value
+from django.utils.html import escape
+
+from .models import ArticleRecherche, LivreRecherche
+
+LIVRE_FTS = 'bibliotheque_livre_fts'
+ARTICLE_FTS = 'bibliotheque_article_fts'
+
+# highlight() et snippet() renvoient le texte stocké tel quel : FTS5 encadre
+# les termes trouvés de caractères sentinelles (zone à usage privé Unicode),
+# remplacés par <mark> une fois le texte échappé (voir surligner)
+SENTINELLE_DEBUT = '\ue000'
+SENTINELLE_FIN = '\ue001'
+SURLIGNAGE_DEBUT = '<mark>'
+SURLIGNAGE_FIN = '</mark>'
+
+CREATE_TABLES_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {LIVRE_FTS} USING fts5(titre, auteur, tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {ARTICLE_FTS} USING fts5(titre, contenu, tokenize='unicode61 remove_diacritics 2')",
+]
+
+DROP_TABLES_SQL = [
+    f"DROP TABLE IF EXISTS {LIVRE_FTS}",
+    f"DROP TABLE IF EXISTS {ARTICLE_FTS}",
+]
+
+
+def fts_disponible(using=DEFAULT_DB_ALIAS):
+    """La recherche FTS5 n'est disponible que sur SQLite"""
+    return connections[using].vendor == 'sqlite'
+
+
+def construire_requete_fts(terme):
+    """
+    Transforme la saisie utilisateur en requête FTS5 sûre : chaque mot devient
+    une chaîne entre guillemets (pas d'opérateurs injectés), le dernier mot est
+    recherché en préfixe pour la saisie incrémentale.
+    """
+    mots = [mot.replace('"', '""') for mot in terme.split()]
+    if not mots:
+        return None
+    termes = [f'"{mot}"' for mot in mots]
+    termes[-1] += '*'
+    return ' '.join(termes)
+
+
+def surligner(texte):
+    """HTML sûr d'un extrait surligné par FTS5 : texte échappé, termes trouvés entre <mark>"""
+    if texte is None:
+        return None
+    return escape(texte).replace(SENTINELLE_DEBUT, SURLIGNAGE_DEBUT).replace(SENTINELLE_FIN, SURLIGNAGE_FIN)
+
+
+# Synchronisation de l'index
+# Les fonctions acceptent une liste de clés primaires pour les écritures en
+# masse, traitée par lots sous la limite de paramètres de SQLite.
+
+TAILLE_LOT = 500
+
+
+def _lots(pks):
+    pks = list(pks)
+    for debut in range(0, len(pks), TAILLE_LOT):
+        lot = pks[debut:debut + TAILLE_LOT]
+        yield lot, ', '.join(['%s'] * len(lot))
+
+
+def indexer_livres(pks, using=DEFAULT_DB_ALIAS):
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        for lot, marqueurs in _lots(pks):
+            cursor.execute(f"DELETE FROM {LIVRE_FTS} WHERE rowid IN ({marqueurs})", lot)
+            cursor.execute(
+                f"INSERT INTO {LIVRE_FTS} (rowid, titre, auteur) "
+                f"SELECT l.id, l.titre, a.nom FROM bibliotheque_livre l "
+                f"JOIN bibliotheque_auteur a ON a.id = l.auteur_id WHERE l.id IN ({marqueurs})",
+                lot,
+            )
+
+
+def desindexer_livres(pks, using=DEFAULT_DB_ALIAS):
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        for lot, marqueurs in _lots(pks):
+            cursor.execute(f"DELETE FROM {LIVRE_FTS} WHERE rowid IN ({marqueurs})", lot)
+
+
+def indexer_auteurs(pks, using=DEFAULT_DB_ALIAS):
+    """Le nom de l'auteur est dénormalisé dans l'index de chacun de ses livres"""
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        for lot, marqueurs in _lots(pks):
+            cursor.execute(
+                f"UPDATE {LIVRE_FTS} SET auteur = (SELECT a.nom FROM bibliotheque_livre l "
+                f"JOIN bibliotheque_auteur a ON a.id = l.auteur_id WHERE l.id = {LIVRE_FTS}.rowid) "
+                f"WHERE rowid IN (SELECT id FROM bibliotheque_livre WHERE auteur_id IN ({marqueurs}))",
+                lot,
+            )
+
+
+def indexer_articles(pks, using=DEFAULT_DB_ALIAS):
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        for lot, marqueurs in _lots(pks):
+            cursor.execute(f"DELETE FROM {ARTICLE_FTS} WHERE rowid IN ({marqueurs})", lot)
+            cursor.execute(
+                f"INSERT INTO {ARTICLE_FTS} (rowid, titre, contenu) "
+                f"SELECT id, titre, contenu FROM bibliotheque_article WHERE id IN ({marqueurs})",
+                lot,
+            )
+
+
+def desindexer_articles(pks, using=DEFAULT_DB_ALIAS):
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        for lot, marqueurs in _lots(pks):
+            cursor.execute(f"DELETE FROM {ARTICLE_FTS} WHERE rowid IN ({marqueurs})", lot)
+
+
+def reconstruire_index(cursor):
+    """Recrée entièrement les deux index à partir des tables source"""
+    for sql in DROP_TABLES_SQL + CREATE_TABLES_SQL:
+        cursor.execute(sql)
+    cursor.execute(
+        f"INSERT INTO {LIVRE_FTS} (rowid, titre, auteur) "
+        f"SELECT l.id, l.titre, a.nom FROM bibliotheque_livre l "
+        f"JOIN bibliotheque_auteur a ON a.id = l.auteur_id"
+    )
+    cursor.execute(
+        f"INSERT INTO {ARTICLE_FTS} (rowid, titre, contenu) "
+        f"SELECT id, titre, contenu FROM bibliotheque_article"
+    )
+    cursor.execute(f"INSERT INTO {LIVRE_FTS} ({LIVRE_FTS}) VALUES ('optimize')")
+    cursor.execute(f"INSERT INTO {ARTICLE_FTS} ({ARTICLE_FTS}) VALUES ('optimize')")
+
+
+# Recherche
+
+class Correspond(Lookup):
+    """`recherche__requete__match=<requête>` : `<table FTS> MATCH <requête>`"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+LivreRecherche._meta.get_field('requete').register_lookup(Correspond)
+ArticleRecherche._meta.get_field('requete').register_lookup(Correspond)
+
+
+def _rechercher(queryset, terme, surlignage):
+    requete = construire_requete_fts(terme)
+    if requete is None:
+        return queryset
+    # Jointure sur rowid (modèles LivreRecherche / ArticleRecherche) : FTS5
+    # fournit les lignes correspondantes, classées par bm25
+    table = F('recherche__requete')
+    return queryset.filter(recherche__requete__match=requete).annotate(
+        rang=Func(table, function='bm25', output_field=FloatField()),
+        **{
+            nom: Func(table, *[Value(argument) for argument in arguments], function=fonction, output_field=TextField())
+            for nom, (fonction, *arguments) in surlignage.items()
+        },
+    ).order_by('rang')
+
+
+def est_classee(queryset):
+    """Queryset de recherche FTS5, classé par pertinence (annotation `rang`)"""
+    return 'rang' in queryset.query.annotations
+
+
+def rechercher_livres(queryset, terme):
+    """Livres dont le titre ou le nom de l'auteur correspond, par pertinence"""
+    if not fts_disponible(queryset.db):
+        return queryset.filter(Q(titre__icontains=terme) | Q(auteur__nom__icontains=terme))
+    return _rechercher(queryset, terme, {
+        'surlignage_titre': ('highlight', 0, SENTINELLE_DEBUT, SENTINELLE_FIN),
+        'surlignage_auteur': ('highlight', 1, SENTINELLE_DEBUT, SENTINELLE_FIN),
+    })
+
+
+def rechercher_articles(queryset, terme):
+    """Articles dont le titre ou le contenu correspond, par pertinence"""
+    if not fts_disponible(queryset.db):
+        return queryset.filter(Q(titre__icontains=terme) | Q(contenu__icontains=terme))
+    return _rechercher(queryset, terme, {
+        'surlignage_titre': ('highlight', 0, SENTINELLE_DEBUT, SENTINELLE_FIN),
+        'surlignage_contenu': ('snippet', 1, SENTINELLE_DEBUT, SENTINELLE_FIN, '…', 24),
+    })
@@ -1,42 +1,176 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from .models import Auteur, Livre, Article, Categorie, Commentaire, Note, Feedback
+from .search import surligner
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Clé étrangère résolue à partir des objets préchargés par BulkActionsMixin
+    (contexte `bulk_related`) : une seule requête pour tout un lot au lieu
+    d'une par élément. Se comporte normalement hors des actions en masse.
+    """
+
+    def to_internal_value(self, data):
+        objets = self.context.get('bulk_related', {}).get(self.field_name)
+        if objets is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in objets:
+            self.fail('does_not_exist', pk_value=data)
+        return objets[pk]
+
+
+class SparseFieldsetMixin:
+    """
+    Champs choisis par le client : `?fields=id,titre` (seulement ceux-là),
+    `?omit=contenu` (tous sauf ceux-là). Lectures uniquement, et seulement
+    pour le serializer de la vue (pas les serializers imbriqués) ; un champ
+    inconnu donne une 400.
+    `colonnes_differees` donne les colonnes que la vue peut laisser en base
+    (.defer(), voir filters.ProjectionBackend).
+    """
+
+    @classmethod
+    def champs_selectionnes(cls, request):
+        """Noms des champs à renvoyer, ou None si la requête ne restreint rien"""
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        fields = request.query_params.get('fields')
+        omit = request.query_params.get('omit')
+        if fields is None and omit is None:
+            return None
+        tous = list(cls().fields)
+        demandes = [nom.strip() for nom in (fields or '').split(',') if nom.strip()]
+        exclus = {nom.strip() for nom in (omit or '').split(',') if nom.strip()}
+        inconnus = [nom for nom in demandes + sorted(exclus) if nom not in tous]
+        if inconnus:
+            raise ValidationError({'fields' if fields is not None else 'omit': [
+                f"Champs inconnus : {', '.join(inconnus)}. Disponibles : {', '.join(tous)}."
+            ]})
+        return {nom for nom in tous if (fields is None or nom in demandes) and nom not in exclus}
+
+    @classmethod
+    def colonnes_differees(cls, request, model):
+        """Colonnes simples du modèle inutiles aux champs demandés (ni pk, ni relations, ni tri)"""
+        selection = cls.champs_selectionnes(request)
+        if selection is None:
+            return []
+        sources = set()
+        for nom, champ in cls().fields.items():
+            if nom not in selection:
+                continue
+            if champ.source == '*':
+                # SerializerMethodField ou équivalent : lit n'importe quel attribut
+                return []
+            sources.add(champ.source.split('.')[0])
+        sources.update(champ.lstrip('-') for champ in model._meta.ordering)
+        return [
+            champ.name for champ in model._meta.concrete_fields
+            if not champ.primary_key and not champ.is_relation and champ.name not in sources
+        ]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        view = self.context.get('view')
+        if request is None or view is None or type(self) is not view.get_serializer_class():
+            return fields
+        selection = self.champs_selectionnes(request)
+        if selection is None:
+            return fields
+        return {nom: champ for nom, champ in fields.items() if nom in selection}
+
+
+class SurlignageMixin:
+    """
+    Ajoute un champ `surlignage` aux objets issus d'une recherche plein texte
+    (attributs `surlignage_<champ>` posés par bibliotheque.search), en HTML
+    échappé dont seuls les <mark> sont des balises.
+    """
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        surlignage = {
+            attr[len('surlignage_'):]: surligner(value)
+            for attr, value in vars(instance).items()
+            if attr.startswith('surlignage_')
+        }
+        if surlignage:
+            data['surlignage'] = surlignage
+        return data
+
+
+class LivreSerializer(SurlignageMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    serializer_related_field = CachedPrimaryKeyRelatedField
 
-
-class LivreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Livre
         fields = ['id', 'titre', 'date_sortie', 'auteur']
 
 
-class AuteurSerializer(serializers.ModelSerializer):
-    livres = LivreSerializer(many=True, read_only=True)
+class AuteurSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Par défaut `livres` ne contient que les ids des livres ; les objets complets
+    ne sont imbriqués qu'avec `?expand=livres` (voir AuteurViewSet).
+    """
+    livres = serializers.SerializerMethodField()
+    nombre_livres = serializers.SerializerMethodField()
 
     class Meta:
         model = Auteur
-        fields = ['id', 'nom', 'date_naissance', 'livres']
-
-
-class CategorieSerializer(serializers.ModelSerializer):
+        fields = ['id', 'nom', 'date_naissance', 'nombre_livres', 'livres']
+
+    def get_livres(self, obj):
+        # `livres_charges` est rempli par le prefetch (éventuellement tronqué) de la vue
+        livres = getattr(obj, 'livres_charges', None)
+        if livres is None:
+            livres = obj.livres.all()
+        if 'livres' in self.context.get('expand', ()):
+            return LivreSerializer(livres, many=True, context=self.context).data
+        return [livre.pk for livre in livres]
+
+    def get_nombre_livres(self, obj):
+        # Annotation posée par AuteurViewSet ; repli sur un COUNT hors de la vue
+        nombre = getattr(obj, 'nombre_livres', None)
+        if nombre is None:
+            nombre = obj.livres.count()
+        return nombre
+
+
+class CategorieSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Categorie
         fields = ['id', 'nom']
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(SurlignageMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     categorie = CategorieSerializer(read_only=True)
     
     class Meta:
         model = Article
-        fields = ['id', 'titre', 'contenu', 'date', 'categorie']
+        fields = ['id', 'titre', 'contenu', 'nombre_mots', 'temps_lecture', 'date', 'categorie']
+
+
+class ArticleResumeSerializer(ArticleSerializer):
+    """Liste des articles : extrait stocké à la place du contenu (non lu en base)"""
+
+    class Meta(ArticleSerializer.Meta):
+        fields = ['id', 'titre', 'extrait', 'nombre_mots', 'temps_lecture', 'date', 'categorie']
 
 
-class CommentaireSerializer(serializers.ModelSerializer):
+class CommentaireSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Commentaire
         fields = ['id', 'nom', 'email', 'contenu', 'date', 'actif']
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     owner = serializers.StringRelatedField(read_only=True)
     
     class Meta:
@@ -44,7 +178,7 @@ class NoteSerializer(serializers.ModelSerializer):
         fields = ['id', 'titre', 'contenu', 'owner', 'date_creation', 'date_modification']
 
 
-class CommentViewSerializer(serializers.ModelSerializer):
+class CommentViewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     article_titre = serializers.CharField(source='article.titre', read_only=True)
     
     class Meta:
@@ -52,7 +186,7 @@ class CommentViewSerializer(serializers.ModelSerializer):
         fields = ['id', 'nom', 'email', 'contenu', 'date', 'actif', 'article', 'article_titre']
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class FeedbackSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     owner = serializers.StringRelatedField(read_only=True)
     
     class Meta:
@@ -0,0 +1,183 @@
+from django.contrib.auth.models import Group, User
+from rest_framework.authtoken.models import Token
+from django.db import router
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import Auteur, Livre, Article, Note, NoteSupprimee
+from . import counters, search, versions
+from .authentication import invalidate_tokens
+from .permissions import invalidate_user_groups
+
+
+# Index de recherche plein texte
+
+@receiver(post_save, sender=Livre)
+def indexer_livre(sender, instance, using, **kwargs):
+    search.indexer_livres([instance.pk], using)
+
+
+@receiver(post_delete, sender=Livre)
+def desindexer_livre(sender, instance, using, **kwargs):
+    search.desindexer_livres([instance.pk], using)
+
+
+@receiver(post_save, sender=Auteur)
+def indexer_auteur(sender, instance, created, using, **kwargs):
+    if not created:
+        search.indexer_auteurs([instance.pk], using)
+
+
+@receiver(post_save, sender=Article)
+def indexer_article(sender, instance, using, **kwargs):
+    search.indexer_articles([instance.pk], using)
+
+
+@receiver(post_delete, sender=Article)
+def desindexer_article(sender, instance, using, **kwargs):
+    search.desindexer_articles([instance.pk], using)
+
+
+# Journal des suppressions de notes (synchronisation, sync.py)
+
+@receiver(post_delete, sender=Note)
+def journaliser_suppression_note(sender, instance, **kwargs):
+    NoteSupprimee.objects.create(note_id=instance.pk, owner_id=instance.owner_id)
+
+
+@receiver(post_delete, sender=User)
+def purger_suppressions(sender, instance, **kwargs):
+    # Les notes sont supprimées (et journalisées) avant leur propriétaire
+    NoteSupprimee.objects.filter(owner_id=instance.pk).delete()
+
+
+# Compteurs dénormalisés (récepteurs connectés aux seuls modèles comptés :
+# les autres gardent la suppression en cascade rapide de Django)
+
+def memoriser_parent(sender, instance, raw, **kwargs):
+    """
+    Parent compté actuel d'un enfant modifié, pour détecter un déplacement
+    (changement de parent, commentaire activé ou désactivé). Déjà connu si
+    l'objet a été chargé avec ses champs (ModeleCompte.from_db) ; relu sinon.
+    """
+    if raw or instance._state.adding or hasattr(instance, '_parent_initial'):
+        return
+    initial = sender._base_manager.filter(pk=instance.pk).only(*counters.CHAMPS_PARENT[sender]).first()
+    instance._parent_initial = counters.parent_compte(initial) if initial is not None else None
+
+
+def compter_creation(sender, instance, created, raw, **kwargs):
+    if created:
+        counters.ajuster([instance], +1)
+    elif sender in counters.PAR_PARENT and hasattr(instance, '_parent_initial'):
+        ancien, nouveau = instance._parent_initial, counters.parent_compte(instance)
+        if ancien != nouveau:
+            counters.deplacer(sender, ancien, nouveau)
+    if sender in counters.PAR_PARENT:
+        instance._parent_initial = counters.parent_compte(instance)
+
+
+def compter_cascade(sender, instance, origin=None, **kwargs):
+    """
+    Suppression d'un parent : ses descendants supprimés en cascade sont
+    décomptés en bloc (counters.supprimer_en_cascade), une fois par appel à
+    delete(), puis ignorés par compter_suppression
+    """
+    if sender is not counters.modele_origine(origin):
+        return
+    if isinstance(origin, QuerySet):
+        # pre_delete est envoyé pour chaque objet du queryset supprimé
+        if getattr(origin, '_cascade_decomptee', False):
+            return
+        origin._cascade_decomptee = True
+        pks = origin.values('pk')
+    else:
+        pks = [instance.pk]
+    counters.supprimer_en_cascade(sender, pks)
+
+
+def compter_suppression(sender, instance, origin=None, **kwargs):
+    if sender in counters.descendants(counters.modele_origine(origin)):
+        return
+    counters.ajuster([instance], -1)
+    counters.supprimer_parent(sender, instance.pk)
+
+
+for model in counters.MODELES:
+    post_save.connect(compter_creation, sender=model)
+    post_delete.connect(compter_suppression, sender=model)
+for model in counters.PAR_PARENT:
+    pre_save.connect(memoriser_parent, sender=model)
+for model in counters.PARENTS:
+    pre_delete.connect(compter_cascade, sender=model)
+
+
+# Versions de cache (invalidation des fragments et réponses mis en cache)
+
+def incrementer_version(sender, update_fields=None, **kwargs):
+    # Connexion (login() n'enregistre que last_login) : rien d'affiché ne change
+    if update_fields == {'last_login'}:
+        return
+    versions.incrementer(sender)
+
+
+for model in versions.MODELES:
+    post_save.connect(incrementer_version, sender=model)
+    post_delete.connect(incrementer_version, sender=model)
+
+
+# Cache des groupes utilisateurs (permissions)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalider_groupes(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Modification depuis le groupe : group.user_set.add(...), clear()...
+        if action == 'pre_clear':
+            invalidate_user_groups(instance.user_set.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            invalidate_user_groups(pk_set)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user_groups([instance.pk])
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalider_membres_groupe(sender, instance, **kwargs):
+    # Renommage ou suppression d'un groupe : tous ses membres sont concernés
+    if not kwargs.get('created'):
+        invalidate_user_groups(instance.user_set.values_list('pk', flat=True))
+
+
+# Cache d'authentification par token
+
+@receiver(post_delete, sender=Token)
+def invalider_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalider_tokens_utilisateur(sender, instance, created, **kwargs):
+    # Désactivation, changement de droits... : l'utilisateur en cache est périmé
+    if not created:
+        invalidate_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+# Écritures en masse (bulk_create / bulk_update ne déclenchent aucun signal)
+
+INDEXATION_EN_MASSE = {
+    Livre: search.indexer_livres,
+    Auteur: search.indexer_auteurs,
+    Article: search.indexer_articles,
+}
+
+
+def ecriture_en_masse(model, pks):
+    """
+    Effectue pour des objets créés ou modifiés en masse le travail des
+    récepteurs post_save : index de recherche et version de cache. Les
+    compteurs sont gérés par CompteurQuerySet.bulk_create et counters.deplacer.
+    """
+    if model in INDEXATION_EN_MASSE:
+        INDEXATION_EN_MASSE[model](pks, router.db_for_write(model))
+    if model in versions.MODELES:
+        versions.incrementer(model)
@@ -0,0 +1,119 @@
+"""
+Synchronisation incrémentale des notes (GET /api/notes/sync/).
+
+    ?since=<curseur>   curseur renvoyé par la synchronisation précédente
+    ?since=<instant>   date et heure ISO 8601 : changements postérieurs
+    (sans since)       synchronisation complète
+
+Réponse : notes créées ou modifiées après la position (`results`), ids des
+notes supprimées depuis (`deleted`, journal NoteSupprimee), nouveau
+`cursor` et `has_more` (rappeler avec ce curseur tant qu'il vaut true).
+
+Le curseur contient deux positions keyset (date, id), une par flux : notes
+par `date_modification`, suppressions par `date_suppression`. Chaque flux
+est une requête `WHERE owner = ? AND (date, id) > position ORDER BY date, id
+LIMIT n` sur un index (owner, date) : le coût dépend du nombre de
+changements, pas du nombre de notes.
+
+Un horodatage est pris avant l'écriture, qui peut attendre le verrou de la
+base (busy_timeout) : les changements des MARGE dernières secondes sont
+laissés à la synchronisation suivante, pour ne jamais passer devant une
+écriture pas encore validée.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+MARGE = datetime.timedelta(seconds=5)
+
+
+def encoder(notes, suppressions):
+    data = json.dumps({'n': notes, 's': suppressions}, separators=(',', ':'), default=_horodatage)
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decoder(since):
+    """Positions (notes, suppressions) ; ValueError si `since` n'est ni un curseur ni un instant"""
+    instant = _instant(since)
+    if instant is not None:
+        return [instant, 0], [instant, 0]
+    try:
+        data = json.loads(base64.urlsafe_b64decode(since.encode()).decode())
+        return [_position(data['n']), _position(data['s'])]
+    except (TypeError, KeyError, ValueError, binascii.Error):
+        raise ValueError('Curseur ou date et heure ISO 8601 attendu.')
+
+
+def _instant(valeur):
+    try:
+        instant = parse_datetime(valeur)
+    except ValueError:
+        return None
+    if instant is not None and timezone.is_naive(instant):
+        instant = timezone.make_aware(instant)
+    return instant
+
+
+def _position(valeur):
+    if valeur is None:
+        return None
+    date, pk = valeur
+    date = _instant(date)
+    if date is None or not isinstance(pk, int):
+        raise ValueError
+    return [date, pk]
+
+
+def _horodatage(valeur):
+    return valeur.isoformat()
+
+
+def _apres(queryset, champ, position):
+    """(champ, id) > position, écrit pour que SQLite parcoure l'index sur `champ`"""
+    if position is None:
+        return queryset
+    date, pk = position
+    return queryset.filter(**{f'{champ}__gte': date}).exclude(Q(**{champ: date}) & Q(pk__lte=pk))
+
+
+def changements(queryset, champ, position, limite, jusqua):
+    """`limite` objets après `position` (jusqu'à `jusqua`), nouvelle position, et s'il en reste"""
+    queryset = _apres(queryset, champ, position).filter(**{f'{champ}__lte': jusqua})
+    objets = list(queryset.order_by(champ, 'pk')[:limite + 1])
+    reste = len(objets) > limite
+    objets = objets[:limite]
+    if objets:
+        position = [getattr(objets[-1], champ), objets[-1].pk]
+    return objets, position, reste
+
+
+def synchroniser(notes, suppressions, since, limite):
+    """
+    Changements des querysets `notes` et `suppressions` (déjà restreints au
+    propriétaire) depuis `since` ; ValueError si `since` est invalide
+    """
+    jusqua = timezone.now() - MARGE
+    if since:
+        position_notes, position_suppressions = decoder(since)
+    else:
+        # Synchronisation complète : toutes les notes, aucune suppression passée
+        position_notes = None
+        derniere = suppressions.filter(date_suppression__lte=jusqua).order_by('-date_suppression', '-pk').first()
+        position_suppressions = [derniere.date_suppression, derniere.pk] if derniere else None
+
+    notes, position_notes, reste_notes = changements(notes, 'date_modification', position_notes, limite, jusqua)
+    supprimees, position_suppressions, reste_suppressions = changements(
+        suppressions.only('pk', 'note_id', 'date_suppression'), 'date_suppression',
+        position_suppressions, limite, jusqua,
+    )
+    return {
+        'notes': notes,
+        'deleted': [suppression.note_id for suppression in supprimees],
+        'cursor': encoder(position_notes, position_suppressions),
+        'has_more': reste_notes or reste_suppressions,
+    }
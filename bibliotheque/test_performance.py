@@ -0,0 +1,166 @@
+"""
+Budgets de requêtes SQL par endpoint.
+
+Chaque endpoint (API et vues MVT) est mesuré avec N puis 10N lignes par table :
+le nombre de requêtes doit rester identique (pas de N+1) et ne pas dépasser le
+budget déclaré dans BUDGETS. Un récapitulatif est affiché en fin de classe.
+
+Les pages API font 5 éléments : N = 1 garantit que la page passe d'un à cinq
+éléments entre les deux mesures, ce qui rend visible toute requête par ligne.
+"""
+import sys
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import local_cache
+from .models import Auteur, Livre, Categorie, Article, Commentaire, Note, Feedback
+
+N = 1
+
+# Nombre maximum de requêtes par endpoint (authentification par token comprise,
+# lecture des versions pour l'ETag ou le fragment en cache comprise)
+BUDGETS = {
+    'livres-list': 4,
+    'livres-detail': 3,
+    'auteurs-list': 5,
+    'auteurs-list-expand': 5,
+    'auteurs-detail': 4,
+    'auteurs-titres': 3,
+    'articles-list': 4,
+    'articles-detail': 3,
+    'notes-list': 4,
+    'notes-detail': 3,
+    'comments-list': 4,
+    'comments-detail': 3,
+    'feedbacks-list': 4,
+    'feedbacks-detail': 3,
+    'async-livres-list': 3,
+    'async-livres-detail': 2,
+    'async-articles-list': 3,
+    'async-articles-detail': 2,
+    'async-auteurs-titres': 3,
+    'home': 1,
+    'async-home': 1,
+    'current-datetime': 0,
+    'article-list': 4,
+    'article-detail': 2,
+    'article-create': 1,
+}
+
+
+class QueryBudgetTestCase(TestCase):
+    rapport = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        cls.token = Token.objects.create(user=cls.admin)
+        # Objets de référence : leurs enfants grossissent à chaque ajout
+        cls.auteur = Auteur.objects.create(nom='Référence', date_naissance='1900-01-01')
+        cls.livre = Livre.objects.create(titre='Référence', date_sortie='2000-01-01', auteur=cls.auteur)
+        cls.categorie = Categorie.objects.create(nom='Référence')
+        cls.article = Article.objects.create(titre='Référence', contenu='...', categorie=cls.categorie)
+        cls.note = Note.objects.create(titre='Référence', contenu='...', owner=cls.admin)
+        cls.feedback = Feedback.objects.create(titre='Référence', contenu='...', owner=cls.admin)
+        cls.commentaire = Commentaire.objects.create(
+            article=cls.article, nom='Référence', email='ref@test.com', contenu='...'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.rapport:
+            largeur = max(len(nom) for nom, *_ in cls.rapport)
+            lignes = [f"\n{'endpoint'.ljust(largeur)}  {'N':>3}  {'10N':>3}  budget"]
+            for nom, petit, grand, budget in cls.rapport:
+                lignes.append(f'{nom.ljust(largeur)}  {petit:>3}  {grand:>3}  {budget:>6}')
+            sys.stderr.write('\n'.join(lignes) + '\n')
+
+    def ajouter(self, n):
+        """Ajoute n lignes par table, dont n enfants à chaque objet de référence"""
+        auteurs = Auteur.objects.bulk_create([
+            Auteur(nom=f'Auteur {i}', date_naissance='1950-01-01') for i in range(n)
+        ])
+        Livre.objects.bulk_create(
+            [Livre(titre=f'Livre {i}', date_sortie='2000-01-01', auteur=self.auteur) for i in range(n)]
+            + [Livre(titre=f'Livre {a.pk}', date_sortie='2000-01-01', auteur=a) for a in auteurs]
+        )
+        Categorie.objects.bulk_create([Categorie(nom=f'Catégorie {i}') for i in range(n)])
+        Article.objects.bulk_create([
+            Article(titre=f'Article {i}', contenu='...', categorie=self.categorie) for i in range(n)
+        ])
+        Commentaire.objects.bulk_create([
+            Commentaire(article=self.article, nom=f'Lecteur {i}', email='lecteur@test.com', contenu='...')
+            for i in range(n)
+        ])
+        Note.objects.bulk_create([Note(titre=f'Note {i}', contenu='...', owner=self.admin) for i in range(n)])
+        Feedback.objects.bulk_create([
+            Feedback(titre=f'Feedback {i}', contenu='...', owner=self.admin) for i in range(n)
+        ])
+
+    def mesurer(self, client, url):
+        # Mesure à froid : l'authentification par token coûte sa requête
+        cache.clear()
+        local_cache.clear()
+        with CaptureQueriesContext(connection) as requetes:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(requetes)
+
+    def verifier_budgets(self, client, endpoints):
+        self.ajouter(N - 1)
+        petits = {nom: self.mesurer(client, url) for nom, url in endpoints.items()}
+        self.ajouter(9 * N)
+        grands = {nom: self.mesurer(client, url) for nom, url in endpoints.items()}
+
+        for nom in endpoints:
+            self.rapport.append((nom, petits[nom], grands[nom], BUDGETS[nom]))
+            with self.subTest(endpoint=nom):
+                self.assertEqual(petits[nom], grands[nom], f'{nom} : requêtes dépendantes du volume')
+                self.assertLessEqual(grands[nom], BUDGETS[nom], f'{nom} : budget dépassé')
+
+    def test_api_endpoints(self):
+        """Test que les endpoints de l'API respectent leur budget de requêtes"""
+        self.verifier_budgets(self.api, {
+            'livres-list': '/api/livres/',
+            'livres-detail': f'/api/livres/{self.livre.pk}/',
+            'auteurs-list': '/api/auteurs/',
+            'auteurs-list-expand': '/api/auteurs/?expand=livres',
+            'auteurs-detail': f'/api/auteurs/{self.auteur.pk}/',
+            'auteurs-titres': f'/api/auteurs/{self.auteur.pk}/titres/',
+            'articles-list': '/api/articles/',
+            'articles-detail': f'/api/articles/{self.article.pk}/',
+            'notes-list': '/api/notes/',
+            'notes-detail': f'/api/notes/{self.note.pk}/',
+            'comments-list': '/api/comments/',
+            'comments-detail': f'/api/comments/{self.commentaire.pk}/',
+            'feedbacks-list': '/api/feedbacks/',
+            'feedbacks-detail': f'/api/feedbacks/{self.feedback.pk}/',
+            'async-livres-list': '/api/async/livres/',
+            'async-livres-detail': f'/api/async/livres/{self.livre.pk}/',
+            'async-articles-list': '/api/async/articles/',
+            'async-articles-detail': f'/api/async/articles/{self.article.pk}/',
+            'async-auteurs-titres': f'/api/async/auteurs/{self.auteur.pk}/titres/',
+        })
+
+    def test_mvt_views(self):
+        """Test que les vues MVT respectent leur budget de requêtes"""
+        self.verifier_budgets(self.client, {
+            'home': '/',
+            'async-home': '/async/',
+            'current-datetime': '/now/',
+            'article-list': '/articles/',
+            'article-detail': f'/articles/{self.article.pk}/',
+            'article-create': '/articles/nouveau/',
+        })
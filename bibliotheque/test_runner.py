@@ -0,0 +1,23 @@
+"""
+Lanceur des tests (settings.TEST_RUNNER).
+
+Les tests tournent dans un seul processus et vident le cache Django dans
+leur setUp : le throttling y utilise CacheThrottleStore, remis à zéro avec
+le cache, plutôt que le fichier SQLite partagé des settings, qui garderait
+les compteurs d'un test (et d'une exécution) à l'autre.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.throttle_store = override_settings(
+            THROTTLE_STORE={'BACKEND': 'bibliotheque.throttling.CacheThrottleStore'},
+        )
+        self.throttle_store.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_store.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,16 +1,42 @@
-from django.test import TestCase
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase
 from django.contrib.auth.models import User, Group
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 from rest_framework import status
 from django.urls import reverse
-from .models import Feedback, Note, Commentaire, Article, Categorie
+from .models import Feedback, Note, NoteSupprimee, Commentaire, Article, Categorie, Auteur, Livre, Compteur
+from . import counters, ingestion, instrumentation, search, sync, versions
+from .permissions import get_user_groups
+from .authentication import local_cache
+from .db import ReadReplicaRouter
+from .renderers import FastJSONRenderer
+from .views import ArticleListViewSet, FeedbackViewSet, LivreViewSet, NoteViewSet
+from .management.commands.index_advisor import analyser_plan
+from .throttling import CacheThrottleStore, SQLiteThrottleStore
+from django.conf import settings
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+from unittest import mock
+from rest_framework.renderers import JSONRenderer
+import asyncio
+import csv
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
 from datetime import datetime, timedelta
 from django.utils import timezone
 
 
 class FeedbackAPITestCase(TestCase):
     def setUp(self):
+        # Les compteurs du throttling vivent dans le cache, pas dans la base
+        cache.clear()
+
         # Créer les utilisateurs
         self.user1 = User.objects.create_user(
             username='user1',
@@ -229,3 +255,1459 @@ class PermissionTestCase(TestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token_user.key)
         response = self.client.delete(f'/api/comments/{self.commentaire.id}/')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AuteurAPITestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin',
+            password='password123',
+            is_staff=True
+        )
+        self.token_admin = Token.objects.create(user=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token_admin.key)
+
+        for i in range(3):
+            auteur = Auteur.objects.create(nom=f'Auteur {i}', date_naissance='1950-01-01')
+            for j in range(4):
+                Livre.objects.create(titre=f'Livre {i}-{j}', date_sortie='2000-01-01', auteur=auteur)
+
+    def test_list_returns_ids_and_count_by_default(self):
+        """Test que la liste renvoie les ids des livres et leur nombre"""
+        response = self.client.get('/api/auteurs/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        auteur = response.data['results'][0]
+        self.assertEqual(auteur['nombre_livres'], 4)
+        self.assertEqual(len(auteur['livres']), 4)
+        self.assertIsInstance(auteur['livres'][0], int)
+
+    def test_expand_livres(self):
+        """Test que ?expand=livres imbrique les livres complets"""
+        response = self.client.get('/api/auteurs/?expand=livres')
+        livre = response.data['results'][0]['livres'][0]
+        self.assertEqual(livre['titre'], 'Livre 0-0')
+
+    def test_livres_limit(self):
+        """Test que ?livres_limit=N borne le nombre de livres par auteur"""
+        response = self.client.get('/api/auteurs/?expand=livres&livres_limit=2')
+        for auteur in response.data['results']:
+            self.assertEqual(len(auteur['livres']), 2)
+            self.assertEqual(auteur['nombre_livres'], 4)
+
+        response = self.client.get('/api/auteurs/?livres_limit=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_query_count_is_constant(self):
+        """Test que les livres sont chargés en une requête pour toute la page"""
+        self.client.get('/api/auteurs/')  # Chauffe le cache du token/throttle
+        # versions (ETag) + count pagination + auteurs + prefetch livres (token en cache)
+        with self.assertNumQueries(4):
+            self.client.get('/api/auteurs/?expand=livres')
+
+
+class RechercheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.hugo = Auteur.objects.create(nom='Victor Hugo', date_naissance='1802-02-26')
+        self.zola = Auteur.objects.create(nom='Émile Zola', date_naissance='1840-04-02')
+        Livre.objects.create(titre='Les Misérables', date_sortie='1862-01-01', auteur=self.hugo)
+        Livre.objects.create(titre='Notre-Dame de Paris', date_sortie='1831-01-01', auteur=self.hugo)
+        Livre.objects.create(titre='Paris', date_sortie='1898-01-01', auteur=self.zola)
+
+        categorie = Categorie.objects.create(nom='Tech')
+        Article.objects.create(titre='Django et SQLite', contenu='Le moteur FTS5 de SQLite est rapide.', categorie=categorie)
+        Article.objects.create(titre='Autre sujet', contenu='Rien à voir.', categorie=categorie)
+
+    def test_search_livres_by_titre_is_ranked(self):
+        """Test que la recherche de livres classe par pertinence et surligne"""
+        response = self.client.get('/api/livres/?search=paris')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titres = [livre['titre'] for livre in response.data['results']]
+        self.assertEqual(titres, ['Paris', 'Notre-Dame de Paris'])
+        self.assertEqual(response.data['results'][0]['surlignage']['titre'], '<mark>Paris</mark>')
+
+    def test_search_livres_by_auteur_and_accents(self):
+        """Test que la recherche porte sur le nom de l'auteur, sans accents"""
+        response = self.client.get('/api/livres/?search=emile')
+        titres = [livre['titre'] for livre in response.data['results']]
+        self.assertEqual(titres, ['Paris'])
+
+    def test_index_follows_updates(self):
+        """Test que l'index suit les modifications et suppressions"""
+        self.zola.nom = 'E. Zola'
+        self.zola.save()
+        response = self.client.get('/api/livres/?search=zola')
+        self.assertEqual(len(response.data['results']), 1)
+
+        Livre.objects.filter(auteur=self.zola).delete()
+        response = self.client.get('/api/livres/?search=zola')
+        self.assertEqual(len(response.data['results']), 0)
+
+    def test_search_articles_contenu(self):
+        """Test que la recherche d'articles porte sur le contenu"""
+        response = self.client.get('/api/articles/?search=fts5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('<mark>FTS5</mark>', response.data['results'][0]['surlignage']['contenu'])
+
+    def test_highlight_escapes_stored_html(self):
+        """Test que le surlignage échappe le HTML stocké et ne garde que les balises <mark>"""
+        Article.objects.create(titre='<script>alert(1)</script> piège', contenu='<img src=x onerror=alert(1)> piège',
+                               categorie=Categorie.objects.get())
+        surlignage = self.client.get('/api/articles/?search=piège').data['results'][0]['surlignage']
+        self.assertEqual(surlignage['titre'], '&lt;script&gt;alert(1)&lt;/script&gt; <mark>piège</mark>')
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt; <mark>piège</mark>', surlignage['contenu'])
+
+    def test_bulk_index_in_batches(self):
+        """Test que l'indexation d'une liste de livres procède par lots (limite de paramètres de SQLite)"""
+        livres = Livre.objects.bulk_create([
+            Livre(titre=f'Tome {i}', date_sortie='1900-01-01', auteur=self.zola) for i in range(5)
+        ])
+        with mock.patch.object(search, 'TAILLE_LOT', 2), CaptureQueriesContext(connection) as requetes:
+            search.indexer_livres([livre.pk for livre in livres])
+        self.assertEqual(len(requetes), 6)  # 3 lots : DELETE + INSERT
+        self.assertEqual(len(self.client.get('/api/livres/?search=tome').data['results']), 5)
+
+    def test_search_operators_are_escaped(self):
+        """Test que la syntaxe FTS5 saisie par l'utilisateur ne provoque pas d'erreur"""
+        response = self.client.get('/api/livres/?search=" OR NEAR(')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+
+class FiltresTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.client.force_authenticate(admin)
+        self.hugo = Auteur.objects.create(nom='Victor Hugo', date_naissance='1802-02-26')
+        self.zola = Auteur.objects.create(nom='Émile Zola', date_naissance='1840-04-02')
+        Livre.objects.create(titre='Les Misérables', date_sortie='1862-04-03', auteur=self.hugo)
+        Livre.objects.create(titre='Notre-Dame de Paris', date_sortie='1831-01-14', auteur=self.hugo)
+        Livre.objects.create(titre='Germinal', date_sortie='1885-03-02', auteur=self.zola)
+        self.tech = Categorie.objects.create(nom='Tech')
+        self.art = Categorie.objects.create(nom='Art')
+        self.ancien = Article.objects.create(titre='Ancien', contenu='...', categorie=self.tech)
+        Article.objects.filter(pk=self.ancien.pk).update(date=timezone.make_aware(datetime(2020, 3, 15, 23, 30)))
+        Article.objects.create(titre='Récent', contenu='...', categorie=self.art)
+
+    def titres(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return sorted(objet.get('titre', objet.get('nom')) for objet in response.data['results'])
+
+    def test_cle(self):
+        """Test que les filtres par clé étrangère acceptent un ou plusieurs identifiants"""
+        self.assertEqual(self.titres(f'/api/livres/?auteur={self.zola.pk}'), ['Germinal'])
+        self.assertEqual(len(self.titres(f'/api/livres/?auteur={self.zola.pk},{self.hugo.pk}')), 3)
+        self.assertEqual(self.titres(f'/api/articles/?categorie={self.tech.pk}'), ['Ancien'])
+
+    def test_date_ranges(self):
+        """Test que jour, mois, année et bornes sont des intervalles inclusifs attendus"""
+        self.assertEqual(self.titres('/api/livres/?date_sortie=1862-04-03'), ['Les Misérables'])
+        self.assertEqual(self.titres('/api/livres/?date_sortie__year=1862'), ['Les Misérables'])
+        self.assertEqual(self.titres('/api/livres/?date_sortie__month=1885-03'), ['Germinal'])
+        self.assertEqual(self.titres('/api/livres/?date_sortie__gte=1862-04-03&date_sortie__lte=1885-03-02'),
+                         ['Germinal', 'Les Misérables'])
+        self.assertEqual(self.titres('/api/livres/?date_sortie__gt=1862-04-03&date_sortie__lt=1885-03-02'), [])
+        self.assertEqual(self.titres('/api/auteurs/?year=1802'), ['Émile Zola'])
+
+    def test_datetime_ranges(self):
+        """Test qu'une date vaut la journée entière d'un DateTimeField, fuseau courant compris"""
+        self.assertEqual(self.titres('/api/articles/?date=2020-03-15'), ['Ancien'])
+        self.assertEqual(self.titres('/api/articles/?date__lte=2020-03-15'), ['Ancien'])
+        self.assertEqual(self.titres('/api/articles/?date__gt=2020-03-15'), ['Récent'])
+        self.assertEqual(self.titres('/api/articles/?date__gte=2020-03-15T23:00:00'), ['Ancien', 'Récent'])
+
+    def test_datetime_instant(self):
+        """Test qu'un instant sans suffixe sélectionne les lignes de cet instant exact"""
+        self.assertEqual(self.titres('/api/articles/?date=2020-03-15T23:30:00'), ['Ancien'])
+        self.assertEqual(self.titres('/api/articles/?date=2020-03-15T23:30:01'), [])
+
+    def test_invalid_values(self):
+        """Test que les valeurs invalides donnent une 400 détaillée au lieu d'une erreur serveur"""
+        response = self.client.get('/api/auteurs/?year=abc&date_naissance__month=1802-13')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'year', 'date_naissance__month'})
+        self.assertEqual(self.client.get('/api/livres/?auteur=x').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/livres/?date_sortie=2020-02-30').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/async/livres/?date_sortie__year=x').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_sargable(self):
+        """Test qu'aucune fonction n'est appliquée à la colonne filtrée"""
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get('/api/livres/?date_sortie__year=1862')
+        sql = requetes.captured_queries[-1]['sql']
+        self.assertIn('"bibliotheque_livre"."date_sortie" >= ', sql)
+        self.assertNotIn('django_date_extract', sql)
+
+    def test_async_views(self):
+        """Test que les vues async appliquent les mêmes filtres"""
+        token = Token.objects.create(user=User.objects.create_user(username='lecteur', password='password123'))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = client.get(f'/api/async/articles/?categorie={self.art.pk}')
+        self.assertEqual([a['titre'] for a in response.json()['results']], ['Récent'])
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='user', password='password123')
+        self.client.force_authenticate(self.user)
+        categorie = Categorie.objects.create(nom='Tech')
+        self.article = Article.objects.create(titre='Django', contenu='x' * 5000, categorie=categorie)
+        Note.objects.create(titre='Note', contenu='Texte', owner=self.user)
+
+    def test_fields_trims_output_and_columns(self):
+        """Test que ?fields= limite la réponse et les colonnes lues"""
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/articles/?fields=id,titre,categorie')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'titre', 'categorie'])
+        self.assertEqual(response.data['results'][0]['categorie']['nom'], 'Tech')
+        sql = requetes.captured_queries[-1]['sql']
+        self.assertNotIn('"contenu"', sql)
+
+    def test_omit(self):
+        """Test que ?omit= retire des champs, y compris sur le détail"""
+        response = self.client.get(f'/api/articles/{self.article.pk}/?omit=contenu')
+        self.assertEqual(list(response.data), ['id', 'titre', 'nombre_mots', 'temps_lecture', 'date', 'categorie'])
+        response = self.client.get('/api/notes/?omit=contenu,owner')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'titre', 'date_creation', 'date_modification'])
+
+    def test_unknown_field(self):
+        """Test qu'un champ inconnu donne une 400 listant les champs disponibles"""
+        response = self.client.get('/api/articles/?fields=titre,corps')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('corps', response.data['fields'][0])
+
+    def test_ordering_fields_stay_loaded(self):
+        """Test que les champs de tri restent lus : la pagination keyset n'ajoute pas de requête"""
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/articles/?fields=titre&pagination=cursor')
+        self.assertEqual(list(response.data['results'][0]), ['titre'])
+        # Versions (ETag) + page
+        self.assertEqual(len(requetes), 2)
+
+    def test_writes_unaffected(self):
+        """Test que ?fields= est ignoré en écriture"""
+        response = self.client.post('/api/notes/?fields=titre', {'titre': 'Nouvelle', 'contenu': 'Texte'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('contenu', response.data)
+
+
+class FastListTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='lecteur', password='password123')
+        self.client.force_authenticate(self.user)
+        auteur = Auteur.objects.create(nom='Victor Hugo', date_naissance='1802-02-26')
+        categorie = Categorie.objects.create(nom='Littérature')
+        for i in range(7):
+            Livre.objects.create(titre=f'Livre {i} — é\u2028', date_sortie=f'18{30 + i}-01-0{i + 1}', auteur=auteur)
+            Article.objects.create(titre=f'Article {i}', contenu='Texte « accentué »', categorie=categorie)
+            Feedback.objects.create(titre=f'Avis {i}', contenu='...', owner=self.user)
+        # Date sans microsecondes : même format court que isoformat()
+        Article.objects.filter(titre='Article 0').update(date=timezone.make_aware(datetime(2020, 3, 15, 23, 30)))
+
+    def comparer(self, viewset, url):
+        """Réponse du chemin compilé identique, à l'octet près, à celle du serializer"""
+        rapide = self.client.get(url)
+        with mock.patch.object(viewset, 'fast_list', False):
+            lente = self.client.get(url)
+        self.assertEqual(rapide.status_code, status.HTTP_200_OK)
+        self.assertEqual(rapide.content, lente.content)
+        return rapide
+
+    def test_identical_output(self):
+        """Test que livres, articles et feedbacks sont rendus à l'identique"""
+        for viewset, url in ((LivreViewSet, '/api/livres/'), (ArticleListViewSet, '/api/articles/'),
+                             (FeedbackViewSet, '/api/feedbacks/')):
+            for suffixe in ('', '?page=2', '?pagination=cursor', '?fields=id,titre', '?omit=id'):
+                self.comparer(viewset, url + suffixe)
+
+    def test_identical_output_other_timezone(self):
+        """Test que les dates et heures suivent le fuseau courant comme DRF"""
+        with timezone.override('Europe/Paris'):
+            response = self.comparer(ArticleListViewSet, '/api/articles/')
+        self.assertIn('+0', response.json()['results'][0]['date'])
+
+    def test_keyset_cursor(self):
+        """Test que les curseurs keyset sont construits à partir des lignes .values()"""
+        response = self.comparer(LivreViewSet, '/api/livres/?pagination=cursor')
+        self.comparer(LivreViewSet, response.json()['next'])
+
+    def test_single_query(self):
+        """Test qu'une page d'articles et de feedbacks coûte une requête (jointure comprise)"""
+        for url in ('/api/articles/?pagination=cursor', '/api/feedbacks/?pagination=cursor'):
+            with CaptureQueriesContext(connection) as requetes:
+                self.client.get(url)
+            # Versions (ETag) + page
+            self.assertEqual(len(requetes), 2, url)
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get('/api/articles/')
+        # COUNT(*) de la pagination, après la lecture des versions
+        self.assertNotIn('CAST', requetes.captured_queries[1]['sql'])
+
+    def test_search_falls_back(self):
+        """Test que la recherche garde le serializer (champ surlignage)"""
+        response = self.client.get('/api/livres/?search=livre')
+        self.assertIn('surlignage', response.json()['results'][0])
+
+    def test_renderer_matches_drf(self):
+        """Test que le rendu orjson produit les mêmes octets que JSONRenderer"""
+        data = {'texte': 'é \u2028 \u2029 😀', 'date': datetime(2020, 1, 2, 3, 4, 5, 678901),
+                'liste': [1, 2.5, None, True], 'imbrique': {'a': {}}, 1: 'clé entière'}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='user', password='password123')
+        # Même date de création pour tous : l'id doit départager les égalités
+        date = timezone.now()
+        for i in range(12):
+            feedback = Feedback.objects.create(titre=f'Feedback {i}', contenu='...', owner=self.user)
+            Feedback.objects.filter(pk=feedback.pk).update(date_creation=date - timedelta(minutes=i // 3))
+        self.expected = list(Feedback.objects.order_by('-date_creation', 'id').values_list('id', flat=True))
+
+    def test_cursor_pages_cover_all_rows_in_order(self):
+        """Test que le parcours par curseur renvoie toutes les lignes, dans l'ordre, sans doublon"""
+        ids = []
+        url = '/api/feedbacks/?pagination=cursor'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids += [feedback['id'] for feedback in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, self.expected)
+
+    def test_previous_link(self):
+        """Test que le lien précédent renvoie la page précédente"""
+        first = self.client.get('/api/feedbacks/?pagination=cursor')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+
+    def test_count_is_optional(self):
+        """Test que le total n'est calculé que sur demande"""
+        response = self.client.get('/api/feedbacks/?pagination=cursor&count=true')
+        self.assertEqual(response.data['count'], 12)
+
+    def test_invalid_cursor(self):
+        """Test qu'un curseur invalide renvoie une 404"""
+        response = self.client.get('/api/feedbacks/?cursor=nimportequoi')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ranked_search_rejects_cursor(self):
+        """Test que la recherche classée par pertinence refuse la pagination par curseur"""
+        response = self.client.get('/api/livres/?search=paris&pagination=cursor')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_page_number_remains_default(self):
+        """Test que la pagination par numéro de page reste le mode par défaut"""
+        response = self.client.get('/api/feedbacks/?page=2')
+        self.assertEqual(response.data['count'], 12)
+
+
+class CompteurTestCase(TestCase):
+    def setUp(self):
+        self.tech = Categorie.objects.create(nom='Tech')
+        self.science = Categorie.objects.create(nom='Science')
+        self.article = Article.objects.create(titre='A', contenu='...', categorie=self.tech)
+        Article.objects.create(titre='B', contenu='...', categorie=self.tech)
+
+    def par_parent(self, nom, objet_id):
+        return Compteur.objects.get(nom=nom, objet_id=objet_id).valeur
+
+    def test_counters_follow_create_and_delete(self):
+        """Test que les compteurs suivent créations et suppressions"""
+        self.assertEqual(counters.lire_globaux()['article'], 2)
+        self.assertEqual(self.par_parent('categorie.articles', self.tech.pk), 2)
+        self.article.delete()
+        self.assertEqual(counters.lire_globaux()['article'], 1)
+        self.assertEqual(self.par_parent('categorie.articles', self.tech.pk), 1)
+
+    def test_counters_follow_move_and_bulk_create(self):
+        """Test que les compteurs suivent un changement de catégorie et bulk_create"""
+        self.article.categorie = self.science
+        self.article.save()
+        self.assertEqual(self.par_parent('categorie.articles', self.tech.pk), 1)
+        self.assertEqual(self.par_parent('categorie.articles', self.science.pk), 1)
+
+        Article.objects.bulk_create([
+            Article(titre=f'Bulk {i}', contenu='...', categorie=self.science) for i in range(3)
+        ])
+        self.assertEqual(counters.lire_globaux()['article'], 5)
+        self.assertEqual(self.par_parent('categorie.articles', self.science.pk), 4)
+
+    def test_many_parents_are_applied_in_batch(self):
+        """Test que bulk_create sur de nombreux parents met à jour les compteurs en un nombre constant de requêtes"""
+        def importer(nombre):
+            categories = Categorie.objects.bulk_create([Categorie(nom=f'C{i}') for i in range(nombre)])
+            categories.append(self.tech)
+            with CaptureQueriesContext(connection) as requetes:
+                Article.objects.bulk_create([
+                    Article(titre=f'{i}', contenu='...', categorie=categorie)
+                    for categorie in categories for i in range(2)
+                ])
+            return categories, len(requetes)
+
+        _, petit = importer(10)
+        categories, grand = importer(40)
+        self.assertEqual(petit, grand)
+        self.assertEqual(self.par_parent('categorie.articles', self.tech.pk), 6)
+        self.assertEqual(self.par_parent('categorie.articles', categories[0].pk), 2)
+        self.assertEqual(counters.lire_globaux()['article'], 106)
+
+    def test_parent_deletion_cleans_counters(self):
+        """Test que la suppression d'une catégorie supprime ses compteurs"""
+        self.tech.delete()
+        self.assertFalse(Compteur.objects.filter(nom='categorie.articles', objet_id=self.tech.pk).exists())
+        self.assertEqual(counters.lire_globaux()['article'], 0)
+
+    def test_cascade_deletion_is_counted_in_bulk(self):
+        """Test que les suppressions en cascade sont décomptées en bloc, pas ligne à ligne"""
+        Commentaire.objects.bulk_create([
+            Commentaire(article=self.article, nom=f'{i}', email='a@example.com', contenu='...') for i in range(200)
+        ])
+        with CaptureQueriesContext(connection) as requetes:
+            self.article.delete()
+        self.assertLess(len(requetes.captured_queries), 20)
+        self.assertEqual(counters.lire_globaux()['commentaire'], 0)
+        self.assertFalse(Compteur.objects.filter(nom='article.commentaires', objet_id=self.article.pk).exists())
+
+        autre = Article.objects.create(titre='C', contenu='...', categorie=self.science)
+        Commentaire.objects.create(article=autre, nom='A', email='a@example.com', contenu='...')
+        Categorie.objects.filter(pk__in=[self.tech.pk, self.science.pk]).delete()
+        self.assertEqual(counters.lire_globaux()['commentaire'], 0)
+        # Aucune dérive à réparer
+        self.assertEqual(counters.recompter(), 0)
+
+    def test_loaded_instance_update_skips_select(self):
+        """Test qu'un objet chargé puis déplacé ne relit pas son parent avant l'UPDATE"""
+        article = Article.objects.get(pk=self.article.pk)
+        article.categorie = self.science
+        with CaptureQueriesContext(connection) as requetes:
+            article.save()
+        self.assertFalse([q for q in requetes.captured_queries if q['sql'].startswith('SELECT')])
+        article.categorie = self.tech
+        article.save()
+        self.assertEqual(self.par_parent('categorie.articles', self.tech.pk), 2)
+        self.assertEqual(self.par_parent('categorie.articles', self.science.pk), 0)
+
+    def test_counter_failure_rolls_back_save(self):
+        """Test qu'un échec de mise à jour des compteurs annule l'écriture"""
+        with mock.patch.object(counters, 'appliquer', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Article.objects.create(titre='C', contenu='...', categorie=self.tech)
+        self.assertFalse(Article.objects.filter(titre='C').exists())
+        self.assertEqual(counters.lire_globaux()['article'], 2)
+
+    def test_recount_repairs_drift(self):
+        """Test que la commande recount répare la dérive"""
+        Article.objects.filter(pk=self.article.pk).update(categorie=self.science)
+        Compteur.objects.filter(nom='article').update(valeur=42)
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('3 compteur(s)', out.getvalue())
+        self.assertEqual(counters.lire_globaux()['article'], 2)
+        self.assertEqual(self.par_parent('categorie.articles', self.science.pk), 1)
+
+    def test_active_comments_counter(self):
+        """Test que le compteur de commentaires actifs suit création, désactivation et suppression"""
+        commentaire = Commentaire.objects.create(article=self.article, nom='A', email='a@example.com', contenu='...')
+        Commentaire.objects.create(article=self.article, nom='B', email='b@example.com', contenu='...', actif=False)
+        self.assertEqual(self.par_parent('article.commentaires', self.article.pk), 1)
+        commentaire.actif = False
+        commentaire.save()
+        self.assertEqual(self.par_parent('article.commentaires', self.article.pk), 0)
+        Commentaire.objects.filter(actif=False).update(actif=True)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.par_parent('article.commentaires', self.article.pk), 2)
+        Commentaire.objects.filter(nom='B').delete()
+        self.assertEqual(self.par_parent('article.commentaires', self.article.pk), 1)
+
+    def test_home_uses_single_query(self):
+        """Test que la page d'accueil ne coûte qu'une requête"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/')
+        self.assertEqual(response.context['total_articles'], 2)
+        self.assertEqual(response.context['total_categories'], 2)
+
+
+class ArticleListViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        for nom in ['Tech', 'Science', 'Culture']:
+            categorie = Categorie.objects.create(nom=nom)
+            for i in range(3):
+                Article.objects.create(titre=f'{nom} {i}', contenu='...', categorie=categorie)
+
+    def test_query_count_does_not_depend_on_categories(self):
+        """Test que la liste d'articles ne fait pas de requête par catégorie ni par article"""
+        # count (pagination) + articles avec catégorie + versions + catégories annotées
+        with self.assertNumQueries(4):
+            response = self.client.get('/articles/')
+        self.assertContains(response, 'Tech (3 articles)')
+
+        # Le fragment des catégories est servi depuis le cache
+        with self.assertNumQueries(3):
+            self.client.get('/articles/')
+
+    def test_sidebar_is_invalidated_on_write(self):
+        """Test que le fragment des catégories est invalidé à l'ajout d'un article"""
+        self.client.get('/articles/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.create(titre='Nouveau', contenu='...', categorie=Categorie.objects.get(nom='Tech'))
+        response = self.client.get('/articles/')
+        self.assertContains(response, 'Tech (4 articles)')
+
+    def test_sidebar_version_changes_after_commit(self):
+        """Test que la version du fragment des catégories ne change qu'après le commit de l'écriture"""
+        avant = self.client.get('/articles/').context['version_categories']
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Article.objects.create(titre='Nouveau', contenu='...', categorie=Categorie.objects.get(nom='Tech'))
+                self.assertEqual(versions.lire(Categorie, Article), avant)
+            self.assertEqual(versions.lire(Categorie, Article), avant)
+        self.assertNotEqual(self.client.get('/articles/').context['version_categories'], avant)
+
+
+class ArticleDetailViewTestCase(TestCase):
+    def setUp(self):
+        categorie = Categorie.objects.create(nom='Tech')
+        self.article = Article.objects.create(titre='Article', contenu='...', categorie=categorie)
+        self.url = reverse('article-detail', kwargs={'pk': self.article.pk})
+
+    def commenter(self, nombre, actif=True):
+        Commentaire.objects.bulk_create([
+            Commentaire(article=self.article, nom=f'Lecteur {i}', email='a@example.com', contenu='...', actif=actif)
+            for i in range(nombre)
+        ])
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Test que la page de détail coûte le même nombre de requêtes quel que soit le nombre de commentaires"""
+        self.commenter(1)
+        with CaptureQueriesContext(connection) as peu:
+            self.client.get(self.url)
+        self.commenter(60)
+        with CaptureQueriesContext(connection) as beaucoup:
+            response = self.client.get(self.url)
+        self.assertEqual(len(peu), len(beaucoup))
+        self.assertEqual(len(beaucoup), 2)
+        self.assertContains(response, 'Commentaires (61)')
+        self.assertEqual(len(response.context['commentaires']), 20)
+
+    def test_load_more(self):
+        """Test que ?apres= charge la suite des commentaires actifs sans doublon"""
+        self.commenter(45)
+        self.commenter(5, actif=False)
+        vus, url = [], self.url
+        while url:
+            response = self.client.get(url)
+            vus += [commentaire.pk for commentaire in response.context['commentaires']]
+            suivant = response.context['curseur_suivant']
+            url = f'{self.url}?apres={suivant}' if suivant else None
+        actifs = Commentaire.objects.filter(actif=True).order_by('date', 'id').values_list('pk', flat=True)
+        self.assertEqual(vus, list(actifs))
+        self.assertEqual(self.client.get(f'{self.url}?apres=invalide').status_code, 404)
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categorie = Categorie.objects.create(nom='Tech')
+            self.article = Article.objects.create(titre='Article', contenu='...', categorie=self.categorie)
+
+    def test_not_modified_with_single_query(self):
+        """Test qu'un client à jour reçoit une 304 pour la seule lecture des versions"""
+        response = self.client.get('/api/articles/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_write_invalidates_etag(self):
+        """Test qu'une modification change l'ETag de la liste et du détail"""
+        liste = self.client.get('/api/articles/')['ETag']
+        detail = self.client.get(f'/api/articles/{self.article.pk}/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categorie.nom = 'Technologie'
+            self.categorie.save()
+
+        response = self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=liste)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/api/articles/{self.article.pk}/', HTTP_IF_NONE_MATCH=detail)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['categorie']['nom'], 'Technologie')
+
+    def test_versions_follow_commit(self):
+        """Test que les versions sont incrémentées au commit, une fois par modèle et par transaction"""
+        etag = self.client.get('/api/articles/')['ETag']
+        Commentaire.objects.bulk_create([
+            Commentaire(article=self.article, nom=f'{i}', email='a@example.com', contenu='...') for i in range(50)
+        ])
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.categorie.delete()
+            # Écriture pas encore validée : l'ETag ne change pas
+            self.assertEqual(self.client.get('/api/articles/')['ETag'], etag)
+        callbacks[0]()
+        # Tous les modèles écrits sont incrémentés par le premier rappel
+        with self.assertNumQueries(0):
+            for callback in callbacks[1:]:
+                callback()
+        self.assertNotEqual(self.client.get('/api/articles/')['ETag'], etag)
+
+    def test_versions_survive_savepoint_rollback(self):
+        """Test qu'un savepoint annulé ne fait pas perdre l'incrément d'une écriture validée ensuite"""
+        avant = versions.lire(Categorie)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        Categorie.objects.create(nom='Annulée')
+                        raise ValueError
+                except ValueError:
+                    pass
+                self.categorie.nom = 'Technologie'
+                self.categorie.save()
+        self.assertNotEqual(versions.lire(Categorie), avant)
+
+    def test_versions_are_shared(self):
+        """Test que les versions sont stockées en base, indépendamment du cache du processus"""
+        etag = self.client.get('/api/articles/')['ETag']
+        cache.clear()
+        response = self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertTrue(Compteur.objects.filter(nom='version:bibliotheque.article').exists())
+
+    def test_versions_ignore_login_and_unversioned_models(self):
+        """Test qu'une connexion et les modèles sans version n'incrémentent aucune version"""
+        user = User.objects.create_user(username='lecteur', password='secret')
+        note = Note.objects.create(titre='Note', contenu='...', owner=user)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.login(username='lecteur', password='secret')
+        self.assertEqual(callbacks, [])
+        note_id = note.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            note.delete()
+        self.assertTrue(NoteSupprimee.objects.filter(note_id=note_id).exists())
+        self.assertFalse(Compteur.objects.filter(nom='version:bibliotheque.notesupprimee').exists())
+
+    def test_etag_depends_on_query_string(self):
+        """Test que l'ETag dépend des paramètres de la requête"""
+        page = self.client.get('/api/articles/')['ETag']
+        recherche = self.client.get('/api/articles/?search=article')['ETag']
+        self.assertNotEqual(page, recherche)
+
+
+class BulkActionsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.hugo = Auteur.objects.create(nom='Victor Hugo', date_naissance='1802-02-26')
+        self.zola = Auteur.objects.create(nom='Émile Zola', date_naissance='1840-04-02')
+
+    def test_bulk_create_in_constant_queries(self):
+        """Test que la création en masse ne fait pas de requête par élément"""
+        data = [{'titre': f'Livre {i}', 'date_sortie': '2000-01-01', 'auteur': self.hugo.pk} for i in range(50)]
+        self.client.post('/api/livres/bulk/', data[:1], format='json')  # Crée les compteurs
+        with CaptureQueriesContext(connection) as petit_lot:
+            self.client.post('/api/livres/bulk/', data[:4], format='json')
+        with CaptureQueriesContext(connection) as grand_lot:
+            response = self.client.post('/api/livres/bulk/', data, format='json')
+        self.assertEqual(len(petit_lot), len(grand_lot))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['ids']), 50)
+        self.assertEqual(Livre.objects.filter(auteur=self.hugo).count(), 55)
+        self.assertEqual(counters.lire_globaux()['livre'], 55)
+
+        # Les livres créés en masse sont indexés pour la recherche
+        response = self.client.get('/api/livres/?search=hugo')
+        self.assertEqual(response.data['count'], 55)
+
+    def test_bulk_create_atomic_and_partial(self):
+        """Test des modes atomique et partiel avec erreurs par élément"""
+        data = [
+            {'titre': 'Valide', 'date_sortie': '2000-01-01', 'auteur': self.hugo.pk},
+            {'titre': 'Auteur inconnu', 'date_sortie': '2000-01-01', 'auteur': 999},
+            {'titre': '', 'date_sortie': 'pas une date', 'auteur': self.zola.pk},
+        ]
+        response = self.client.post('/api/livres/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([e['index'] for e in response.data['errors']], [1, 2])
+        self.assertIn('auteur', response.data['errors'][0]['errors'])
+        self.assertFalse(Livre.objects.exists())
+
+        response = self.client.post('/api/livres/bulk/?mode=partial', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(Livre.objects.get().titre, 'Valide')
+
+    def test_bulk_update_and_destroy(self):
+        """Test de la modification et de la suppression en masse"""
+        livres = Livre.objects.bulk_create([
+            Livre(titre=f'Livre {i}', date_sortie='2000-01-01', auteur=self.hugo) for i in range(3)
+        ])
+        data = [{'id': livre.pk, 'auteur': self.zola.pk} for livre in livres]
+        data.append({'id': 999, 'titre': 'Inconnu'})
+        response = self.client.patch('/api/livres/bulk/?mode=partial', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(Livre.objects.filter(auteur=self.zola).count(), 3)
+        self.assertEqual(Compteur.objects.get(nom='auteur.livres', objet_id=self.zola.pk).valeur, 3)
+        self.assertEqual(Compteur.objects.get(nom='auteur.livres', objet_id=self.hugo.pk).valeur, 0)
+
+        response = self.client.delete('/api/livres/bulk/', [livre.pk for livre in livres], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Livre.objects.exists())
+
+    def test_bulk_requires_list(self):
+        """Test qu'un corps qui n'est pas une liste est refusé"""
+        response = self.client.post('/api/livres/bulk/', {'titre': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        auteur = Auteur.objects.create(nom='Victor Hugo', date_naissance='1802-02-26')
+        self.livres = [
+            Livre.objects.create(titre=f'Livre, {i}', date_sortie='2000-01-01', auteur=auteur) for i in range(3)
+        ]
+        categorie = Categorie.objects.create(nom='Tech')
+        self.ancien = Article.objects.create(titre='Ancien', contenu='...', categorie=categorie)
+        Article.objects.filter(pk=self.ancien.pk).update(date=timezone.now() - timedelta(days=10))
+        Article.objects.create(titre='Récent', contenu='Texte « accentué »', categorie=categorie)
+
+    def lire(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test de l'export NDJSON en flux"""
+        response = self.client.get('/api/livres/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lignes = [json.loads(ligne) for ligne in self.lire(response).splitlines()]
+        self.assertEqual(len(lignes), 3)
+        self.assertEqual(lignes[0]['auteur_nom'], 'Victor Hugo')
+
+    def test_export_csv(self):
+        """Test de l'export CSV avec en-tête et échappement"""
+        response = self.client.get('/api/livres/export/?output=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lignes = list(csv.reader(self.lire(response).splitlines()))
+        self.assertEqual(lignes[0], ['id', 'titre', 'date_sortie', 'auteur_id', 'auteur_nom'])
+        self.assertEqual(lignes[1][1], 'Livre, 0')
+
+    def test_export_since(self):
+        """Test de l'export incrémental avec ?since="""
+        response = self.client.get(f'/api/livres/export/?since={self.livres[0].pk}')
+        self.assertEqual(len(self.lire(response).splitlines()), 2)
+
+        depuis = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get('/api/articles/export/', {'since': depuis})
+        lignes = [json.loads(ligne) for ligne in self.lire(response).splitlines()]
+        self.assertEqual([ligne['titre'] for ligne in lignes], ['Récent'])
+
+        response = self.client.get('/api/articles/export/?since=hier')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportCatalogueTestCase(TestCase):
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dossier.cleanup)
+
+    def fichier(self, nom, contenu):
+        chemin = Path(self.dossier.name) / nom
+        chemin.write_text(contenu, encoding='utf-8')
+        return str(chemin)
+
+    def test_import_auteurs_then_livres(self):
+        """Test de l'import CSV puis JSONL avec résolution des auteurs par nom"""
+        auteurs = self.fichier('auteurs.csv', 'nom,date_naissance\nVictor Hugo,1802-02-26\nÉmile Zola,1840-04-02\n')
+        livres = self.fichier('livres.jsonl', '\n'.join(json.dumps(ligne) for ligne in [
+            {'titre': 'Les Misérables', 'date_sortie': '1862-01-01', 'auteur': 'Victor Hugo'},
+            {'titre': 'Germinal', 'date_sortie': '1885-01-01', 'auteur': 'Émile Zola'},
+            {'titre': 'Orphelin', 'date_sortie': '1900-01-01', 'auteur': 'Inconnu'},
+        ]))
+        call_command('import_catalogue', 'auteurs', auteurs, stdout=StringIO())
+        call_command('import_catalogue', 'livres', livres, batch_size=2, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(Livre.objects.get(titre='Germinal').auteur.nom, 'Émile Zola')
+        self.assertEqual(Livre.objects.count(), 2)
+        self.assertEqual(counters.lire_globaux()['livre'], 2)
+        self.assertFalse(Path(livres + '.checkpoint').exists())
+
+    def test_resume_from_checkpoint(self):
+        """Test de la reprise d'un import interrompu"""
+        articles = self.fichier('articles.csv', 'titre,contenu,categorie\n' + ''.join(
+            f'Article {i},Contenu {i},{"Tech" if i % 2 else "Science"}\n' for i in range(5)
+        ))
+        # Simule un import interrompu après les 3 premières lignes
+        Path(articles + '.checkpoint').write_text(json.dumps({'fichier': str(Path(articles).resolve()), 'lignes': 3}))
+        call_command('import_catalogue', 'articles', articles, stdout=StringIO())
+
+        self.assertEqual(sorted(Article.objects.values_list('titre', flat=True)), ['Article 3', 'Article 4'])
+        self.assertEqual(Categorie.objects.count(), 2)
+
+
+    def test_resume_seeks_to_byte_offset(self):
+        """Test que la reprise repart de la position en octets enregistrée, sans relire le début"""
+        entete = 'titre,contenu,categorie\n'
+        lignes = [f'Été {i},"Contenu\nsur deux lignes",Tech\n' for i in range(5)]
+        articles = self.fichier('articles.csv', entete + ''.join(lignes))
+        module = 'bibliotheque.management.commands.import_catalogue.ecriture_en_masse'
+        with mock.patch(module, side_effect=[None, RuntimeError]), self.assertRaises(RuntimeError):
+            call_command('import_catalogue', 'articles', articles, batch_size=2, stdout=StringIO())
+
+        reprise = json.loads(Path(articles + '.checkpoint').read_text())
+        self.assertEqual(reprise['lignes'], 2)
+        self.assertEqual(reprise['position'], len((entete + lignes[0] + lignes[1]).encode()))
+        self.assertEqual(reprise['lignes_physiques'], 5)
+        call_command('import_catalogue', 'articles', articles, batch_size=2, stdout=StringIO())
+        self.assertEqual(Article.objects.count(), 5)
+        self.assertEqual(Article.objects.get(titre='Été 4').contenu, 'Contenu\nsur deux lignes')
+
+class GroupCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='password123')
+        self.moderator_group = Group.objects.create(name='moderator')
+        self.user.groups.add(self.moderator_group)
+
+    def test_groups_loaded_once(self):
+        """Test que les groupes sont chargés une fois puis servis par le cache"""
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertIn('moderator', get_user_groups(user))
+            self.assertIn('moderator', get_user_groups(user))
+        with self.assertNumQueries(0):
+            self.assertIn('moderator', get_user_groups(User(pk=self.user.pk)))
+
+    def test_membership_changes_invalidate_cache(self):
+        """Test que les changements d'appartenance invalident le cache"""
+        get_user_groups(self.user)
+        self.user.groups.remove(self.moderator_group)
+        self.assertNotIn('moderator', get_user_groups(User.objects.get(pk=self.user.pk)))
+
+        self.moderator_group.user_set.add(self.user)
+        self.assertIn('moderator', get_user_groups(User.objects.get(pk=self.user.pk)))
+
+        self.moderator_group.user_set.clear()
+        self.assertNotIn('moderator', get_user_groups(User.objects.get(pk=self.user.pk)))
+
+    def test_group_rename_invalidates_cache(self):
+        """Test que le renommage d'un groupe invalide le cache de ses membres"""
+        get_user_groups(self.user)
+        self.moderator_group.name = 'moderateurs'
+        self.moderator_group.save()
+        self.assertEqual(get_user_groups(User.objects.get(pk=self.user.pk)), {'moderateurs'})
+
+
+class SlidingWindowThrottleTestCase(TestCase):
+    limites = [('throttle_user_1', 3, 60)]
+
+    def setUp(self):
+        cache.clear()
+
+    def verifier_store(self, store, autre_store=None):
+        autre_store = autre_store or store
+        t = 6000.0
+        self.assertEqual(store.hit(self.limites, t), (True, None))
+        self.assertEqual(autre_store.hit(self.limites, t + 1), (True, None))
+        self.assertEqual(store.hit(self.limites, t + 2), (True, None))
+        autorise, delai = autre_store.hit(self.limites, t + 3)
+        self.assertFalse(autorise)
+        self.assertGreater(delai, 0)
+        # Fenêtre suivante : les 3 hits précédents ne comptent plus qu'au prorata
+        self.assertFalse(store.hit(self.limites, t + 61)[0])
+        self.assertTrue(store.hit(self.limites, t + 100)[0])
+        # Deux fenêtres plus tard, tout est oublié
+        self.assertTrue(store.hit(self.limites, t + 200)[0])
+
+    def test_cache_store(self):
+        """Test de la fenêtre glissante sur le cache Django"""
+        self.verifier_store(CacheThrottleStore())
+
+    def test_sqlite_store_shared_between_instances(self):
+        """Test que le stockage SQLite est partagé entre instances (processus)"""
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = Path(dossier) / 'throttle.sqlite3'
+            self.verifier_store(SQLiteThrottleStore(chemin), SQLiteThrottleStore(chemin))
+
+    def test_all_limits_checked_together(self):
+        """Test qu'un refus sur une limite ne consomme pas les autres"""
+        store = CacheThrottleStore()
+        limites = [('throttle_user_1', 100, 86400), ('throttle_feedback_create_1', 1, 86400)]
+        self.assertTrue(store.hit(limites, 1000.0)[0])
+        self.assertFalse(store.hit(limites, 1001.0)[0])
+        self.assertEqual(cache.get('throttle_user_1:0'), 1)
+
+    def test_cache_store_concurrent_hits(self):
+        """Test que des hits concurrents sur le cache ne perdent aucun incrément"""
+        store = CacheThrottleStore()
+        limites = [('throttle_user_1', 1000, 86400)]
+        threads = [threading.Thread(target=lambda: [store.hit(limites, 1000.0) for _ in range(50)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get('throttle_user_1:0'), 400)
+
+    def test_feedback_throttle_scope(self):
+        """Test que seules les créations de feedbacks sont limitées, par la portée feedback_create"""
+        user = User.objects.create_user(username='lecteur', password='password123')
+        client = APIClient()
+        client.force_authenticate(user)
+        rates = {'user': '1/min', 'feedback_create': '2/min'}
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            for _ in range(3):
+                self.assertEqual(client.get('/api/feedbacks/').status_code, status.HTTP_200_OK)
+            statuts = [client.post('/api/feedbacks/', {'titre': 'T', 'contenu': 'C'}).status_code
+                       for _ in range(3)]
+        self.assertEqual(statuts[2], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn(status.HTTP_429_TOO_MANY_REQUESTS, statuts[:2])
+
+    def test_anonymous_rate_limit(self):
+        """Test que la limite anonyme s'applique aux endpoints de l'API"""
+        client = APIClient()
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'anon': '2/min'}}):
+            self.assertEqual(client.get('/api/livres/').status_code, status.HTTP_200_OK)
+            self.assertEqual(client.get('/api/livres/').status_code, status.HTTP_200_OK)
+            response = client.get('/api/livres/')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn('Retry-After', response)
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='lecteur', password='password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def requetes(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/notes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q['sql'] for q in requetes if 'authtoken_token' in q['sql']]
+
+    def test_token_lookup_cached(self):
+        """Test que le token n'est lu en base qu'à la première requête"""
+        self.assertEqual(len(self.requetes()), 1)
+        self.assertEqual(self.requetes(), [])
+        # Processus sans LRU local : le cache partagé suffit
+        local_cache.clear()
+        self.assertEqual(self.requetes(), [])
+
+    def test_deleted_token_rejected(self):
+        """Test qu'un token supprimé (ou renouvelé) est refusé immédiatement"""
+        self.requetes()
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/notes/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test qu'un utilisateur désactivé est refusé immédiatement"""
+        self.requetes()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/notes/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token_rejected(self):
+        """Test qu'un token inconnu est refusé"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token inconnu')
+        self.assertEqual(self.client.get('/api/notes/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SQLiteTuningTestCase(TestCase):
+    def pragma(self, nom):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nom}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connection(self):
+        """Test que les PRAGMA de settings.SQLITE_PRAGMAS sont appliqués à la connexion"""
+        self.assertEqual(self.pragma('busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+
+    def test_journal_mode_only_when_configured(self):
+        """Test que le mode de journal, persistant dans le fichier, n'est changé que sur demande"""
+        with tempfile.TemporaryDirectory() as dossier:
+            base = {**settings.DATABASES['default'], 'NAME': str(Path(dossier) / 'base.sqlite3')}
+            for mode, attendu in ((None, 'delete'), ('WAL', 'wal')):
+                with self.settings(SQLITE_JOURNAL_MODE=mode):
+                    autre = connections['default'].__class__(base, alias='autre')
+                    try:
+                        with autre.cursor() as cursor:
+                            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], attendu)
+                    finally:
+                        autre.close()
+
+
+class ReadReplicaRouterTestCase(SimpleTestCase):
+    replica = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'file:replica?mode=ro', 'OPTIONS': {'uri': True}}
+
+    def test_without_replica_everything_on_default(self):
+        """Test que sans alias de lecture tout reste sur default"""
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Livre), 'default')
+        self.assertEqual(router.db_for_write(Livre), 'default')
+
+    def test_reads_routed_to_replica(self):
+        """Test que les lectures vont sur l'alias de lecture et les écritures sur default"""
+        router = ReadReplicaRouter()
+        with self.settings(DATABASES={**settings.DATABASES, 'replica': self.replica}):
+            self.assertEqual(router.db_for_read(Livre), 'replica')
+            self.assertEqual(router.db_for_write(Livre), 'default')
+            self.assertFalse(router.allow_migrate('replica', 'bibliotheque'))
+
+    def test_reads_stay_on_default_in_transaction(self):
+        """Test que dans une transaction les lectures restent sur default"""
+        router = ReadReplicaRouter()
+        with self.settings(DATABASES={**settings.DATABASES, 'replica': self.replica}):
+            connection.in_atomic_block = True
+            try:
+                self.assertEqual(router.db_for_read(Livre), 'default')
+            finally:
+                connection.in_atomic_block = False
+
+
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.token = Token.objects.create(user=self.admin)
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.auteur = Auteur.objects.create(nom='Victor Hugo', date_naissance='1802-02-26')
+        for i in range(7):
+            Livre.objects.create(titre=f'Livre {i}', date_sortie='1862-01-01', auteur=self.auteur)
+        categorie = Categorie.objects.create(nom='Tech')
+        self.article = Article.objects.create(titre='Django async', contenu='ORM async.', categorie=categorie)
+
+    def comparer(self, url_async, url_sync):
+        reponse_async, reponse_sync = self.api.get(url_async), self.api.get(url_sync)
+        self.assertEqual(reponse_async.status_code, reponse_sync.status_code)
+        donnees_async = json.loads(reponse_async.content)
+        donnees_sync = json.loads(reponse_sync.content)
+        for cle in ('next', 'previous'):
+            if isinstance(donnees_sync, dict) and donnees_sync.get(cle):
+                donnees_sync[cle] = donnees_sync[cle].replace('/api/', '/api/async/')
+        self.assertEqual(donnees_async, donnees_sync)
+
+    def test_same_responses_as_viewsets(self):
+        """Test que les vues async renvoient les mêmes données que les ViewSets"""
+        livre = Livre.objects.first()
+        self.comparer('/api/async/livres/', '/api/livres/')
+        self.comparer('/api/async/livres/?page=2', '/api/livres/?page=2')
+        self.comparer('/api/async/livres/?search=livre', '/api/livres/?search=livre')
+        self.comparer(f'/api/async/livres/{livre.pk}/', f'/api/livres/{livre.pk}/')
+        self.comparer('/api/async/articles/', '/api/articles/')
+        self.comparer(f'/api/async/articles/{self.article.pk}/', f'/api/articles/{self.article.pk}/')
+        self.comparer(f'/api/async/auteurs/{self.auteur.pk}/titres/', f'/api/auteurs/{self.auteur.pk}/titres/')
+
+    def test_errors(self):
+        """Test des erreurs : 404, page invalide, méthode non autorisée"""
+        self.assertEqual(self.api.get('/api/async/livres/999/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.api.get('/api/async/livres/?page=9').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.api.post('/api/async/livres/', {}).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_titres_requires_admin(self):
+        """Test que les titres async sont réservés au staff, comme l'endpoint synchrone"""
+        url = f'/api/async/auteurs/{self.auteur.pk}/titres/'
+        self.assertEqual(APIClient().get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        lecteur = User.objects.create_user(username='lecteur', password='password123')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=lecteur).key)
+        self.assertEqual(client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        client.credentials(HTTP_AUTHORIZATION='Token invalide')
+        self.assertEqual(client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_home(self):
+        """Test que la page d'accueil async affiche les statistiques"""
+        response = self.client.get('/async/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_livres'], 7)
+
+    async def test_concurrent_requests(self):
+        """Test que des requêtes concurrentes sont servies par la boucle d'événements"""
+        client = AsyncClient(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        reponses = await asyncio.gather(*[client.get('/api/async/livres/') for _ in range(20)])
+        self.assertTrue(all(r.status_code == 200 for r in reponses))
+        self.assertEqual({json.loads(r.content)['count'] for r in reponses}, {7})
+
+
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.histogrammes.vider()
+        self.admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.token = Token.objects.create(user=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        auteur = Auteur.objects.create(nom='Victor Hugo', date_naissance='1802-02-26')
+        Livre.objects.create(titre='Les Misérables', date_sortie='1862-01-01', auteur=auteur)
+
+    def timing(self, response):
+        return dict(
+            (entree.split(';')[0], entree)
+            for entree in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_header(self):
+        """Test que l'en-tête Server-Timing donne le nombre de requêtes SQL et les phases"""
+        local_cache.clear()
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/livres/')
+        timing = self.timing(response)
+        self.assertIn(f'desc="{len(requetes)} req"', timing['db'])
+        for nom in ('throttle', 'serialize', 'app', 'render', 'total'):
+            self.assertIn(nom, timing)
+        self.assertNotIn('dup', timing)
+
+    def test_duplicate_queries_detected(self):
+        """Test que des requêtes répétées (N+1) sont repérées par empreinte"""
+        with instrumentation.collecter() as mesure:
+            for auteur in Auteur.objects.all():
+                for pk in range(3):
+                    list(auteur.livres.filter(pk=pk))
+        self.assertEqual(mesure.requetes, 4)
+        self.assertEqual(list(mesure.doublons(3).values()), [3])
+
+    def test_slow_request_logged(self):
+        """Test que les requêtes au-delà des seuils sont journalisées avec leurs mesures"""
+        with self.settings(INSTRUMENTATION={'SLOW_REQUEST_MS': 0}):
+            with self.assertLogs('bibliotheque.instrumentation', 'WARNING') as logs:
+                self.client.get('/api/livres/')
+        donnees = logs.records[0].instrumentation
+        self.assertEqual(donnees['route'], 'GET /api/livres/')
+        self.assertEqual(donnees['status'], 200)
+
+    def test_histograms_endpoint(self):
+        """Test que les histogrammes par route sont exposés au staff et remis à zéro par DELETE"""
+        self.client.get('/api/livres/')
+        self.client.get('/api/livres/')
+        response = self.client.get('/api/instrumentation/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['routes']['GET /api/livres/']
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(sum(stats['buckets'].values()), 2)
+        self.assertIn('mean_serialize_ms', stats)
+
+        self.assertEqual(self.client.delete('/api/instrumentation/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertNotIn('GET /api/livres/', self.client.get('/api/instrumentation/').data['routes'])
+
+    def test_histograms_admin_only(self):
+        """Test que l'endpoint d'instrumentation est réservé au staff"""
+        self.assertEqual(APIClient().get('/api/instrumentation/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_disabled(self):
+        """Test que l'instrumentation désactivée n'ajoute rien à la réponse"""
+        with self.settings(INSTRUMENTATION={'ENABLED': False}):
+            client = APIClient()
+            response = client.get('/api/livres/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_serialize_phase(self):
+        """Test que la sérialisation (serializer ou plan compilé) est chronométrée à part"""
+        for url in ('/api/livres/', '/api/auteurs/', f'/api/livres/{Livre.objects.get().pk}/', '/api/async/livres/'):
+            with mock.patch.object(instrumentation.Mesure, 'durees', autospec=True,
+                                   side_effect=instrumentation.Mesure.durees) as durees:
+                self.client.get(url)
+            self.assertGreater(durees.call_args.args[0].phases['serialize'], 0, url)
+
+    def test_async_views_measured(self):
+        """Test que les requêtes SQL des vues async sont comptées"""
+        response = self.client.get('/api/async/livres/')
+        self.assertRegex(self.timing(response)['db'], r'desc="[1-9]\d* req"')
+
+
+class IndexAdvisorTestCase(TestCase):
+    def test_plan_analysis(self):
+        """Test que parcours complets et tris temporaires sont signalés, pas les parcours d'index"""
+        self.assertEqual(analyser_plan(['SCAN bibliotheque_livre']), ['parcours complet de bibliotheque_livre'])
+        self.assertEqual(analyser_plan(['SCAN bibliotheque_livre USING INDEX livre_titre_idx']), [])
+        self.assertEqual(analyser_plan(['SCAN bibliotheque_livre USING COVERING INDEX livre_auteur_titre_idx']), [])
+        self.assertEqual(analyser_plan(['USE TEMP B-TREE FOR ORDER BY']), ['tri temporaire (ORDER BY)'])
+
+    def test_hot_queries_use_indexes(self):
+        """Test que les listes triées d'articles et de commentaires évitent le tri temporaire"""
+        categorie = Categorie.objects.create(nom='Tech')
+        article = Article.objects.create(titre='Django', contenu='...', categorie=categorie)
+        Commentaire.objects.create(article=article, nom='A', email='a@example.com', contenu='...')
+        for queryset in (Article.objects.all(), Article.objects.filter(categorie=categorie),
+                         Commentaire.objects.filter(article=article, actif=True).order_by('date')):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [ligne[-1] for ligne in cursor.fetchall()]
+            self.assertEqual(analyser_plan(plan), [], plan)
+
+    def test_command_runs(self):
+        """Test que la commande parcourt les routes et échoue avec --fail en cas de problème"""
+        admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        Token.objects.create(user=admin)
+        out = StringIO()
+        call_command('index_advisor', '--ignore', 'bibliotheque_categorie', stdout=out)
+        self.assertIn('livre-list (/api/livres/)', out.getvalue())
+        # Même nom pour la route du routeur DRF et la vue MVT : les deux sont analysées
+        self.assertIn('article-list (/api/articles/)', out.getvalue())
+        self.assertIn('article-list (/articles/)', out.getvalue())
+
+
+class ArticleExtraitTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.categorie = Categorie.objects.create(nom='Tech')
+        self.contenu = ' '.join(f'mot{i}' for i in range(450))
+        self.article = Article.objects.create(titre='Long', contenu=self.contenu, categorie=self.categorie)
+
+    def test_computed_on_save(self):
+        """Test que l'extrait, le nombre de mots et le temps de lecture sont calculés à l'enregistrement"""
+        self.assertEqual(self.article.extrait, ' '.join(f'mot{i}' for i in range(30)) + ' …')
+        self.assertEqual(self.article.nombre_mots, 450)
+        self.assertEqual(self.article.temps_lecture, 3)
+        self.article.contenu = 'Court.'
+        self.article.save(update_fields=['contenu'])
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.extrait, self.article.nombre_mots, self.article.temps_lecture), ('Court.', 1, 1))
+
+    def test_bulk_paths(self):
+        """Test que bulk_create et bulk_update calculent aussi les champs dérivés"""
+        Article.objects.bulk_create([Article(titre='Lot', contenu='un deux trois', categorie=self.categorie)])
+        self.assertEqual(Article.objects.get(titre='Lot').nombre_mots, 3)
+        self.article.contenu = 'un deux'
+        Article.objects.bulk_update([self.article], ['contenu'])
+        self.assertEqual(Article.objects.get(pk=self.article.pk).extrait, 'un deux')
+
+    def test_backfill_command(self):
+        """Test que la commande recalcule les articles modifiés hors de save()"""
+        Article.objects.filter(pk=self.article.pk).update(contenu='Réécrit', extrait='', nombre_mots=0)
+        out = StringIO()
+        call_command('backfill_excerpts', '--batch-size', '1', stdout=out)
+        self.assertIn('1 article(s) mis à jour', out.getvalue())
+        self.assertEqual(Article.objects.get(pk=self.article.pk).extrait, 'Réécrit')
+        call_command('backfill_excerpts', stdout=out)
+        self.assertIn('Extraits à jour', out.getvalue())
+
+    def test_list_page_defers_contenu(self):
+        """Test que la page de liste affiche l'extrait sans lire le contenu"""
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('article-list'))
+        self.assertContains(response, 'mot29 …')
+        self.assertNotContains(response, 'mot30')
+        self.assertFalse(any('"contenu"' in requete['sql'] for requete in requetes.captured_queries))
+
+    def test_api_list_returns_excerpt(self):
+        """Test que la liste de l'API renvoie l'extrait sans lire le contenu, le détail garde le contenu"""
+        client = APIClient()
+        for mode in (True, False):
+            with mock.patch.object(ArticleListViewSet, 'fast_list', mode), \
+                    CaptureQueriesContext(connection) as requetes:
+                response = client.get('/api/articles/')
+            resultat = response.data['results'][0]
+            self.assertNotIn('contenu', resultat)
+            self.assertEqual((resultat['nombre_mots'], resultat['temps_lecture']), (450, 3))
+            self.assertTrue(resultat['extrait'].endswith('mot29 …'))
+            self.assertFalse(any('"contenu"' in requete['sql'] for requete in requetes.captured_queries))
+        response = client.get(f'/api/articles/{self.article.pk}/')
+        self.assertEqual(response.data['contenu'], self.contenu)
+
+
+class IngestionTestCase(TransactionTestCase):
+    # Requêtes concurrentes depuis plusieurs threads : données réellement validées
+    def setUp(self):
+        cache.clear()
+        self.dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dossier.cleanup)
+        self.config = {
+            'ENABLED': True, 'PATH': Path(self.dossier.name) / 'ingestion.sqlite3',
+            'BATCH_SIZE': 100, 'FLUSH_INTERVAL': 0.05, 'WORKER_THREAD': False,
+        }
+        self.user = User.objects.create_user(username='user', password='password123')
+        self.article = Article.objects.create(titre='Viral', contenu='...', categorie=Categorie.objects.create(nom='Tech'))
+
+    def poster(self, i):
+        if i % 2:
+            client = APIClient()
+            client.force_authenticate(self.user)
+            return client.post('/api/feedbacks/', {'titre': f'Avis {i}', 'contenu': '...'}).status_code
+        response = Client().post(reverse('article-detail', kwargs={'pk': self.article.pk}),
+                                 {'nom': f'Lecteur {i}', 'email': 'a@example.com', 'contenu': '...'})
+        return response.status_code
+
+    def rafale(self, posteurs):
+        """Statuts de `posteurs` soumissions simultanées (un thread chacune)"""
+        depart, statuts = threading.Barrier(posteurs), [None] * posteurs
+
+        def poster(i):
+            depart.wait()
+            try:
+                statuts[i] = self.poster(i)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=poster, args=(i,)) for i in range(posteurs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuts
+
+    def test_concurrent_posters_are_batched(self):
+        """Test que 200 soumissions simultanées sont acquittées puis insérées en au plus 4 INSERT"""
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        with self.settings(INGESTION=self.config, REST_FRAMEWORK=rest_framework, INSTRUMENTATION={'ENABLED': False}):
+            statuts = self.rafale(200)
+            self.assertEqual(sorted(set(statuts)), [202, 302])
+            self.assertEqual(ingestion.get_file().taille(), 200)
+            self.assertEqual(Feedback.objects.count() + Commentaire.objects.count(), 0)
+
+            with CaptureQueriesContext(connection) as requetes:
+                self.assertEqual(ingestion.vider(), 200)
+        inserts = [q for q in requetes.captured_queries if q['sql'].startswith('INSERT INTO "bibliotheque_')]
+        # Deux lots de 100, un INSERT par modèle et par lot, au lieu de 200
+        self.assertLessEqual(len([q for q in inserts if 'compteur' not in q['sql']]), 4)
+        self.assertEqual(Feedback.objects.count(), 100)
+        self.assertEqual(Commentaire.objects.filter(article=self.article).count(), 100)
+        self.assertEqual(Compteur.objects.get(nom='article.commentaires', objet_id=self.article.pk).valeur, 100)
+
+    def test_worker_thread_and_invalid_rows(self):
+        """Test que le thread de vidage insère la file et écarte une ligne refusée par la base"""
+        with self.settings(INGESTION={**self.config, 'WORKER_THREAD': True}), \
+                self.assertLogs('bibliotheque.ingestion', 'ERROR') as journal:
+            ingestion.soumettre(Commentaire, {'nom': 'A', 'email': 'a@example.com', 'contenu': '...', 'article_id': 0})
+            self.assertEqual(self.poster(1), status.HTTP_202_ACCEPTED)
+            limite = time.monotonic() + 5
+            while ingestion.get_file().taille() and time.monotonic() < limite:
+                time.sleep(0.02)
+            self.assertEqual(ingestion.get_file().taille(), 0)
+        self.assertIn('bibliotheque.commentaire', journal.output[0])
+        self.assertEqual(Feedback.objects.get().titre, 'Avis 1')
+        self.assertFalse(Commentaire.objects.exists())
+
+    def test_disabled_by_default(self):
+        """Test que sans INGESTION['ENABLED'] la création reste synchrone"""
+        self.assertEqual(self.poster(1), status.HTTP_201_CREATED)
+        self.assertEqual(Feedback.objects.count(), 1)
+
+
+class NoteSyncTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = '/api/notes/sync/'
+        # Sans marge : les notes créées par le test sont synchronisables aussitôt
+        patcher = mock.patch.object(sync, 'MARGE', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def synchroniser(self, since=None):
+        response = self.client.get(self.url, {'since': since} if since else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_changes_since_cursor(self):
+        """Test que la synchronisation renvoie les notes modifiées et supprimées depuis le curseur"""
+        notes = [Note.objects.create(titre=f'Note {i}', contenu='...', owner=self.user) for i in range(3)]
+        notes[0].delete()
+        data = self.synchroniser()
+        self.assertEqual([note['id'] for note in data['results']], [notes[1].pk, notes[2].pk])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+
+        notes[1].titre = 'Modifiée'
+        notes[1].save()
+        Note.objects.create(titre='Nouvelle', contenu='...', owner=self.user)
+        supprimee = notes[2].pk
+        notes[2].delete()
+        data = self.synchroniser(data['cursor'])
+        self.assertEqual([note['titre'] for note in data['results']], ['Modifiée', 'Nouvelle'])
+        self.assertEqual(data['deleted'], [supprimee])
+
+        data = self.synchroniser(data['cursor'])
+        self.assertEqual((data['results'], data['deleted']), ([], []))
+
+    def test_pages(self):
+        """Test que has_more fait parcourir les changements par pages sans en perdre"""
+        pks = [Note.objects.create(titre=f'Note {i}', contenu='...', owner=self.user).pk for i in range(5)]
+        vus, since = [], None
+        with mock.patch.object(NoteViewSet, 'sync_limite', 2):
+            while True:
+                data = self.synchroniser(since)
+                vus += [note['id'] for note in data['results']]
+                since = data['cursor']
+                if not data['has_more']:
+                    break
+        self.assertEqual(vus, pks)
+
+    def test_settle_margin(self):
+        """Test que les changements trop récents sont gardés pour la synchronisation suivante"""
+        with mock.patch.object(sync, 'MARGE', timedelta(minutes=1)):
+            Note.objects.create(titre='Note', contenu='...', owner=self.user)
+            data = self.synchroniser()
+        self.assertEqual(data['results'], [])
+        self.assertEqual(len(self.synchroniser(data['cursor'])['results']), 1)
+
+    def test_since_timestamp_and_errors(self):
+        """Test que since accepte une date ISO 8601 et qu'un curseur invalide renvoie 400"""
+        ancienne = Note.objects.create(titre='Ancienne', contenu='...', owner=self.user)
+        Note.objects.filter(pk=ancienne.pk).update(date_modification=timezone.now() - timedelta(days=2))
+        Note.objects.create(titre='Récente', contenu='...', owner=self.user)
+        since = (timezone.now() - timedelta(days=1)).isoformat().replace('+00:00', 'Z')
+        self.assertEqual([note['titre'] for note in self.synchroniser(since)['results']], ['Récente'])
+
+        self.assertEqual(self.client.get(self.url, {'since': 'xyz'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(APIClient().get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_owner_only(self):
+        """Test que seuls les changements du propriétaire sont renvoyés et que son journal part avec lui"""
+        autre = User.objects.create_user(username='autre', password='password123')
+        Note.objects.create(titre='Autre', contenu='...', owner=autre).delete()
+        Note.objects.create(titre='Autre', contenu='...', owner=autre)
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        data = self.synchroniser(since)
+        self.assertEqual((data['results'], data['deleted']), ([], []))
+
+        self.assertEqual(NoteSupprimee.objects.filter(owner=autre).count(), 1)
+        autre.delete()
+        self.assertFalse(NoteSupprimee.objects.exists())
+
+    def test_uses_sync_index(self):
+        """Test que la requête de synchronisation parcourt l'index (owner, date_modification) sans tri"""
+        maintenant = timezone.now()
+        queryset = sync._apres(Note.objects.filter(owner=self.user), 'date_modification', [maintenant, 1])
+        queryset = queryset.filter(date_modification__lte=maintenant).order_by('date_modification', 'pk')[:501]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [ligne[-1] for ligne in cursor.fetchall()]
+        self.assertEqual(analyser_plan(plan), [], plan)
+        self.assertIn('note_owner_sync_idx', ' '.join(plan))
@@ -1,28 +1,247 @@
-from rest_framework.throttling import UserRateThrottle
+"""
+Throttling à fenêtre glissante en mémoire constante.
 
+SimpleRateThrottle (DRF) conserve la liste de tous les horodatages de la
+période et la réécrit à chaque requête : O(débit) en mémoire et en CPU par
+clé. Ici chaque clé ne stocke que trois entiers (fenêtre courante, compteur
+de la fenêtre précédente, compteur de la fenêtre courante) ; le nombre de
+requêtes sur la dernière période est estimé par pondération :
 
-class FeedbackCreateThrottle(UserRateThrottle):
+    estimation = précédent * (1 - écoulé / durée) + courant
+
+Toutes les limites d'une requête (anon ou user, plus la portée éventuelle de
+la vue) sont évaluées ensemble par le stockage, configurable via
+settings.THROTTLE_STORE :
+- SQLiteThrottleStore (défaut) : fichier SQLite partagé par tous les
+  processus d'une machine, une transaction atomique (BEGIN IMMEDIATE)
+- CacheThrottleStore : compteurs par fenêtre dans le cache Django,
+  incrémentés par cache.incr (partagé entre processus avec Redis ou
+  Memcached ; le LocMemCache est propre à chaque processus)
+"""
+import math
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from . import instrumentation
+
+
+def estimer(etat, maintenant, duree):
+    """Etat (fenêtre, précédent, courant) recalé sur la fenêtre de `maintenant`, et estimation"""
+    fenetre = int(maintenant // duree)
+    if etat is None or etat[0] < fenetre - 1:
+        precedent, courant = 0, 0
+    elif etat[0] == fenetre - 1:
+        precedent, courant = etat[2], 0
+    else:
+        precedent, courant = etat[1], etat[2]
+    ecoule = maintenant - fenetre * duree
+    return (fenetre, precedent, courant), precedent * (1 - ecoule / duree) + courant
+
+
+def attente(etat, maintenant, duree, limite):
+    """Secondes avant que l'estimation repasse sous la limite"""
+    fenetre, precedent, courant = etat
+    fin_fenetre = (fenetre + 1) * duree - maintenant
+    if courant >= limite:
+        # Il faut attendre la fenêtre suivante, où `courant` devient `précédent`
+        return fin_fenetre + duree * max(0.0, 1 - (limite - 1) / courant)
+    if not precedent:
+        return 0.0
+    ecoule = maintenant - fenetre * duree
+    cible = duree * (1 - (limite - 1 - courant) / precedent)
+    return max(0.0, cible - ecoule)
+
+
+def evaluer(etats, limites, maintenant):
     """
-    Throttle limitant la création de feedbacks à 20 par jour par utilisateur
+    Applique un hit à toutes les limites [(clé, nombre, durée)] si aucune n'est
+    atteinte. Renvoie (autorisé, attente, nouveaux états à enregistrer).
     """
-    scope = 'feedback_create'
+    recales, attentes = {}, []
+    for cle, nombre, duree in limites:
+        etat, estimation = estimer(etats.get(cle), maintenant, duree)
+        recales[cle] = etat
+        if estimation + 1 > nombre:
+            attentes.append(attente(etat, maintenant, duree, nombre))
+    if attentes:
+        return False, max(attentes), {}
+    return True, None, {cle: (f, p, c + 1) for cle, (f, p, c) in recales.items()}
+
+
+class CacheThrottleStore:
+    """
+    Un compteur par clé et par fenêtre (`<clé>:<fenêtre>`) dans le cache Django.
+    Le hit est compté d'abord (add puis incr, atomiques sur les caches
+    partagés), puis vérifié avec les valeurs renvoyées et annulé (decr) en cas
+    de refus : des requêtes concurrentes ne perdent pas d'incrément. Un
+    get_many pour les fenêtres précédentes, puis add + incr par limite.
+    """
+
+    def __init__(self, cache_alias='default'):
+        self.cache = caches[cache_alias]
+
+    def incrementer(self, cle, duree):
+        # Une fenêtre n'est plus utile au-delà de deux durées
+        self.cache.add(cle, 0, duree * 2)
+        try:
+            return self.cache.incr(cle)
+        except ValueError:
+            # Expirée entre add() et incr()
+            self.cache.add(cle, 1, duree * 2)
+            return 1
+
+    def hit(self, limites, maintenant):
+        fenetres = {cle: int(maintenant // duree) for cle, _, duree in limites}
+        precedents = self.cache.get_many([f'{cle}:{fenetre - 1}' for cle, fenetre in fenetres.items()])
+        etats = {}
+        for cle, _, duree in limites:
+            fenetre = fenetres[cle]
+            courant = self.incrementer(f'{cle}:{fenetre}', duree)
+            # Etat avant ce hit, que evaluer() applique
+            etats[cle] = (fenetre, precedents.get(f'{cle}:{fenetre - 1}', 0), courant - 1)
+        autorise, delai, _ = evaluer(etats, limites, maintenant)
+        if not autorise:
+            for cle, fenetre in fenetres.items():
+                try:
+                    self.cache.decr(f'{cle}:{fenetre}')
+                except ValueError:
+                    pass
+        return autorise, delai
+
+
+class SQLiteThrottleStore:
+    """
+    Etats stockés dans une base SQLite dédiée, partagée entre processus. Chaque
+    requête est une seule transaction d'écriture (lecture + upsert de toutes
+    ses clés) : les limites restent exactes sous gunicorn.
+    """
+    purge_interval = 1000
+
+    def __init__(self, path, timeout=5.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self.local = threading.local()
+        self.hits = 0
 
-    def get_cache_key(self, request, view):
-        if request.user.is_authenticated:
-            ident = request.user.pk
-        else:
-            ident = self.get_ident(request)
-        
-        return self.cache_format % {
-            'scope': self.scope,
-            'ident': ident
-        }
+    def connection(self):
+        connexion = getattr(self.local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connexion.execute('PRAGMA journal_mode=WAL')
+            connexion.execute('PRAGMA synchronous=NORMAL')
+            connexion.execute(
+                'CREATE TABLE IF NOT EXISTS throttle ('
+                'cle TEXT PRIMARY KEY, fenetre INTEGER, precedent INTEGER, courant INTEGER, expire REAL'
+                ') WITHOUT ROWID'
+            )
+            self.local.connexion = connexion
+        return connexion
+
+    def hit(self, limites, maintenant):
+        connexion = self.connection()
+        cles = [cle for cle, _, _ in limites]
+        durees = {cle: duree for cle, _, duree in limites}
+        connexion.execute('BEGIN IMMEDIATE')
+        try:
+            lignes = connexion.execute(
+                f"SELECT cle, fenetre, precedent, courant FROM throttle WHERE cle IN ({', '.join('?' * len(cles))})",
+                cles,
+            ).fetchall()
+            autorise, delai, nouveaux = evaluer({cle: tuple(etat) for cle, *etat in lignes}, limites, maintenant)
+            if nouveaux:
+                connexion.executemany(
+                    'INSERT OR REPLACE INTO throttle (cle, fenetre, precedent, courant, expire) VALUES (?, ?, ?, ?, ?)',
+                    [(cle, f, p, c, (f + 2) * durees[cle]) for cle, (f, p, c) in nouveaux.items()],
+                )
+            self.hits += 1
+            if self.hits % self.purge_interval == 0:
+                connexion.execute('DELETE FROM throttle WHERE expire < ?', [maintenant])
+            connexion.execute('COMMIT')
+        except BaseException:
+            connexion.execute('ROLLBACK')
+            raise
+        return autorise, delai
+
+
+_stores = {}
+
+
+def get_store():
+    """Stockage configuré par settings.THROTTLE_STORE (cache Django à défaut de réglage)"""
+    config = getattr(settings, 'THROTTLE_STORE', None) or {'BACKEND': 'bibliotheque.throttling.CacheThrottleStore'}
+    cle = (config['BACKEND'], repr(sorted(config.get('OPTIONS', {}).items())))
+    if cle not in _stores:
+        _stores[cle] = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _stores[cle]
+
+
+class SlidingWindowRateThrottle(BaseThrottle):
+    """
+    Limite anon (non authentifié) ou user (authentifié), plus la portée
+    `throttle_scope` de la vue si elle en déclare une, en un seul appel au
+    stockage. Les taux viennent de DEFAULT_THROTTLE_RATES comme pour DRF.
+    """
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+    timer = time.time
+
+    def parse_rate(self, rate):
+        if rate is None:
+            return None
+        nombre, periode = rate.split('/')
+        duree = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[periode[0]]
+        return int(nombre), duree
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return 'user', request.user.pk
+        return 'anon', self.get_ident(request)
+
+    def get_scopes(self, request, view):
+        """Portées (scope, ident) à appliquer à cette requête"""
+        scope, ident = self.get_ident_for(request)
+        scopes = [(scope, ident)]
+        view_scope = getattr(view, 'throttle_scope', None)
+        if view_scope:
+            scopes.append((view_scope, ident))
+        return scopes
+
+    def get_limits(self, request, view):
+        limites = []
+        for scope, ident in self.get_scopes(request, view):
+            rate = self.parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+            if rate is not None:
+                cle = self.cache_format % {'scope': scope, 'ident': ident}
+                limites.append((cle, rate[0], rate[1]))
+        return limites
 
     def allow_request(self, request, view):
-        """
-        N'appliquer le throttling qu'aux actions de création
-        """
-        if view.action != 'create':
+        limites = self.get_limits(request, view)
+        if not limites:
             return True
-        
-        return super().allow_request(request, view)
\ No newline at end of file
+        with instrumentation.phase('throttle'):
+            autorise, self.delai = get_store().hit(limites, self.timer())
+        return autorise
+
+    def wait(self):
+        return math.ceil(self.delai) if self.delai is not None else None
+
+
+class FeedbackCreateThrottle(SlidingWindowRateThrottle):
+    """
+    Throttle limitant la création de feedbacks à 20 par jour par utilisateur.
+    Seul throttle de FeedbackViewSet : les limites anon/user ne s'y appliquent pas
+    """
+    scope = 'feedback_create'
+
+    def get_scopes(self, request, view):
+        # N'appliquer le throttling qu'aux actions de création
+        if view.action != 'create':
+            return []
+        return [(self.scope, self.get_ident_for(request)[1])]
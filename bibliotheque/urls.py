@@ -2,8 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     LivreViewSet, AuteurViewSet, ArticleListViewSet, NoteViewSet, CommentViewSet, FeedbackViewSet,
-    home, current_datetime, ArticleListView, ArticleDetailView, ArticleCreateView
+    InstrumentationView, home, current_datetime, ArticleListView, ArticleDetailView, ArticleCreateView
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'livres', LivreViewSet)
@@ -16,6 +17,15 @@ router.register(r'feedbacks', FeedbackViewSet)
 urlpatterns = [
     # API REST (DRF)
     path('api/', include(router.urls)),
+    path('api/instrumentation/', InstrumentationView.as_view(), name='instrumentation'),
+
+    # Lectures async (ASGI) : mêmes réponses que les endpoints ci-dessus
+    path('api/async/livres/', async_views.livres_list, name='async-livres-list'),
+    path('api/async/livres/<int:pk>/', async_views.livres_detail, name='async-livres-detail'),
+    path('api/async/articles/', async_views.articles_list, name='async-articles-list'),
+    path('api/async/articles/<int:pk>/', async_views.articles_detail, name='async-articles-detail'),
+    path('api/async/auteurs/<int:pk>/titres/', async_views.auteurs_titres, name='async-auteurs-titres'),
+    path('async/', async_views.home, name='async-home'),
     
     # Vues web traditionnelles (MVT)
     path('', home, name='home'),
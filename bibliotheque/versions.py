@@ -0,0 +1,101 @@
+"""
+Numéros de version par modèle, incrémentés après chaque écriture validée
+(post_save/post_delete et écritures en masse, voir signals.py).
+
+Ils servent de clé d'invalidation : un fragment ou une réponse mis en cache
+avec la version courante devient inaccessible dès que le modèle change, sans
+avoir à retrouver ni supprimer les entrées concernées.
+
+Les versions sont stockées dans la table Compteur, une ligne indexée par
+modèle (nom 'version:<app>.<modèle>', objet_id 0) : tous les processus
+voient la même. Une version est l'horodatage en microsecondes de la dernière
+écriture (au moins la précédente + 1) ; elle ne revient jamais en arrière et
+donne la date Last-Modified. 0 : modèle jamais écrit.
+
+L'incrément est reporté au commit de la transaction (transaction.on_commit) :
+une lecture concurrente ne peut pas associer la nouvelle version aux données
+d'avant l'écriture. Les modèles écrits sont regroupés dans un ensemble en
+attente, propre au thread et à la base ; le premier rappel exécuté au commit
+les incrémente tous en une mise à jour et le vide, les suivants n'ont plus
+rien à faire. Chaque écriture enregistre son rappel : l'annulation d'un
+savepoint ne peut pas faire perdre l'incrément d'une écriture validée.
+"""
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import Auteur, Livre, Categorie, Article, Commentaire, Note, Feedback, Compteur
+
+PREFIXE = 'version:'
+
+# Modèles écrits dont la version n'est pas encore incrémentée, par base
+_en_attente = threading.local()
+
+# Modèles dont les vues lisent la version (conditional_models, fragments) ;
+# User : le nom du propriétaire apparaît dans les notes et feedbacks
+MODELES = [Auteur, Livre, Categorie, Article, Commentaire, Note, Feedback, User]
+
+
+def _nom(model):
+    return PREFIXE + model._meta.label_lower
+
+
+def _valeurs(models):
+    noms = [_nom(model) for model in models]
+    valeurs = dict(Compteur.objects.filter(nom__in=noms, objet_id=0).values_list('nom', 'valeur'))
+    return [valeurs.get(nom, 0) for nom in noms]
+
+
+def lire(*models):
+    """Version combinée des modèles donnés, ex. '1697612345123456.1697612345456789'"""
+    return etat(*models)[0]
+
+
+def etat(*models):
+    """(version combinée, timestamp en secondes de la dernière écriture ou None), en une requête"""
+    valeurs = _valeurs(models)
+    derniere = max(valeurs) // 1_000_000 if all(valeurs) else None
+    return '.'.join(str(valeur) for valeur in valeurs), derniere
+
+
+def _modeles_en_attente(using):
+    if not hasattr(_en_attente, 'par_base'):
+        _en_attente.par_base = {}
+    return _en_attente.par_base.setdefault(using, set())
+
+
+class Incrementation:
+    """Incrément des versions des modèles en attente d'une base, exécuté après le commit"""
+
+    def __init__(self, using):
+        self.using = using
+
+    def __call__(self):
+        models = _modeles_en_attente(self.using)
+        if not models:
+            return
+        noms = {_nom(model) for model in models}
+        models.clear()
+        maintenant = time.time_ns() // 1000
+        versions = Compteur.objects.using(self.using).filter(nom__in=noms, objet_id=0)
+        valeur = Greatest(F('valeur') + 1, Value(maintenant))
+        if versions.update(valeur=valeur) == len(noms):
+            return
+        for nom in noms - set(versions.values_list('nom', flat=True)):
+            _, cree = Compteur.objects.using(self.using).get_or_create(
+                nom=nom, objet_id=0, defaults={'valeur': maintenant},
+            )
+            if not cree:
+                # Créée entre-temps par un autre processus
+                versions.filter(nom=nom).update(valeur=valeur)
+
+
+def incrementer(model):
+    using = router.db_for_write(model)
+    _modeles_en_attente(using).add(model)
+    # robust : la donnée est validée, un échec ici est journalisé, pas renvoyé au client
+    transaction.on_commit(Incrementation(using), using=using, robust=True)
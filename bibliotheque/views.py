@@ -1,43 +1,104 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.views.generic import ListView, DetailView, CreateView
 from django.contrib import messages
 from django.urls import reverse_lazy
 from datetime import datetime
-from rest_framework import viewsets
+from django.db.models import Prefetch
+from django.db.models.functions import Coalesce
+from rest_framework import status, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
-from .models import Auteur, Livre, Article, Categorie, Commentaire, Note, Feedback
-from .serializers import AuteurSerializer, LivreSerializer, ArticleSerializer, NoteSerializer, CommentViewSerializer, FeedbackSerializer
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.views import APIView
+from django.contrib.auth.models import User
+from .models import Auteur, Livre, Article, Categorie, Commentaire, Note, NoteSupprimee, Feedback
+from .serializers import AuteurSerializer, LivreSerializer, ArticleSerializer, ArticleResumeSerializer, NoteSerializer, CommentViewSerializer, FeedbackSerializer
 from .permissions import IsOwnerOrReadOnly, IsInGroup, IsFeedbackOwnerOrModeratorOrReadOnly
 from .throttling import FeedbackCreateThrottle
 from .forms import CommentaireForm, ArticleForm
+from .filters import FiltreApresAnnee, FiltreBooleen, FiltreCle, FiltreDate
+from .mixins import ConditionalGetMixin, BulkActionsMixin, ExportMixin, FastListMixin
+from .pagination import page_keyset
+from .search import rechercher_livres, rechercher_articles
+from . import counters, ingestion, instrumentation, sync, versions
 
 
-class LivreViewSet(viewsets.ModelViewSet):
+class LivreViewSet(ConditionalGetMixin, FastListMixin, BulkActionsMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Livre.objects.all()
     serializer_class = LivreSerializer
+    conditional_models = [Livre, Auteur]
+    export_fields = ['id', 'titre', 'date_sortie', 'auteur_id', 'auteur__nom']
     permission_classes = [IsAuthenticatedOrReadOnly]
+    filtres = {'auteur': FiltreCle(), 'date_sortie': FiltreDate()}
 
     def get_queryset(self):
         queryset = Livre.objects.all()
         search = self.request.query_params.get('search')
         if search is not None:
-            queryset = queryset.filter(titre__icontains=search)
+            # Recherche plein texte (titre + auteur) classée par pertinence
+            queryset = rechercher_livres(queryset, search)
         return queryset
 
 
-class AuteurViewSet(viewsets.ModelViewSet):
+class AuteurViewSet(ConditionalGetMixin, BulkActionsMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Auteur.objects.all()
     serializer_class = AuteurSerializer
+    conditional_models = [Auteur, Livre]
+    export_fields = ['id', 'nom', 'date_naissance']
+    filtres = {'date_naissance': FiltreDate(), 'year': FiltreApresAnnee('date_naissance')}
+
+    def get_expand(self):
+        """Relations à imbriquer complètement, via ?expand=livres"""
+        expand = self.request.query_params.get('expand', '')
+        return {name.strip() for name in expand.split(',') if name.strip()}
+
+    def get_livres_limit(self):
+        """Nombre maximum de livres renvoyés par auteur, via ?livres_limit=N"""
+        limit = self.request.query_params.get('livres_limit')
+        if limit is None:
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({'livres_limit': 'Doit être un entier.'})
+        if limit < 0:
+            raise ValidationError({'livres_limit': 'Doit être positif.'})
+        return limit
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
 
     def get_queryset(self):
-        queryset = Auteur.objects.all()
-        year = self.request.query_params.get('year')
-        if year is not None:
-            queryset = queryset.filter(date_naissance__year__gt=int(year))
-        return queryset
+        if self.action in ('titres', 'bulk'):
+            return Auteur.objects.all()
+
+        # Les livres de toute la page sont chargés en une seule requête (prefetch)
+        # au lieu d'une requête par auteur ; l'ordre (auteur, titre) suit l'index
+        # livre_auteur_titre_idx et évite un tri
+        if 'livres' in self.get_expand():
+            livres = Livre.objects.order_by('auteur_id', 'titre')
+        else:
+            livres = Livre.objects.only('id', 'auteur_id').order_by('auteur_id', 'titre')
+        limit = self.get_livres_limit()
+        if limit is not None:
+            livres = livres[:limit]
+
+        # Nombre de livres lu dans les compteurs : ni jointure ni GROUP BY, la
+        # liste suit l'index auteur_nom_idx
+        queryset = Auteur.objects.annotate(
+            nombre_livres=Coalesce(counters.sous_requete('auteur.livres'), 0)
+        )
+        selection = AuteurSerializer.champs_selectionnes(self.request)
+        if selection is not None and 'livres' not in selection:
+            # ?fields= / ?omit= sans les livres : pas de prefetch
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch('livres', queryset=livres, to_attr='livres_charges')
+        )
 
     @action(detail=True, methods=['get'])
     def titres(self, request, pk=None):
@@ -46,28 +107,75 @@ class AuteurViewSet(viewsets.ModelViewSet):
         return Response({'titres': list(titres)})
 
 
-class ArticleListViewSet(viewsets.ModelViewSet):
+class ArticleListViewSet(ConditionalGetMixin, FastListMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Article.objects.all()
     serializer_class = ArticleSerializer
+    conditional_models = [Article, Categorie]
+    export_fields = ['id', 'titre', 'contenu', 'date', 'categorie_id', 'categorie__nom']
+    export_since_field = 'date'
     permission_classes = [AllowAny]
+    filtres = {'categorie': FiltreCle(), 'date': FiltreDate()}
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ArticleResumeSerializer
+        return ArticleSerializer
+
+    def get_queryset(self):
+        queryset = Article.objects.select_related('categorie')
+        if self.action == 'list':
+            # La liste renvoie l'extrait stocké : le contenu reste en base
+            queryset = queryset.defer('contenu')
+        search = self.request.query_params.get('search')
+        if search is not None:
+            # Recherche plein texte (titre + contenu) classée par pertinence
+            queryset = rechercher_articles(queryset, search)
+        return queryset
 
 
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Note.objects.all()
     serializer_class = NoteSerializer
+    conditional_models = [Note, User]
     permission_classes = [IsOwnerOrReadOnly]
+    filtres = {'date_creation': FiltreDate(), 'date_modification': FiltreDate()}
+    # Notes (et suppressions) au plus par réponse de synchronisation
+    sync_limite = 500
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
     def get_queryset(self):
-        return Note.objects.filter(owner=self.request.user)
-
-
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Commentaire.objects.all()
+        return Note.objects.filter(owner=self.request.user).select_related('owner')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def sync(self, request):
+        """Changements depuis ?since= (curseur ou date et heure ISO 8601), voir sync.py"""
+        try:
+            changements = sync.synchroniser(
+                self.get_queryset(),
+                NoteSupprimee.objects.filter(owner=request.user),
+                request.query_params.get('since'),
+                self.sync_limite,
+            )
+        except ValueError as exc:
+            raise ValidationError({'since': str(exc)})
+        return Response({
+            'results': self.get_serializer(changements['notes'], many=True).data,
+            'deleted': changements['deleted'],
+            'cursor': changements['cursor'],
+            'has_more': changements['has_more'],
+        })
+
+
+class CommentViewSet(ConditionalGetMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Commentaire.objects.select_related('article')
     serializer_class = CommentViewSerializer
+    conditional_models = [Commentaire, Article]
+    export_fields = ['id', 'article_id', 'nom', 'email', 'contenu', 'date', 'actif']
+    export_since_field = 'date'
     permission_classes = [IsAuthenticatedOrReadOnly]
+    filtres = {'article': FiltreCle(), 'date': FiltreDate(), 'actif': FiltreBooleen()}
 
     def get_permissions(self):
         """
@@ -81,11 +189,22 @@ class CommentViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class FeedbackViewSet(viewsets.ModelViewSet):
+class FeedbackViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
+    conditional_models = [Feedback, User]
     permission_classes = [IsFeedbackOwnerOrModeratorOrReadOnly]
     throttle_classes = [FeedbackCreateThrottle]
+    filtres = {'owner': FiltreCle(), 'date_creation': FiltreDate()}
+
+    def create(self, request, *args, **kwargs):
+        if not ingestion.active():
+            return super().create(request, *args, **kwargs)
+        # Ingestion différée : validé, mis en file, 202 sans attendre l'insertion
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ingestion.soumettre(Feedback, {**serializer.validated_data, 'owner_id': request.user.pk})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -95,18 +214,39 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         Les utilisateurs voient tous les feedbacks (lecture publique)
         mais ne peuvent modifier que les leurs
         """
-        return Feedback.objects.all()
+        return Feedback.objects.select_related('owner')
+
+
+class InstrumentationView(APIView):
+    """
+    Histogrammes de durée par route du processus courant (staff uniquement) ;
+    DELETE les remet à zéro.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'config': instrumentation.get_config(),
+            'bornes_ms': instrumentation.BORNES,
+            'routes': instrumentation.histogrammes.instantane(),
+        })
+
+    def delete(self, request):
+        instrumentation.histogrammes.vider()
+        return Response(status=204)
 
 
 # Vues Django traditionnelles (MVT)
 def home(request):
     """Page d'accueil avec statistiques"""
+    # Une seule requête sur la table des compteurs dénormalisés
+    totaux = counters.lire_globaux()
     context = {
-        'total_auteurs': Auteur.objects.count(),
-        'total_livres': Livre.objects.count(),
-        'total_categories': Categorie.objects.count(),
-        'total_articles': Article.objects.count(),
-        'total_commentaires': Commentaire.objects.count(),
+        'total_auteurs': totaux['auteur'],
+        'total_livres': totaux['livre'],
+        'total_categories': totaux['categorie'],
+        'total_articles': totaux['article'],
+        'total_commentaires': totaux['commentaire'],
     }
     return render(request, 'bibliotheque/home.html', context)
 
@@ -125,9 +265,21 @@ class ArticleListView(ListView):
     paginate_by = 5
     ordering = ['-date']
 
+    def get_queryset(self):
+        # La catégorie de chaque article est chargée par jointure ; la page
+        # affiche l'extrait stocké, le contenu complet n'est pas lu
+        return super().get_queryset().select_related('categorie').defer('contenu')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Categorie.objects.all()
+        # Queryset paresseux : évalué seulement si le fragment n'est pas en cache
+        context['categories'] = Categorie.objects.annotate(
+            nombre_articles=counters.sous_requete('categorie.articles')
+        )
+        # Version partagée par les workers, lue avant les catégories et
+        # incrémentée après le commit des écritures : un rendu concurrent ne
+        # peut pas mettre en cache d'anciens comptes sous la nouvelle version
+        context['version_categories'] = versions.lire(Categorie, Article)
         return context
 
 
@@ -135,10 +287,28 @@ class ArticleDetailView(DetailView):
     model = Article
     template_name = 'bibliotheque/article_detail.html'
     context_object_name = 'article'
+    commentaires_par_page = 20
+
+    def get_queryset(self):
+        # Catégorie par jointure et nombre de commentaires actifs lu dans les
+        # compteurs dénormalisés : une seule requête pour l'article
+        return super().get_queryset().select_related('categorie').annotate(
+            nombre_commentaires=Coalesce(counters.sous_requete('article.commentaires'), 0)
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['commentaires'] = self.object.commentaires.filter(actif=True)
+        # Commentaires par pages keyset (date, id) : ?apres=<curseur> charge la
+        # suite ; le nombre de requêtes ne dépend pas du nombre de commentaires
+        try:
+            commentaires, suivant = page_keyset(
+                self.object.commentaires.filter(actif=True), ['date', 'id'],
+                self.request.GET.get('apres'), self.commentaires_par_page,
+            )
+        except ValueError:
+            raise Http404('Curseur invalide.')
+        context['commentaires'] = commentaires
+        context['curseur_suivant'] = suivant
         context['comment_form'] = CommentaireForm()
         return context
 
@@ -146,6 +316,11 @@ class ArticleDetailView(DetailView):
         self.object = self.get_object()
         form = CommentaireForm(request.POST)
         if form.is_valid():
+            if ingestion.active():
+                # Mis en file, inséré par lot (voir ingestion.py)
+                ingestion.soumettre(Commentaire, {**form.cleaned_data, 'article_id': self.object.pk})
+                messages.success(request, 'Merci ! Votre commentaire sera publié dans quelques instants.')
+                return redirect('article-detail', pk=self.object.pk)
             commentaire = form.save(commit=False)
             commentaire.article = self.object
             commentaire.save()